@@ -5,7 +5,20 @@ define(['gizmo/superdesk'], function(Gizmo) {
 	return Gizmo.Collection.extend
 	({
 		_timeInterval: 10000,
+		/*!
+		 * the number of seconds the server is asked to hold an update request until a post changes,
+		 *   if 0 the collection will poll on the time interval
+		 */
+		_wait: 25,
+		/*!
+		 * the minimum number of milliseconds between two update requests in the wait mode,
+		 *   doubled up to the time interval while the server answers without holding the requests
+		 */
+		_waitInterval: 1000,
+		_waitBackoff: 0,
 		_idInterval: 0,
+		_idAuto: 0,
+		_auto: false,
 		_stats: {},
 		/*!
 		 * for auto refresh
@@ -67,26 +80,54 @@ define(['gizmo/superdesk'], function(Gizmo) {
 		auto: function(fn)
 		{
 			var self = this;
-			ret = this.stop().start();
-			this._idInterval = setInterval(function(){self.start();}, this._timeInterval);
+			this.stop();
+			this._auto = true;
+			ret = this.start();
+			if(!this._wait)
+				this._idInterval = setInterval(function(){self.start();}, this._timeInterval);
 			return ret;
 		},
 		start: function()
 		{
-			var self = this, requestOptions = {data: {'cId.since': this._stats.lastCId, 'order.start': this._stats.fistOrder }, headers:  { 'X-Filter': self._xfilter, 'X-Format-DateTime': 'M/dd/yyyy HH:mm:ss'}};
+			var self = this, idAuto = this._idAuto, started = new Date().getTime(), ret, next, requestOptions = {data: {'cId.since': this._stats.lastCId, 'order.start': this._stats.fistOrder }, headers:  { 'X-Filter': self._xfilter, 'X-Format-DateTime': 'M/dd/yyyy HH:mm:ss'}};
 			if(self._stats.lastCId === 0) delete requestOptions.data;
+			else if(self._wait) requestOptions.data.wait = self._wait;
 			if(!this.keep && self.view && !self.view.checkElement()) 
 			{
 				self.stop();
 				return;
 			}				
 			this.triggerHandler('beforeUpdate');
-			return this.autosync(requestOptions);
+			ret = this.autosync(requestOptions);
+			/*!
+			 * in the wait mode the next update request is made only after the current one returned,
+			 *   on failure we fall back to the time interval in order not to flood the server
+			 */
+			if( ret && self._wait && self._auto ) {
+				next = function(interval) {
+					return function() {
+						if( interval === undefined ) {
+							if( (new Date().getTime() - started) < self._waitInterval )
+								self._waitBackoff = Math.min(Math.max(self._waitBackoff*2, self._waitInterval), self._timeInterval);
+							else
+								self._waitBackoff = self._waitInterval;
+							interval = self._waitBackoff;
+						}
+						if( self._auto && (self._idAuto === idAuto) )
+							self._idInterval = setTimeout(function(){self.start();}, interval);
+					};
+				};
+				ret.done(next()).fail(next(self._timeInterval));
+			}
+			return ret;
 		},
 		stop: function()
 		{
 			var self = this;
+			self._auto = false;
+			self._idAuto++;
 			clearInterval(self._idInterval);
+			clearTimeout(self._idInterval);
 			return this;
 		},
 		/*!
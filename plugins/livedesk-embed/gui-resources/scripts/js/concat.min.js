@@ -52,9 +52,9 @@ b('input[data-type\x3d"permalink"]',c.el).css("visibility","hidden")});b(".sf-sh
 k+"', 1024, 768); return false;",emailurl:k};b.tmpl("theme/item/social-share",d,function(a,c){f.after(c);f.attr("data-added","yes")})}b('input[data-type\x3d"permalink"]',c.el).css("visibility","hidden");b(this).next(".share-box").toggle()})}});setTimeout(function(){})}})});define("window",[],function(){return window});define("document",[],function(){return document});
 define("jquery/scrollspy",["jquery","window","document"],function(b,d){b.fn.extend({scrollspy:function(e){e=b.extend({},{min:0,max:0,mode:"vertical",buffer:0,container:d,onEnter:e.onEnter?e.onEnter:[],onLeave:e.onLeave?e.onLeave:[],onTick:e.onTick?e.onTick:[]},e);return this.each(function(){var a=this,c=e,d=b(c.container),h=c.mode,k=c.buffer,j=leaves=0,p=!1;d.bind("scroll",function(){var e={top:b(this).scrollTop(),left:b(this).scrollLeft()},l="vertical"==h?e.top+k:e.left+k,q=c.max,s=c.min;b.isFunction(c.max)&&
 (q=c.max());b.isFunction(c.min)&&(s=c.min());0==q&&(q="vertical"==h?d.height():d.outerWidth()+b(a).outerWidth());if(l>=s&&l<=q){if(!p&&(p=!0,j++,b(a).trigger("scrollEnter",{position:e}),b.isFunction(c.onEnter)))c.onEnter(a,e);b(a).trigger("scrollTick",{position:e,inside:p,enters:j,leaves:leaves});if(b.isFunction(c.onTick))c.onTick(a,e,p,j,leaves)}else if(p&&(p=!1,leaves++,b(a).trigger("scrollLeave",{position:e,leaves:leaves}),b.isFunction(c.onLeave)))c.onLeave(a,e)})})}})});
-define("livedesk-embed/collections/autocollection",["gizmo/superdesk"],function(b){return b.Collection.extend({_timeInterval:1E4,_idInterval:0,_stats:{},keep:!1,resetStats:function(){this._stats={limit:15,offset:0,lastCId:0,fistOrder:Infinity,total:0}},init:function(){var b=this;b.resetStats();b.model.on("publish reorder",function(e,a){b._stats.lastCId+1===parseInt(a.get("CId"))&&b._stats.lastCId++});b.on("read readauto",function(e,a,c){b._stats.offset=b._stats.limit;b._stats.total=parseInt(c.total);
+define("livedesk-embed/collections/autocollection",["gizmo/superdesk"],function(b){return b.Collection.extend({_timeInterval:1E4,_wait:25,_waitInterval:1E3,_waitBackoff:0,_idInterval:0,_idAuto:0,_auto:!1,_stats:{},keep:!1,resetStats:function(){this._stats={limit:15,offset:0,lastCId:0,fistOrder:Infinity,total:0}},init:function(){var b=this;b.resetStats();b.model.on("publish reorder",function(e,a){b._stats.lastCId+1===parseInt(a.get("CId"))&&b._stats.lastCId++});b.on("read readauto",function(e,a,c){b._stats.offset=b._stats.limit;b._stats.total=parseInt(c.total);
 c.lastCId=parseInt(c.lastCId);c.lastCId>b._stats.lastCId&&(b._stats.lastCId=c.lastCId);b.getFirstOrder(a)}).on("readauto updatesauto addingsauto removeingsauto update",function(e,a){b.getLastCid(a);b.getFirstOrder(a)}).on("addingsauto",function(e,a){b._stats.total+=a.length;b._stats.offset+=a.length}).on("removeingsauto",function(e,a){b._stats.total-=a.length;b._stats.offset-=a.length}).on("addings",function(e,a){b._stats.offset+=a.length})},destroy:function(){this.stop()},auto:function(){var b=this;
-ret=this.stop().start();this._idInterval=setInterval(function(){b.start()},this._timeInterval);return ret},start:function(){var b={data:{"cId.since":this._stats.lastCId,"order.start":this._stats.fistOrder},headers:{"X-Filter":this._xfilter,"X-Format-DateTime":"M/dd/yyyy HH:mm:ss"}};0===this._stats.lastCId&&delete b.data;if(!this.keep&&this.view&&!this.view.checkElement())this.stop();else return this.triggerHandler("beforeUpdate"),this.autosync(b)},stop:function(){clearInterval(this._idInterval);return this},
+this.stop();this._auto=!0;ret=this.start();this._wait||(this._idInterval=setInterval(function(){b.start()},this._timeInterval));return ret},start:function(){var b=this,e=this._idAuto,a=(new Date).getTime(),c,d,f={data:{"cId.since":this._stats.lastCId,"order.start":this._stats.fistOrder},headers:{"X-Filter":this._xfilter,"X-Format-DateTime":"M/dd/yyyy HH:mm:ss"}};0===this._stats.lastCId?delete f.data:this._wait&&(f.data.wait=this._wait);if(!this.keep&&this.view&&!this.view.checkElement())this.stop();else return this.triggerHandler("beforeUpdate"),c=this.autosync(f),c&&this._wait&&this._auto&&(d=function(c){return function(){void 0===c&&(b._waitBackoff=(new Date).getTime()-a<b._waitInterval?Math.min(Math.max(2*b._waitBackoff,b._waitInterval),b._timeInterval):b._waitInterval,c=b._waitBackoff);b._auto&&b._idAuto===e&&(b._idInterval=setTimeout(function(){b.start()},c))}},c.done(d()).fail(d(this._timeInterval))),c},stop:function(){this._auto=!1;this._idAuto++;clearInterval(this._idInterval);clearTimeout(this._idInterval);return this},
 getFirstOrder:function(b){for(var e=0,a,c=b.length;e<c;e++)a=parseFloat(b[e].get("Order")),!isNaN(a)&&this._stats.fistOrder>a&&(this._stats.fistOrder=a)},getLastCid:function(b){for(var e=0,a,c=b.length;e<c;e++)a=parseInt(b[e].get("CId")),!isNaN(a)&&this._stats.lastCId<a&&(this._stats.lastCId=a)},autosync:function(b){var e=this;return this.href&&this.syncAdapter.request.call(this.syncAdapter,this.href).read(b).done(function(a){var c=e.parseAttributes(a);a=e._parse(a);for(var b=[],d=[],k=[],j=[],p=
 e._list.length,o=0;o<a.length;o++){for(var l=!1,q=0;q<e._list.length;q++)if(a[o].hash()==e._list[q].hash()){l=a[o];break}if(l)if(e.hasEvent("updatesauto")&&k.push(l),e.isCollectionDeleted(l)&&(e._list.splice(q,1),e.hasEvent("removeingsauto")&&d.push(l)),l.isDeleted())l._remove();else if(l.isChanged())b.push(l);else l.on("delete",function(){e.remove(this.hash())}).on("garbage",function(){this.desynced=!0});else e.isCollectionDeleted(a[o])?e.hasEvent("removeingsauto")&&e.hasEvent("removeingsauto")&&
 d.push(a[o]):a[o].isDeleted()?e.hasEvent("updatesauto")&&k.push(a[o]):(e._list.push(a[o]),b.push(a[o]),e.hasEvent("addingsauto")&&j.push(a[o]))}e.desynced=!1;0===p?e.triggerHandler("readauto",[e._list,c]):(k.length&&e.hasEvent("updatesauto")&&e.triggerHandler("updatesauto",[k,c]),j.length&&e.hasEvent("addingsauto")&&e.triggerHandler("addingsauto",[j,c]),d.length&&e.hasEvent("removeingsauto")&&e.triggerHandler("removeingsauto",[d,c]),e.triggerHandler("updateauto",[b,c]))})}},{register:"AutoCollection"})});
@@ -10,14 +10,20 @@ Contains the default data for the live desk plugin.
 '''
 
 from ..gui_security.acl import aclType
+from ..superdesk.db_superdesk import alchemySessionCreator
 from ..livedesk.actions import rightLivedeskView, rightManageOwnPost
 from ..security_rbac.populate import rootRoleId
 from ally.container import support, ioc
 from ally.internationalization import NC_
 from distribution.container import app
+from livedesk.meta.blog_collaborator_group import BlogCollaboratorGroupMapped
+from livedesk.meta.blog_post import BlogPostEntry
 from security.api.right import IRightService, Right
 from security.rbac.api.rbac import IRoleService, QRole, Role
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm.session import Session
 from superdesk.security.api.user_rbac import IUserRbacService
+from superdesk.security.core.spec import IUserRbacSupport
 from superdesk.user.api.user import IUserService, User, QUser
 import hashlib
 from __plugin__.media_archive.actions import rightMediaArchiveView
@@ -65,6 +71,10 @@ def populateCollaboratorRole():
     roleService.assignRight(blogRoleCollaboratorId(), rightService.getByName(aclType().name, rightMediaArchiveView().name).Id)
     roleService.assignRole(blogRoleAdministratorId(), blogRoleCollaboratorId())
 
+    userRbacSupport = support.entityFor(IUserRbacSupport)
+    assert isinstance(userRbacSupport, IUserRbacSupport)
+    userRbacSupport.refreshRoleRights(blogRoleCollaboratorId())
+
 @app.populate
 def populateBlogAdministratorRole():
     roleService = support.entityFor(IRoleService)
@@ -76,6 +86,10 @@ def populateBlogAdministratorRole():
         roleService.assignRight(blogRoleAdministratorId(), right.Id)
     roleService.assignRole(rootRoleId(), blogRoleAdministratorId())
 
+    userRbacSupport = support.entityFor(IUserRbacSupport)
+    assert isinstance(userRbacSupport, IUserRbacSupport)
+    userRbacSupport.refreshRoleRights(blogRoleAdministratorId())
+
 # --------------------------------------------------------------------
 
 @app.populate
@@ -109,3 +123,61 @@ def populateDefaultUsers():
             user.Id = userService.insert(user)
         else: user = next(iter(users))
         userRbacService.assignRole(user.Id, blogRoleCollaboratorId())
+
+# --------------------------------------------------------------------
+
+@app.populate
+def upgradeBlogUpdatedOn():
+    '''
+    The blog updated on date used to be calculated from the blog posts on every read, for the existing databases the
+    column is added and filled with the latest update date of the blog posts.
+    '''
+    creator = alchemySessionCreator()
+    session = creator()
+    assert isinstance(session, Session)
+
+    try: session.execute('SELECT updated_on FROM livedesk_blog WHERE 1 = 0')
+    except DBAPIError: session.rollback()
+    else:
+        # The column is already present, nothing to upgrade.
+        session.close()
+        return
+
+    session.execute('ALTER TABLE livedesk_blog ADD COLUMN updated_on DATETIME')
+    session.execute('UPDATE livedesk_blog SET updated_on = (SELECT MAX(post.updated_on) FROM livedesk_post '
+                    'JOIN post ON post.id = livedesk_post.fk_post_id WHERE livedesk_post.fk_blog_id = livedesk_blog.id)')
+    session.commit()
+    session.close()
+
+@app.populate
+def upgradeCollaboratorGroupIndexes():
+    '''
+    The expired collaborator groups are cleaned based on the last access date, for the existing databases the index
+    on the last access date is created.
+    '''
+    creator = alchemySessionCreator()
+    session = creator()
+    assert isinstance(session, Session)
+
+    for index in BlogCollaboratorGroupMapped.__table__.indexes:
+        try: index.create(session.connection())
+        except DBAPIError: session.rollback()  # The index already exists
+        else: session.commit()
+    session.close()
+
+@app.populate
+def upgradeBlogPostIndexes():
+    '''
+    The blog last change id and the blog post changes are read based on the blog and change id and the blog post pages
+    are seeked based on the blog and ordering, for the existing databases these indexes are created.
+    '''
+    creator = alchemySessionCreator()
+    session = creator()
+    assert isinstance(session, Session)
+
+    for index in BlogPostEntry.__table__.indexes:
+        if index.name not in ('ix_livedesk_post_change', 'ix_livedesk_post_ordering'): continue
+        try: index.create(session.connection())
+        except DBAPIError: session.rollback()  # The index already exists
+        else: session.commit()
+    session.close()
@@ -11,24 +11,26 @@ Contains the services for livedesk.
 
 from ..cdm.local_cdm import contentDeliveryManager
 from ..plugin.registry import addService
+from ..superdesk.maintenance import maintenanceScheduler, maintenance_chunk_size
 from ..superdesk.db_superdesk import bindSuperdeskSession, \
     bindSuperdeskValidations
 from ally.container import support, ioc
 from ally.internationalization import NC_
 from cdm.spec import ICDM
+from cdm.support import ExtendPathCDM
 from distribution.container import app
-from livedesk.core.spec import IBlogCollaboratorGroupCleanupService
+from livedesk.core.spec import IBlogCollaboratorGroupCleanupService, IBlogSnapshotPublisher, \
+    IBlogCollaboratorGroupAccess
 from livedesk.impl.blog_collaborator import CollaboratorSpecification
-from sched import scheduler
-from threading import Thread
-import time
 
 # --------------------------------------------------------------------
 
 SERVICES = 'livedesk.api.**.I*Service'
 
 support.createEntitySetup('livedesk.impl.**.*')
+support.createEntitySetup('livedesk.core.impl.**.*')
 support.bindToEntities('livedesk.impl.**.*Alchemy', IBlogCollaboratorGroupCleanupService, binders=bindSuperdeskSession)
+support.bindToEntities('livedesk.core.impl.**.*Alchemy', binders=bindSuperdeskSession)
 support.listenToEntities(SERVICES, listeners=addService(bindSuperdeskSession, bindSuperdeskValidations))
 support.loadAllEntities(SERVICES)
 
@@ -37,6 +39,13 @@ support.loadAllEntities(SERVICES)
 @ioc.entity
 def blogThemeCDM() -> ICDM: return contentDeliveryManager()
 
+@ioc.entity
+def blogSnapshotCDM() -> ICDM:
+    '''
+    The content delivery manager (CDM) for the live blogs static snapshots.
+    '''
+    return ExtendPathCDM(contentDeliveryManager(), 'livedesk/snapshot/%s')
+
 # --------------------------------------------------------------------
 
 @ioc.entity
@@ -63,20 +72,52 @@ def cleanup_group_timeout() -> int:
     '''
     return 600
 
+@ioc.config
+def group_access_flush_timeout() -> int:
+    '''
+    The number of seconds at which to persist the blog collaborator groups last access, needs to be much lower then
+    the groups timeout.
+    '''
+    return 30
+
 # --------------------------------------------------------------------
 
 @app.deploy
 def cleanup():
     if not perform_group_cleanup(): return
-    timeout, cleanup = cleanup_group_timeout(), support.entityFor(IBlogCollaboratorGroupCleanupService)
-
-    schedule = scheduler(time.time, time.sleep)
-    def executeCleanup():
-        assert isinstance(cleanup, IBlogCollaboratorGroupCleanupService)
-        cleanup.cleanExpired()
-        schedule.enter(timeout, 1, executeCleanup, ())
-
-    schedule.enter(timeout, 1, executeCleanup, ())
-    scheduleRunner = Thread(name='Cleanup blog collaborator groups thread', target=schedule.run)
-    scheduleRunner.daemon = True
-    scheduleRunner.start()
+    cleanup = support.entityFor(IBlogCollaboratorGroupCleanupService)
+    assert isinstance(cleanup, IBlogCollaboratorGroupCleanupService)
+    maintenanceScheduler().register('Cleanup blog collaborator groups', cleanup_group_timeout(), cleanup.cleanExpired,
+                                    chunk=maintenance_chunk_size())
+
+@app.deploy
+def flushGroupAccess():
+    access = support.entityFor(IBlogCollaboratorGroupAccess)
+    assert isinstance(access, IBlogCollaboratorGroupAccess)
+    maintenanceScheduler().register('Flush blog collaborator groups access', group_access_flush_timeout(), access.flush)
+
+# --------------------------------------------------------------------
+
+@ioc.config
+def publish_snapshots() -> bool:
+    '''
+    True if the live blogs should be published as static snapshots in the CDM, useful for very high traffic events
+    where the readers should not reach the REST API.
+    '''
+    return False
+
+@ioc.config
+def snapshot_timeout() -> int:
+    '''
+    The number of seconds at which to check the live blogs for changes and publish their snapshots.
+    '''
+    return 5
+
+# --------------------------------------------------------------------
+
+@app.deploy
+def publishSnapshots():
+    if not publish_snapshots(): return
+    publisher = support.entityFor(IBlogSnapshotPublisher)
+    assert isinstance(publisher, IBlogSnapshotPublisher)
+    maintenanceScheduler().register('Publish live blogs snapshots', snapshot_timeout(), publisher.publishLive)
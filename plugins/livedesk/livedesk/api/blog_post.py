@@ -76,10 +76,13 @@ class IterPost(IterPart):
 	you the changed entries based on the cId, but the offsetMore will present you how many posts there are that are greater
 	then the provided order with no regards to cId. This is helpful when requesting the next page because the offset more
 	will tell you exactly fron where you next page will start. As a conclusion to have a relevant offsetMore you need to
-	query based on order and cId.
+	query based on order and cId. The eTag identifies the page content, if a call is made with a matching eTag no posts
+	are provided and the iterator is marked as not modified.
     '''
     offsetMore = int
     lastCId = int
+    eTag = str
+    notModified = bool
 
 # --------------------------------------------------------------------
 
@@ -97,16 +100,33 @@ class IBlogPostService:
 
     @call(webName='Published')
     def getPublished(self, blogId:Blog, typeId:PostType=None, creatorId:User=None, authorId:Collaborator=None, thumbSize:str=None,
-                     offset:int=None, limit:int=None, detailed:bool=True, q:QBlogPostPublished=None) -> Iter(BlogPost):
+                     offset:int=None, limit:int=None, detailed:bool=True, wait:int=None, eTag:str=None, after:str=None,
+                     q:QBlogPostPublished=None) -> Iter(BlogPost):
         '''
-        Provides all the blogs published posts. The detailed iterator will return a @see: IterPost.
+        Provides all the blogs published posts. The detailed iterator will return a @see: IterPost. If a wait number of
+        seconds is provided together with a cId.since filter the call will block until a post of the blog changes after
+        the since change id or until the wait time passes. If the eTag of a previously received detailed page is
+        provided and the page did not change no posts are provided, the detailed iterator being marked as not modified,
+        the eTag is ignored for the not detailed calls. The after cursor '{Order}:{Id}' of the last post from the
+        previous page provides the next page without an offset scan.
+        '''
+
+    @call(webName='Changes')
+    def getChanges(self, blogId:Blog, cId:int=None, thumbSize:str=None, detailed:bool=True, wait:int=None) -> Iter(BlogPost):
+        '''
+        Provides the blog posts that changed after the provided change id, the posts are presented in the same manner as
+        for the published posts with a change id filter. The detailed iterator will return a @see: IterPost that contains
+        the last change id of the blog. If a wait number of seconds is provided the call will block until a post of the
+        blog changes or until the wait time passes.
         '''
 
     @call(webName='Unpublished')
     def getUnpublished(self, blogId:Blog, typeId:PostType=None, creatorId:User=None, authorId:Collaborator=None, thumbSize:str=None,
-                       offset:int=None, limit:int=None, detailed:bool=True, q:QBlogPostUnpublished=None) -> Iter(BlogPost):
+                       offset:int=None, limit:int=None, detailed:bool=True, after:str=None,
+                       q:QBlogPostUnpublished=None) -> Iter(BlogPost):
         '''
-        Provides all the unpublished blogs posts.
+        Provides all the unpublished blogs posts. The after cursor '{Order}:{Id}' of the last post from the previous page
+        provides the next page without an offset scan.
         '''
     
     @call(webName='GroupUnpublished')
@@ -126,9 +146,10 @@ class IBlogPostService:
 
     @call
     def getAll(self, blogId:Blog, typeId:PostType=None, creatorId:User=None, authorId:Collaborator=None, thumbSize:str=None,
-                       offset:int=None, limit:int=None, q:QBlogPost=None) -> Iter(BlogPost):
+                       offset:int=None, limit:int=None, after:str=None, q:QBlogPost=None) -> Iter(BlogPost):
         '''
-        Provides all the unpublished blogs posts.
+        Provides all the unpublished blogs posts. The after cursor '{Order}:{Id}' of the last post from the previous page
+        provides the next page without an offset scan.
         '''
 
     @call
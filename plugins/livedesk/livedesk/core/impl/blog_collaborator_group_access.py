@@ -0,0 +1,97 @@
+'''
+Created on Feb 20, 2013
+
+@package: livedesk
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Contains the in memory tracking of the blog collaborator groups access.
+'''
+
+from ally.container import wire
+from ally.container.ioc import injected
+from ally.container.support import setup
+from ally.exception import InputError, Ref
+from ally.internationalization import _
+from ally.support.sqlalchemy.session import SessionSupport
+from livedesk.core.spec import IBlogCollaboratorGroupAccess
+from livedesk.meta.blog_collaborator_group import BlogCollaboratorGroupMapped
+from sqlalchemy.sql.functions import current_timestamp
+from threading import Lock
+import time
+
+# --------------------------------------------------------------------
+
+@injected
+@setup(IBlogCollaboratorGroupAccess)
+class BlogCollaboratorGroupAccessAlchemy(SessionSupport, IBlogCollaboratorGroupAccess):
+    '''
+    Implementation for @see: IBlogCollaboratorGroupAccess that keeps the accessed groups in memory and updates their
+    last access date in bulk on flush, the flush needs to run at an interval much lower then the groups timeout.
+    '''
+
+    group_known_timeout = 60; wire.config('group_known_timeout', doc='''
+    The number of seconds a group that has been accessed is known to exist, in this time the group is touched without
+    checking it in the database. Keep this well under the groups cleanup interval, a group removed by another process
+    is seen as existing for at most this time.
+    ''')
+
+    def __init__(self):
+        '''
+        Construct the blog collaborator group access.
+        '''
+        assert isinstance(self.group_known_timeout, int), 'Invalid group known timeout %s' % self.group_known_timeout
+
+        self._touched = {}
+        # The touched groups, group id -> last touch time
+        self._dirty = set()
+        # The groups touched since the last flush.
+        self._lock = Lock()
+
+    def touch(self, groupId):
+        '''
+        @see: IBlogCollaboratorGroupAccess.touch
+        '''
+        now = time.time()
+        with self._lock:
+            touchedOn = self._touched.get(groupId)
+            if touchedOn is not None and touchedOn > now - self.group_known_timeout:
+                self._touched[groupId] = now
+                self._dirty.add(groupId)
+                return
+
+        sql = self.session().query(BlogCollaboratorGroupMapped.Id)
+        sql = sql.filter(BlogCollaboratorGroupMapped.Id == groupId)
+        if sql.count() == 0: raise InputError(Ref(_('No collaborator group'), ref=BlogCollaboratorGroupMapped.Id))
+
+        with self._lock:
+            self._touched[groupId] = now
+            self._dirty.add(groupId)
+
+    def forget(self, groupIds):
+        '''
+        @see: IBlogCollaboratorGroupAccess.forget
+        '''
+        with self._lock:
+            for groupId in groupIds:
+                self._touched.pop(groupId, None)
+                self._dirty.discard(groupId)
+
+    def flush(self):
+        '''
+        @see: IBlogCollaboratorGroupAccess.flush
+        '''
+        expiredOn = time.time() - self.group_known_timeout
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            for groupId in [groupId for groupId, touchedOn in self._touched.items() if touchedOn <= expiredOn]:
+                del self._touched[groupId]
+        if not dirty: return 0
+
+        sql = self.session().query(BlogCollaboratorGroupMapped)
+        sql = sql.filter(BlogCollaboratorGroupMapped.Id.in_(dirty))
+        try: return sql.update({BlogCollaboratorGroupMapped.LastAccessOn: current_timestamp()}, synchronize_session=False)
+        except:
+            with self._lock: self._dirty.update(dirty)  # The accesses will be persisted by the next flush
+            raise
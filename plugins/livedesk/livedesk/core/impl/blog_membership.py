@@ -0,0 +1,119 @@
+'''
+Created on Feb 19, 2013
+
+@package: livedesk
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Contains the cached blog membership.
+'''
+
+from ally.container import wire
+from ally.container.ioc import injected
+from ally.container.support import setup
+from ally.support.sqlalchemy.session import SessionSupport
+from collections import OrderedDict
+from livedesk.core.spec import IBlogMembership
+from livedesk.meta.blog import BlogMapped
+from livedesk.meta.blog_collaborator import BlogCollaboratorMapped, \
+    BlogCollaboratorTypeMapped
+from sqlalchemy import event
+from threading import Lock
+from weakref import WeakKeyDictionary
+import time
+
+# --------------------------------------------------------------------
+
+@injected
+@setup(IBlogMembership)
+class BlogMembershipAlchemy(SessionSupport, IBlogMembership):
+    '''
+    Implementation for @see: IBlogMembership that keeps the memberships in a bounded in memory cache, the cached
+    memberships expire after a timeout so the changes made by other application processes are eventually seen. The
+    invalidated blogs are invalidated again when the session that changed them ends, this way a membership read before
+    the commit by a concurrent request is not kept in the cache.
+    '''
+
+    membership_cache_size = 10000; wire.config('membership_cache_size', doc='''
+    The maximum number of (user, blog) memberships to keep in memory, 0 disables the cache.
+    ''')
+    membership_cache_timeout = 60; wire.config('membership_cache_timeout', doc='''
+    The number of seconds a cached membership is valid, this is the maximum delay for a membership change made by
+    another application process to be applied.
+    ''')
+
+    def __init__(self):
+        '''
+        Construct the blog membership.
+        '''
+        assert isinstance(self.membership_cache_size, int), 'Invalid cache size %s' % self.membership_cache_size
+        assert isinstance(self.membership_cache_timeout, int), 'Invalid cache timeout %s' % self.membership_cache_timeout
+
+        self._cache_membership = OrderedDict()
+        # The memberships cache, (user id, blog id) -> (expire time, membership)
+        self._pending = WeakKeyDictionary()
+        # The blogs to invalidate when the session ends, session -> set(blog ids)
+        self._lock = Lock()
+
+    def membershipOf(self, userId, blogId):
+        '''
+        @see: IBlogMembership.membershipOf
+        '''
+        key = (userId, blogId)
+        if self.membership_cache_size > 0:
+            with self._lock:
+                cached = self._cache_membership.get(key)
+                if cached is not None and cached[0] > time.time():
+                    self._cache_membership.move_to_end(key)
+                    return cached[1]
+
+        sql = self.session().query(BlogMapped.Id)
+        sql = sql.filter(BlogMapped.Id == blogId)
+        sql = sql.filter(BlogMapped.Creator == userId)
+        isCreator = sql.count() > 0
+
+        sql = self.session().query(BlogCollaboratorTypeMapped.Name)
+        sql = sql.join(BlogCollaboratorMapped)
+        sql = sql.filter(BlogCollaboratorMapped.Blog == blogId)
+        sql = sql.filter(BlogCollaboratorMapped.User == userId)
+        membership = (isCreator, frozenset(name for name, in sql.all()))
+
+        if self.membership_cache_size > 0:
+            with self._lock:
+                self._cache_membership[key] = (time.time() + self.membership_cache_timeout, membership)
+                self._cache_membership.move_to_end(key)
+                while len(self._cache_membership) > self.membership_cache_size: self._cache_membership.popitem(last=False)
+        return membership
+
+    def invalidate(self, blogId):
+        '''
+        @see: IBlogMembership.invalidate
+        '''
+        session = self.session()
+        with self._lock:
+            self._invalidate((blogId,))
+            pending = self._pending.get(session)
+            if pending is None:
+                pending = self._pending[session] = set()
+                event.listen(session, 'after_commit', self._onEnd)
+                event.listen(session, 'after_rollback', self._onEnd)
+            pending.add(blogId)
+
+    # ----------------------------------------------------------------
+
+    def _onEnd(self, session):
+        '''
+        Invalidates the blogs changed by the ended session.
+        '''
+        with self._lock:
+            pending = self._pending.get(session)
+            if not pending: return
+            self._invalidate(pending)
+            pending.clear()
+
+    def _invalidate(self, blogIds):
+        '''
+        Removes the cached memberships of the blogs, the lock needs to be acquired.
+        '''
+        for key in [key for key in self._cache_membership if key[1] in blogIds]: del self._cache_membership[key]
@@ -0,0 +1,236 @@
+'''
+Created on Feb 14, 2013
+
+@package: livedesk
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Contains the in memory change feed for the blog posts.
+'''
+
+from ally.container import wire
+from ally.container.ioc import injected
+from ally.container.support import setup
+from ally.support.sqlalchemy.session import SessionSupport
+from collections import deque
+from livedesk.core.spec import IBlogPostChangeFeed
+from sqlalchemy import event
+from threading import Lock, Condition
+import time
+from weakref import WeakKeyDictionary
+
+# --------------------------------------------------------------------
+
+class ChangeBuffer:
+    '''
+    The ring buffer that keeps the recent changes for a blog.
+    '''
+    __slots__ = ('start', 'last', 'changes')
+
+    def __init__(self, start, size):
+        '''
+        Construct the change buffer.
+
+        @param start: integer
+            The change id after which all the blog changes are contained by the buffer.
+        @param size: integer
+            The maximum number of changes to keep.
+        '''
+        assert isinstance(start, int), 'Invalid start change id %s' % start
+        assert isinstance(size, int) and size > 0, 'Invalid size %s' % size
+        self.start = start
+        self.last = start
+        self.changes = deque(maxlen=size)
+
+    def push(self, postId, cId):
+        '''
+        Adds a new change to the buffer, if the buffer is full the oldest change is dropped and the buffer window moved.
+        '''
+        if len(self.changes) == self.changes.maxlen: self.start = max(self.start, self.changes[0][0])
+        self.changes.append((cId, postId))
+        if cId > self.last: self.last = cId
+
+    def restart(self, cId):
+        '''
+        Restarts the buffer window at the provided change id, used when the blog has changes that are not in the buffer.
+        '''
+        self.start = self.last = cId
+        self.changes.clear()
+
+    def since(self, cId):
+        '''
+        Provides the post ids changed after the provided change id, None if the change id is outside the window.
+        '''
+        if cId < self.start: return None
+        postIds, seen = [], set()
+        for changeId, postId in self.changes:
+            if changeId > cId and postId not in seen:
+                seen.add(postId)
+                postIds.append(postId)
+        return postIds
+
+# --------------------------------------------------------------------
+
+@injected
+@setup(IBlogPostChangeFeed)
+class BlogPostChangeFeedAlchemy(SessionSupport, IBlogPostChangeFeed):
+    '''
+    Implementation for @see: IBlogPostChangeFeed that keeps the changes in memory for each blog, the changes are
+    published in the feed only when the session that made them is committed. The feed is local to the application
+    process, the changes made by other processes are detected by seeding the feed with the last change id read from
+    the database, the feed last change id is provided only for a short time after a seed.
+    '''
+
+    change_buffer_size = 500; wire.config('change_buffer_size', doc='''
+    The number of recent post changes to keep in memory for each blog, the requests for changes older then this window
+    are answered from the database. Set to 0 in order to disable the in memory change feed.
+    ''')
+    seed_timeout = 5; wire.config('seed_timeout', doc='''
+    The number of seconds the last change id of a blog is provided from memory after it was read from the database,
+    after this the last change id is read again so the changes made by other application processes are seen.
+    ''')
+    wait_timeout = 30; wire.config('wait_timeout', doc='''
+    The maximum number of seconds that a request can wait for blog post changes, keep this lower then the timeouts of
+    the proxies that are in front of the application. The waiting requests are woken right away only by the changes
+    committed in this application process, the changes made by other processes are seen by the database checks.
+    ''')
+    wait_check_interval = 3; wire.config('wait_check_interval', doc='''
+    The number of seconds between the database checks made by a waiting request, when the application runs in multiple
+    processes this is the delay after which the changes made by the other processes are seen.
+    ''')
+    wait_max_requests = 50; wire.config('wait_max_requests', doc='''
+    The maximum number of requests that can wait at the same time for blog post changes, each waiting request holds a
+    server thread so the requests over this limit are answered right away and the clients poll again later.
+    ''')
+
+    def __init__(self):
+        '''
+        Construct the blog post change feed.
+        '''
+        assert isinstance(self.change_buffer_size, int), 'Invalid change buffer size %s' % self.change_buffer_size
+        assert isinstance(self.seed_timeout, int), 'Invalid seed timeout %s' % self.seed_timeout
+        assert isinstance(self.wait_timeout, int), 'Invalid wait timeout %s' % self.wait_timeout
+        assert isinstance(self.wait_check_interval, int) and self.wait_check_interval > 0, \
+        'Invalid wait check interval %s' % self.wait_check_interval
+        assert isinstance(self.wait_max_requests, int), 'Invalid wait max requests %s' % self.wait_max_requests
+
+        self._buffers = {}
+        self._seeded = {}
+        # The time when the blogs were last seeded, blog id -> time
+        self._pending = WeakKeyDictionary()
+        self._lock = Lock()
+        self._changed = Condition(self._lock)
+        self._waiting = 0
+
+    def register(self, blogId, postId, cId):
+        '''
+        @see: IBlogPostChangeFeed.register
+        '''
+        if self.change_buffer_size <= 0: return
+        assert isinstance(cId, int), 'Invalid change id %s' % cId
+
+        session = self.session()
+        with self._lock:
+            pending = self._pending.get(session)
+            if pending is None:
+                pending = self._pending[session] = []
+                event.listen(session, 'after_commit', self._onCommit)
+                event.listen(session, 'after_rollback', self._onRollback)
+            pending.append((blogId, postId, cId))
+
+    def seed(self, blogId, lastCId):
+        '''
+        @see: IBlogPostChangeFeed.seed
+        '''
+        if self.change_buffer_size <= 0: return
+        lastCId = lastCId or 0
+        with self._lock:
+            self._seeded[blogId] = time.time()
+            buffer = self._buffers.get(blogId)
+            if buffer is None: self._buffers[blogId] = ChangeBuffer(lastCId, self.change_buffer_size)
+            elif lastCId > buffer.last:
+                assert isinstance(buffer, ChangeBuffer)
+                # The blog has changes made by other processes, the buffer can not provide the changes before them.
+                buffer.restart(lastCId)
+                self._changed.notify_all()
+
+    def changesSince(self, blogId, cId):
+        '''
+        @see: IBlogPostChangeFeed.changesSince
+        '''
+        with self._lock:
+            buffer = self._buffers.get(blogId)
+            if buffer is None: return None
+            assert isinstance(buffer, ChangeBuffer)
+            postIds = buffer.since(cId)
+            if postIds is None: return None
+            return buffer.last, postIds
+
+    def lastCId(self, blogId):
+        '''
+        @see: IBlogPostChangeFeed.lastCId
+        '''
+        with self._lock:
+            buffer = self._buffers.get(blogId)
+            if buffer is None: return None
+            assert isinstance(buffer, ChangeBuffer)
+            if time.time() - self._seeded.get(blogId, 0) >= self.seed_timeout: return None
+            return buffer.last
+
+    def waitChanges(self, blogId, cId, timeout, check=None):
+        '''
+        @see: IBlogPostChangeFeed.waitChanges
+        '''
+        assert isinstance(timeout, int), 'Invalid timeout %s' % timeout
+        assert check is None or callable(check), 'Invalid check %s' % check
+        if self.change_buffer_size <= 0: return False
+
+        checked = time.time()
+        until = checked + min(timeout, self.wait_timeout)
+        with self._changed:
+            if self._waiting >= self.wait_max_requests:
+                buffer = self._buffers.get(blogId)
+                return buffer is not None and buffer.last > cId
+            self._waiting += 1
+        try:
+            while True:
+                with self._changed:
+                    buffer = self._buffers.get(blogId)
+                    if buffer is not None and buffer.last > cId: return True
+                    remaining = until - time.time()
+                    if remaining <= 0: return False
+                    if check is not None: remaining = min(remaining, checked + self.wait_check_interval - time.time())
+                    if remaining > 0: self._changed.wait(remaining)
+                if check is not None and time.time() >= checked + self.wait_check_interval:
+                    # The check is made without the lock since it reads the database and seeds the feed.
+                    check()
+                    checked = time.time()
+        finally:
+            with self._lock: self._waiting -= 1
+
+    # ----------------------------------------------------------------
+
+    def _onCommit(self, session):
+        '''
+        Publishes in the blogs buffers the changes made by the committed session.
+        '''
+        with self._lock:
+            pending = self._pending.get(session)
+            if not pending: return
+            for blogId, postId, cId in pending:
+                buffer = self._buffers.get(blogId)
+                if buffer is None:
+                    # The window starts right before the first change committed after the application start.
+                    buffer = self._buffers[blogId] = ChangeBuffer(cId - 1, self.change_buffer_size)
+                buffer.push(postId, cId)
+            del pending[:]
+            self._changed.notify_all()
+
+    def _onRollback(self, session):
+        '''
+        Discards the changes made by the rolled back session.
+        '''
+        with self._lock:
+            pending = self._pending.get(session)
+            if pending: del pending[:]
@@ -0,0 +1,217 @@
+'''
+Created on Feb 18, 2013
+
+@package: livedesk
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Contains the publisher of the live blogs static snapshots.
+'''
+
+from ally.container import wire
+from ally.container.ioc import injected
+from ally.container.support import setup
+from ally.support.sqlalchemy.session import SessionSupport, commitNow
+from cdm.spec import ICDM, PathNotFound
+from collections import deque
+from datetime import datetime, timedelta
+from io import BytesIO
+from livedesk.api.blog import IBlogService
+from livedesk.api.blog_post import IBlogPostService, IterPost
+from livedesk.core.spec import IBlogSnapshotPublisher
+from livedesk.meta.blog_snapshot import BlogSnapshotOwnerMapped
+from uuid import uuid4
+import json
+import logging
+
+# --------------------------------------------------------------------
+
+log = logging.getLogger(__name__)
+
+POST_PROPERTIES = ('Id', 'CId', 'Order', 'Type', 'Creator', 'Author', 'AuthorPerson', 'AuthorName', 'AuthorImage',
+                   'IsModified', 'IsPublished', 'Meta', 'Content', 'ContentPlain', 'CreatedOn', 'PublishedOn',
+                   'UpdatedOn', 'DeletedOn')
+# The blog post properties that are rendered in the snapshots.
+OWNER_NAME = 'snapshot'
+# The name of the snapshots publishing owner row.
+INSERT_IGNORE = {'mysql': 'IGNORE', 'sqlite': 'OR IGNORE'}
+# The insert prefixes by database dialect that skip the rows already inserted by a concurrent transaction.
+
+# --------------------------------------------------------------------
+
+@injected
+@setup(IBlogSnapshotPublisher)
+class BlogSnapshotPublisherAlchemy(SessionSupport, IBlogSnapshotPublisher):
+    '''
+    Implementation for @see: IBlogSnapshotPublisher that publishes for each live blog the first published posts in
+    '{blogId}/posts.json' and the posts changed after a change id in '{blogId}/since/{cId}.json'. A delta file always
+    contains all the changes after its change id so a reader needs only one request to catch up, the delta files are
+    rewritten on each blog change and only the most recent ones are kept. Only the application process that owns the
+    publishing, as recorded in the database, publishes the snapshots.
+    '''
+
+    blogService = IBlogService; wire.entity('blogService')
+    blogPostService = IBlogPostService; wire.entity('blogPostService')
+    blogSnapshotCDM = ICDM; wire.entity('blogSnapshotCDM')
+    # The CDM where the snapshots are published.
+    snapshot_posts = 15; wire.config('snapshot_posts', doc='''
+    The number of published posts to render in the blog snapshot.
+    ''')
+    snapshot_deltas = 50; wire.config('snapshot_deltas', doc='''
+    The number of "since change id" delta files to keep for a blog, the older delta files are removed.
+    ''')
+    snapshot_thumb_size = 'medium'; wire.config('snapshot_thumb_size', doc='''
+    The thumbnail size used for the authors images in the snapshots.
+    ''')
+    snapshot_owner_timeout = 60; wire.config('snapshot_owner_timeout', doc='''
+    The number of seconds the application process that publishes the snapshots keeps the publishing without renewing
+    it, after this another process takes over the publishing. Keep this greater then the publishing interval.
+    ''')
+
+    def __init__(self):
+        '''
+        Construct the blog snapshot publisher.
+        '''
+        assert isinstance(self.blogService, IBlogService), 'Invalid blog service %s' % self.blogService
+        assert isinstance(self.blogPostService, IBlogPostService), 'Invalid blog post service %s' % self.blogPostService
+        assert isinstance(self.blogSnapshotCDM, ICDM), 'Invalid snapshot CDM %s' % self.blogSnapshotCDM
+        assert isinstance(self.snapshot_posts, int), 'Invalid snapshot posts %s' % self.snapshot_posts
+        assert isinstance(self.snapshot_deltas, int), 'Invalid snapshot deltas %s' % self.snapshot_deltas
+        assert isinstance(self.snapshot_thumb_size, str), 'Invalid snapshot thumb size %s' % self.snapshot_thumb_size
+        assert isinstance(self.snapshot_owner_timeout, int), \
+        'Invalid snapshot owner timeout %s' % self.snapshot_owner_timeout
+
+        self._published = {}
+        # The published blogs, blog id -> (last change id, deque of the delta files change ids)
+        self._owner = uuid4().hex
+        # The owner id of this application process.
+
+    def publishLive(self):
+        '''
+        @see: IBlogSnapshotPublisher.publishLive
+        '''
+        try: owned = self._acquire()
+        except:
+            log.exception('Cannot acquire the snapshots publishing')
+            return
+        if not owned:
+            # Another process publishes the snapshots, the delta files state is taken again if the publishing is owned.
+            self._published.clear()
+            return
+
+        try: blogs = self.blogService.getLive()
+        except:
+            log.exception('Cannot fetch the live blogs')
+            return
+
+        live = set()
+        for blog in blogs:
+            live.add(blog.Id)
+            try: self._publishBlog(blog.Id)
+            except: log.exception('Cannot publish the snapshot for blog %s', blog.Id)
+
+        for blogId in set(self._published).difference(live):
+            # The blog is not live anymore, the last snapshot is kept but the delta files are not needed anymore.
+            self._removeDeltas(blogId)
+            del self._published[blogId]
+
+    # ----------------------------------------------------------------
+
+    def _acquire(self):
+        '''
+        Acquires or renews the snapshots publishing for this process.
+
+        @return: boolean
+            True if this process owns the publishing.
+        '''
+        now = datetime.now()
+        expiresOn = now + timedelta(seconds=self.snapshot_owner_timeout)
+        sql = self.session().query(BlogSnapshotOwnerMapped).filter(BlogSnapshotOwnerMapped.name == OWNER_NAME)
+        sql = sql.filter((BlogSnapshotOwnerMapped.owner == self._owner) | (BlogSnapshotOwnerMapped.expiresOn < now))
+        owned = sql.update({BlogSnapshotOwnerMapped.owner: self._owner, BlogSnapshotOwnerMapped.expiresOn: expiresOn},
+                           synchronize_session=False) > 0
+        if not owned:
+            # The owner row is missing, a concurrent process might insert it at the same time.
+            connection = self.session().connection()
+            insert = BlogSnapshotOwnerMapped.__table__.insert()
+            prefix = INSERT_IGNORE.get(connection.dialect.name)
+            if prefix: insert = insert.prefix_with(prefix)
+            result = connection.execute(insert, {BlogSnapshotOwnerMapped.name.property.columns[0].key: OWNER_NAME,
+                                                 BlogSnapshotOwnerMapped.owner.property.columns[0].key: self._owner,
+                                                 BlogSnapshotOwnerMapped.expiresOn.property.columns[0].key: expiresOn})
+            owned = result.rowcount > 0
+        commitNow()
+        # We commit so the owner row is not locked while publishing.
+        return owned
+
+    def _publishBlog(self, blogId):
+        '''
+        Publishes the snapshot of the blog if the blog changed since the last publishing, the blog last change id is
+        read from the database so the changes made by any application process are published.
+        '''
+        posts = self.blogPostService.getPublished(blogId, thumbSize=self.snapshot_thumb_size, offset=0,
+                                                  limit=self.snapshot_posts, detailed=True)
+        assert isinstance(posts, IterPost), 'Invalid posts %s' % posts
+        lastCId = posts.lastCId or 0
+
+        published = self._published.get(blogId)
+        if published is None:
+            # The delta files of a previous run can not be trusted since we do not know their content.
+            self._removeDeltas(blogId)
+            published = self._published[blogId] = (None, deque())
+        publishedCId, deltas = published
+        if publishedCId == lastCId: return
+
+        if publishedCId is not None:
+            deltas.append(publishedCId)
+            while len(deltas) > self.snapshot_deltas:
+                self._remove('%s/since/%s.json' % (blogId, deltas.popleft()))
+
+        if deltas:
+            # All the delta files are compacted from the changes after the oldest delta change id.
+            changes = self.blogPostService.getChanges(blogId, deltas[0], self.snapshot_thumb_size, True)
+            assert isinstance(changes, IterPost), 'Invalid changes %s' % changes
+            if (changes.lastCId or 0) < lastCId:
+                # The changes are capped, the delta files are dropped so the readers load the full snapshot.
+                self._removeDeltas(blogId)
+                deltas.clear()
+            changes = list(changes)
+            for cId in deltas:
+                self._publish('%s/since/%s.json' % (blogId, cId), since=cId, lastCId=lastCId,
+                              PostList=[self._render(post) for post in changes if post.CId and post.CId > cId])
+
+        self._publish('%s/posts.json' % blogId, lastCId=lastCId, total=posts.total, offsetMore=posts.offsetMore,
+                      sinceCIds=list(deltas), PostList=[self._render(post) for post in posts])
+        self._published[blogId] = (lastCId, deltas)
+
+    def _render(self, post):
+        '''
+        Renders the post as a JSON compatible dictionary.
+        '''
+        data = {}
+        for name in POST_PROPERTIES:
+            value = getattr(post, name, None)
+            if value is None: continue
+            if isinstance(value, datetime): value = str(value)
+            data[name] = value
+        return data
+
+    def _publish(self, path, **data):
+        '''
+        Publishes the data as JSON content in the snapshot CDM.
+        '''
+        self.blogSnapshotCDM.publishContent(path, BytesIO(json.dumps(data).encode('utf-8')))
+
+    def _removeDeltas(self, blogId):
+        '''
+        Removes all the delta files of the blog.
+        '''
+        self._remove('%s/since' % blogId)
+
+    def _remove(self, path):
+        '''
+        Removes the path from the snapshot CDM, ignoring the missing paths.
+        '''
+        try: self.blogSnapshotCDM.remove(path)
+        except PathNotFound: pass
@@ -0,0 +1,57 @@
+'''
+Created on Feb 15, 2013
+
+@package: livedesk
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Provides the allocation of values from the livedesk sequences.
+'''
+
+from ally.support.sqlalchemy.mapper import tableFor
+from livedesk.meta.sequence import SequenceMapped
+from sqlalchemy.exc import IntegrityError
+
+# --------------------------------------------------------------------
+
+INSERT_IGNORE = {'mysql': 'IGNORE', 'sqlite': 'OR IGNORE'}
+# The insert prefixes by database dialect that skip the rows already inserted by a concurrent transaction.
+
+# --------------------------------------------------------------------
+
+def nextValue(session, name, current):
+    '''
+    Provides the next value for the named sequence. The allocation is a single row increment, the sequence row stays
+    locked until the session transaction ends so concurrent allocations are serialized also across processes.
+
+    @param session: Session
+        The session to allocate the value with.
+    @param name: string
+        The sequence name.
+    @param current: callable() -> number|None
+        Called only if the sequence is not created yet in order to provide the maximum value already in use, the sequence
+        will continue after this value.
+    @return: integer
+        The allocated value.
+    '''
+    assert isinstance(name, str), 'Invalid sequence name %s' % name
+    assert callable(current), 'Invalid current value callable %s' % current
+
+    sql = session.query(SequenceMapped).filter(SequenceMapped.name == name)
+    if sql.update({SequenceMapped.value: SequenceMapped.value + 1}, synchronize_session=False) == 0:
+        # The sequence might be created at the same time by a concurrent allocation, so the sequence is created with the
+        # current value ignoring the duplicate and then incremented.
+        insert = tableFor(SequenceMapped).insert().values(name=name, value=int(current() or 0))
+        prefix = INSERT_IGNORE.get(session.connection().dialect.name)
+        if prefix: session.execute(insert.prefix_with(prefix))
+        else:
+            # A failed insert leaves the transaction unusable on some databases, so it is made in a savepoint.
+            savepoint = session.begin_nested()
+            try:
+                session.execute(insert)
+                savepoint.commit()
+            except IntegrityError: savepoint.rollback()
+        sql.update({SequenceMapped.value: SequenceMapped.value + 1}, synchronize_session=False)
+
+    return session.query(SequenceMapped.value).filter(SequenceMapped.name == name).scalar()
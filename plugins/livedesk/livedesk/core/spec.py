@@ -19,7 +19,170 @@ class IBlogCollaboratorGroupCleanupService(metaclass=abc.ABCMeta):
     '''
 
     @abc.abstractclassmethod
-    def cleanExpired(self):
+    def cleanExpired(self, limit=None):
         '''
         Clean the expired blog collaborator groups.
+
+        @param limit: integer|None
+            The maximum number of groups to be cleaned, None to clean all.
+        @return: integer
+            The number of cleaned groups, if equal to the limit there might be more expired groups to clean.
+        '''
+
+# --------------------------------------------------------------------
+
+class IBlogPostChangeFeed(metaclass=abc.ABCMeta):
+    '''
+    The blog post change feed specification, keeps track of the recent changes made to the blogs posts.
+    '''
+
+    @abc.abstractclassmethod
+    def register(self, blogId, postId, cId):
+        '''
+        Register a change made to a blog post, the change is available in the feed only after the current transaction has
+        been committed.
+
+        @param blogId: integer
+            The blog id of the changed post.
+        @param postId: integer
+            The id of the changed post.
+        @param cId: integer
+            The change id that has been assigned to the post.
+        '''
+
+    @abc.abstractclassmethod
+    def seed(self, blogId, lastCId):
+        '''
+        Starts the feed for the blog if is not already started, if the feed is started but the last change id read from
+        the database is greater then the feed last change id the feed window is restarted at the database change id.
+
+        @param blogId: integer
+            The blog id to start the feed for.
+        @param lastCId: integer|None
+            The last change id of the blog as read from the database.
+        '''
+
+    @abc.abstractclassmethod
+    def changesSince(self, blogId, cId):
+        '''
+        Provides the changes of the blog that occurred after the provided change id.
+
+        @param blogId: integer
+            The blog id to provide the changes for.
+        @param cId: integer
+            The change id after which to provide the changes.
+        @return: tuple(integer, list[integer])|None
+            The last change id of the blog and the ids of the posts that changed, None if the change id is outside the
+            window kept by the feed.
+        '''
+
+    @abc.abstractclassmethod
+    def lastCId(self, blogId):
+        '''
+        Provides the last change id of the blog as known by the feed, since the feed does not contain the changes made
+        by other processes the last change id is provided only for a short time after the feed was seeded.
+
+        @param blogId: integer
+            The blog id to provide the last change id for.
+        @return: integer|None
+            The last change id of the blog, None if the feed is not started for the blog or it needs to be seeded again
+            with the last change id from the database.
+        '''
+
+    @abc.abstractclassmethod
+    def waitChanges(self, blogId, cId, timeout, check=None):
+        '''
+        Blocks the calling thread until the blog has a change committed after the provided change id or the timeout
+        passes, if too many threads are already waiting the call returns right away. Only the changes committed in this
+        process wake the thread, the changes made by other processes are detected by the check.
+
+        @param blogId: integer
+            The blog id to wait the changes for.
+        @param cId: integer
+            The change id after which to wait for changes.
+        @param timeout: integer
+            The maximum number of seconds to wait, the feed can impose a lower maximum.
+        @param check: callable()|None
+            Called periodically while waiting, expected to seed the feed with the last change id from the database.
+        @return: boolean
+            True if the blog has changes after the provided change id, False if the timeout passed.
+        '''
+
+# --------------------------------------------------------------------
+
+class IBlogSnapshotPublisher(metaclass=abc.ABCMeta):
+    '''
+    The blog snapshot publisher specification, publishes the live blogs posts as static content.
+    '''
+
+    @abc.abstractclassmethod
+    def publishLive(self):
+        '''
+        Publishes the snapshots for the live blogs that changed since the last publishing, when the application runs
+        in multiple processes only one process publishes.
+        '''
+
+# --------------------------------------------------------------------
+
+class IBlogMembership(metaclass=abc.ABCMeta):
+    '''
+    The blog membership specification, provides the relation of users with the blogs.
+    '''
+
+    @abc.abstractclassmethod
+    def membershipOf(self, userId, blogId):
+        '''
+        Provides the membership of the user in the blog.
+
+        @param userId: integer
+            The user id to provide the membership for.
+        @param blogId: integer
+            The blog id to provide the membership for.
+        @return: tuple(boolean, frozenset(string))
+            True if the user is the blog creator and the names of the collaborator types the user has in the blog.
+        '''
+
+    @abc.abstractclassmethod
+    def invalidate(self, blogId):
+        '''
+        Invalidates the memberships known for the blog, used whenever the blog creator or collaborators change. The
+        memberships are invalidated again after the current transaction has been committed or rolled back.
+
+        @param blogId: integer
+            The blog id to invalidate the memberships for.
+        '''
+
+# --------------------------------------------------------------------
+
+class IBlogCollaboratorGroupAccess(metaclass=abc.ABCMeta):
+    '''
+    The blog collaborator group access specification, keeps track of the groups last access.
+    '''
+
+    @abc.abstractclassmethod
+    def touch(self, groupId):
+        '''
+        Marks the group as accessed, the access is persisted in the group last access date by the next flush.
+
+        @param groupId: integer
+            The group id to mark as accessed.
+        @raise InputError: If there is no group for the provided id.
+        '''
+
+    @abc.abstractclassmethod
+    def forget(self, groupIds):
+        '''
+        Discards the accesses of the groups, used whenever the groups are removed.
+
+        @param groupIds: Iterable(integer)
+            The group ids to discard the accesses for.
+        '''
+
+    @abc.abstractclassmethod
+    def flush(self):
+        '''
+        Persists the accesses made since the last flush in the groups last access date.
+
+        @return: integer
+            The number of updated groups.
         '''
@@ -12,11 +12,13 @@ Contains the SQL alchemy meta for blog API.
 from ..api.blog import IBlogService, QBlog, Blog
 from ..meta.blog import BlogMapped
 from ally.api.extension import IterPart
+from ally.container import wire
 from ally.container.ioc import injected
 from ally.container.support import setup
 from ally.exception import InputError, Ref
 from ally.internationalization import _
 from ally.support.sqlalchemy.util_service import buildQuery, buildLimits
+from livedesk.core.spec import IBlogMembership
 from livedesk.meta.blog_collaborator import BlogCollaboratorMapped
 from sql_alchemy.impl.entity import EntityCRUDServiceAlchemy
 from sqlalchemy.orm.exc import NoResultFound
@@ -33,10 +35,13 @@ class BlogServiceAlchemy(EntityCRUDServiceAlchemy, IBlogService):
     Implementation for @see: IBlogService
     '''
 
+    blogMembership = IBlogMembership; wire.entity('blogMembership')
+
     def __init__(self):
         '''
         Construct the blog service.
         '''
+        assert isinstance(self.blogMembership, IBlogMembership), 'Invalid blog membership %s' % self.blogMembership
         EntityCRUDServiceAlchemy.__init__(self, BlogMapped)
 
     def getBlog(self, blogId):
@@ -85,6 +90,21 @@ class BlogServiceAlchemy(EntityCRUDServiceAlchemy, IBlogService):
         if blog.CreatedOn is None: blog.CreatedOn = current_timestamp()
         return super().insert(blog)
 
+    def update(self, blog):
+        '''
+        @see: IBlogService.update
+        '''
+        assert isinstance(blog, Blog), 'Invalid blog %s' % blog
+        if Blog.Creator in blog: self.blogMembership.invalidate(blog.Id)
+        return super().update(blog)
+
+    def delete(self, id):
+        '''
+        @see: IBlogService.delete
+        '''
+        self.blogMembership.invalidate(id)
+        return super().delete(id)
+
     # ----------------------------------------------------------------
 
     def _buildQuery(self, languageId=None, userId=None, q=None):
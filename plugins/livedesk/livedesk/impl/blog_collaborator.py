@@ -20,6 +20,7 @@ from ally.internationalization import _
 from ally.support.sqlalchemy.session import SessionSupport
 from ally.support.sqlalchemy.util_service import buildQuery, buildLimits
 from livedesk.api.blog_collaborator import BlogCollaborator
+from livedesk.core.spec import IBlogMembership
 from livedesk.meta.blog import BlogMapped
 from livedesk.meta.blog_collaborator import BlogCollaboratorMapped, \
     BlogCollaboratorEntry, BlogCollaboratorTypeMapped
@@ -28,6 +29,7 @@ from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.sql.expression import not_
 from superdesk.collaborator.meta.collaborator import CollaboratorMapped
+from superdesk.core.reference import ReferenceCache
 from superdesk.security.api.user_action import IUserActionService
 from superdesk.source.meta.source import SourceMapped
 from superdesk.user.meta.user import UserMapped
@@ -64,6 +66,7 @@ class BlogCollaboratorServiceAlchemy(SessionSupport, IBlogCollaboratorService):
     
     collaboratorSpecification = CollaboratorSpecification; wire.entity('collaboratorSpecification')
     userActionService = IUserActionService; wire.entity('userActionService')
+    blogMembership = IBlogMembership; wire.entity('blogMembership')
 
     def __init__(self):
         '''
@@ -73,9 +76,11 @@ class BlogCollaboratorServiceAlchemy(SessionSupport, IBlogCollaboratorService):
         'Invalid collaborator specification %s' % self.collaboratorSpecification
         assert isinstance(self.userActionService, IUserActionService), \
         'Invalid user actions service %s' % self.userActionService
+        assert isinstance(self.blogMembership, IBlogMembership), 'Invalid blog membership %s' % self.blogMembership
         super().__init__()
         
-        self._collaboratorTypeIds = {}
+        self._cache_types = ReferenceCache(BlogCollaboratorTypeMapped, BlogCollaboratorTypeMapped.Name,
+                                           BlogCollaboratorTypeMapped.id)
 
     def getAllTypes(self):
         '''
@@ -142,8 +147,9 @@ class BlogCollaboratorServiceAlchemy(SessionSupport, IBlogCollaboratorService):
         '''
         @see: IBlogCollaboratorService.addCollaborator
         '''
-        typeId = self.collaboratorTypeIds()[typeName]
+        typeId = self.collaboratorTypeIds().get(typeName)
         if typeId is None: raise InputError(Ref(_('Invalid collaborator type'), ref=BlogCollaborator.Type))
+        self.blogMembership.invalidate(blogId)
         
         sql = self.session().query(BlogCollaboratorEntry)
         sql = sql.filter(BlogCollaboratorEntry.Blog == blogId)
@@ -168,6 +174,7 @@ class BlogCollaboratorServiceAlchemy(SessionSupport, IBlogCollaboratorService):
         '''
         @see: IBlogCollaboratorService.removeCollaborator
         '''
+        self.blogMembership.invalidate(blogId)
         try:
             sql = self.session().query(BlogCollaboratorEntry)
             sql = sql.filter(BlogCollaboratorEntry.Blog == blogId)
@@ -182,15 +189,14 @@ class BlogCollaboratorServiceAlchemy(SessionSupport, IBlogCollaboratorService):
         '''
         Provides the collaborator types ids dictionary.
         '''
-        if not self._collaboratorTypeIds:
-            for name in self.collaboratorSpecification.collaborator_types:
-                sql = self.session().query(BlogCollaboratorTypeMapped)
-                sql = sql.filter(BlogCollaboratorTypeMapped.Name == name)
-                try: bt = sql.one()
-                except NoResultFound:
-                    bt = BlogCollaboratorTypeMapped()
-                    bt.Name = name
-                    self.session().add(bt)
-                    self.session().flush((bt,))
-                self._collaboratorTypeIds[name] = bt.id
-        return self._collaboratorTypeIds
+        collaboratorTypeIds = {}
+        for name in self.collaboratorSpecification.collaborator_types:
+            typeId = self._cache_types.get(self.session(), name)
+            if typeId is None:
+                bt = BlogCollaboratorTypeMapped()
+                bt.Name = name
+                self.session().add(bt)
+                self.session().flush((bt,))
+                typeId = bt.id
+            collaboratorTypeIds[name] = typeId
+        return collaboratorTypeIds
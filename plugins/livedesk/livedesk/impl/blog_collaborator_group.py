@@ -18,10 +18,12 @@ from ally.support.sqlalchemy.mapper import InsertFromSelect, tableFor
 from ally.support.sqlalchemy.session import SessionSupport
 from datetime import timedelta
 from livedesk.api.blog_collaborator_group import IBlogCollaboratorGroupService
-from livedesk.core.spec import IBlogCollaboratorGroupCleanupService
+from livedesk.core.spec import IBlogCollaboratorGroupCleanupService, \
+    IBlogCollaboratorGroupAccess
 from livedesk.meta.blog_collaborator import BlogCollaboratorMapped
 from livedesk.meta.blog_collaborator_group import BlogCollaboratorGroupMapped, \
     BlogCollaboratorGroupMemberMapped
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.sql.expression import select
 from sqlalchemy.sql.functions import current_timestamp
@@ -43,6 +45,7 @@ class BlogCollaboratorGroupService(SessionSupport, IBlogCollaboratorGroupService
     group_timeout = 3600; wire.config('group_timeout', doc='''
     The number of seconds after which the blog collaborators group expires.
     ''')
+    blogCollaboratorGroupAccess = IBlogCollaboratorGroupAccess; wire.entity('blogCollaboratorGroupAccess')
     
     # ----------------------------------------------------------------
 
@@ -51,6 +54,8 @@ class BlogCollaboratorGroupService(SessionSupport, IBlogCollaboratorGroupService
         Construct the blog collaborators group service.
         '''
         assert isinstance(self.group_timeout, int), 'Invalid blog collaborators group timeout %s' % self.group_timeout
+        assert isinstance(self.blogCollaboratorGroupAccess, IBlogCollaboratorGroupAccess), \
+        'Invalid blog collaborator group access %s' % self.blogCollaboratorGroupAccess
         self._group_timeout = timedelta(seconds=self.group_timeout)
 
     # ----------------------------------------------------------------
@@ -107,6 +112,7 @@ class BlogCollaboratorGroupService(SessionSupport, IBlogCollaboratorGroupService
         
         self.session().query(BlogCollaboratorGroupMemberMapped).delete(groupId)
         self.session().query(BlogCollaboratorGroupMapped).filter(BlogCollaboratorGroupMapped.Id == groupId).delete()
+        self.blogCollaboratorGroupAccess.forget((groupId,))
         
         return True
 
@@ -117,7 +123,7 @@ class BlogCollaboratorGroupService(SessionSupport, IBlogCollaboratorGroupService
         @see IBlogCollaboratorGroupService.addCollaborator
         '''
         
-        updateLastAccessOn(self.session(), groupId) 
+        self.blogCollaboratorGroupAccess.touch(groupId)
         
         sql = self.session().query(BlogCollaboratorGroupMemberMapped)
         sql = sql.filter(BlogCollaboratorGroupMemberMapped.Group == groupId)
@@ -129,7 +135,11 @@ class BlogCollaboratorGroupService(SessionSupport, IBlogCollaboratorGroupService
         member.BlogCollaborator = collaboratorId
         
         self.session().add(member)
-        self.session().flush((member,))
+        try: self.session().flush((member,))
+        except IntegrityError:
+            # The group has been removed by another process while it was known as accessed.
+            self.blogCollaboratorGroupAccess.forget((groupId,))
+            raise InputError(Ref(_('No collaborator group'), ref=BlogCollaboratorGroupMapped.Id))
         
         return True
             
@@ -139,7 +149,7 @@ class BlogCollaboratorGroupService(SessionSupport, IBlogCollaboratorGroupService
         '''
         @see IBlogCollaboratorGroupService.removeCollaborator
         '''
-        updateLastAccessOn(self.session(), groupId)
+        self.blogCollaboratorGroupAccess.touch(groupId)
         sql = self.session().query(BlogCollaboratorGroupMemberMapped)
         sql = sql.filter(BlogCollaboratorGroupMemberMapped.Group == groupId)
         sql = sql.filter(BlogCollaboratorGroupMemberMapped.BlogCollaborator == collaboratorId)
@@ -149,35 +159,29 @@ class BlogCollaboratorGroupService(SessionSupport, IBlogCollaboratorGroupService
     
     # ----------------------------------------------------------------
 
-    def cleanExpired(self):
+    def cleanExpired(self, limit=None):
         '''
-        @see: ICleanupService.cleanExpired
+        @see: IBlogCollaboratorGroupCleanupService.cleanExpired
         '''
+        # The accesses are persisted first so no accessed group is considered expired.
+        self.blogCollaboratorGroupAccess.flush()
         olderThan = self.session().query(current_timestamp()).scalar()
 
         # Cleaning expirated blog collaborators groups
-        sqlIn = self.session().query(BlogCollaboratorGroupMapped.Id)
-        sqlIn = sqlIn.filter(BlogCollaboratorGroupMapped.LastAccessOn <= olderThan - self._group_timeout)
+        sql = self.session().query(BlogCollaboratorGroupMapped.Id)
+        sql = sql.filter(BlogCollaboratorGroupMapped.LastAccessOn <= olderThan - self._group_timeout)
+        if limit is not None: sql = sql.limit(limit)
+        groupIds = [groupId for groupId, in sql.all()]
+        if not groupIds: return 0
         
         sql = self.session().query(BlogCollaboratorGroupMemberMapped)
-        sql = sql.filter(BlogCollaboratorGroupMemberMapped.Group.in_(sqlIn))
-        sql.delete(synchronize_session='fetch')
+        sql = sql.filter(BlogCollaboratorGroupMemberMapped.Group.in_(groupIds))
+        sql.delete(synchronize_session=False)
         
         sql = self.session().query(BlogCollaboratorGroupMapped)
-        sql = sql.filter(BlogCollaboratorGroupMapped.LastAccessOn <= olderThan - self._group_timeout)
-        deleted = sql.delete(synchronize_session='fetch')
+        sql = sql.filter(BlogCollaboratorGroupMapped.Id.in_(groupIds))
+        sql.delete(synchronize_session=False)
+        self.blogCollaboratorGroupAccess.forget(groupIds)
         
-        assert log.debug('Cleaned \'%s\' expired authentication requests', deleted) or True
-
-# ----------------------------------------------------------------    
-
-def updateLastAccessOn(session, groupId):
-    sql = session.query(BlogCollaboratorGroupMapped)
-    sql = sql.filter(BlogCollaboratorGroupMapped.Id == groupId)
-
-    try: group = sql.one()
-    except NoResultFound: raise InputError(Ref(_('No collaborator group'), ref=BlogCollaboratorGroupMapped.Id))
-    
-    group.LastAccessOn = current_timestamp()
-    session.add(group) 
-    session.flush((group,))
+        assert log.debug('Cleaned \'%s\' expired blog collaborator groups', len(groupIds)) or True
+        return len(groupIds)
@@ -12,15 +12,21 @@ Contains the SQL alchemy meta for livedesk blog posts API.
 
 from ..api.blog_post import IBlogPostService, QBlogPostUnpublished, \
     QBlogPostPublished
+from ..meta.blog import BlogMapped
 from ..meta.blog_post import BlogPostMapped, BlogPostEntry
 from ally.container import wire
 from ally.container.ioc import injected
 from ally.container.support import setup
 from ally.exception import InputError, Ref
+from ally.api.criteria import AsRangeOrdered
 from ally.internationalization import _
-from ally.support.sqlalchemy.session import SessionSupport
+from ally.support.sqlalchemy.session import SessionSupport, commitNow
+from ally.support.api.util_service import namesForQuery, copy
 from ally.support.sqlalchemy.util_service import buildQuery, buildLimits
+from collections import OrderedDict
 from livedesk.api.blog_post import QBlogPost, QWithCId, BlogPost, IterPost
+from livedesk.core.impl.sequence import nextValue
+from livedesk.core.spec import IBlogPostChangeFeed, IBlogCollaboratorGroupAccess
 from livedesk.meta.blog_collaborator_group import BlogCollaboratorGroupMemberMapped
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.orm.util import aliased
@@ -30,10 +36,11 @@ from sqlalchemy.sql.functions import current_timestamp
 from sqlalchemy.sql.operators import desc_op
 from superdesk.collaborator.meta.collaborator import CollaboratorMapped
 from superdesk.person.meta.person import PersonMapped
-from superdesk.person_icon.api.person_icon import IPersonIconService
+from superdesk.person_icon.core.spec import IPersonIconResolver
 from superdesk.post.api.post import IPostService, Post, QPostUnpublished
 from superdesk.post.meta.type import PostTypeMapped
-from livedesk.impl.blog_collaborator_group import updateLastAccessOn
+from threading import Lock
+import hashlib
 
 # --------------------------------------------------------------------
 
@@ -47,14 +54,42 @@ class BlogPostServiceAlchemy(SessionSupport, IBlogPostService):
     '''
 
     postService = IPostService; wire.entity('postService')
-    personIconService = IPersonIconService; wire.entity('personIconService')
+    personIconResolver = IPersonIconResolver; wire.entity('personIconResolver')
+    blogPostChangeFeed = IBlogPostChangeFeed; wire.entity('blogPostChangeFeed')
+    blogCollaboratorGroupAccess = IBlogCollaboratorGroupAccess; wire.entity('blogCollaboratorGroupAccess')
+    published_cache_blogs = 100; wire.config('published_cache_blogs', doc='''
+    The number of blogs for which the published posts pages are kept in memory, the cached pages of a blog are dropped
+    as soon as the last change id of the blog in the database moves. Set to 0 in order to disable the published posts
+    cache.
+    ''')
+    published_cache_pages = 20; wire.config('published_cache_pages', doc='''
+    The maximum number of published posts pages (distinct request parameters) to keep in memory for a blog.
+    ''')
+    changes_limit = 1000; wire.config('changes_limit', doc='''
+    The maximum number of changed posts provided by a changes request that is answered from the database, the last
+    change id of the reply is then the change id of the last provided post so the remaining changes are provided by
+    the next request.
+    ''')
 
     def __init__(self):
         '''
         Construct the blog post service.
         '''
         assert isinstance(self.postService, IPostService), 'Invalid post service %s' % self.postService
-        assert isinstance(self.personIconService, IPersonIconService), 'Invalid person icon service %s' % self.personIconService
+        assert isinstance(self.personIconResolver, IPersonIconResolver), \
+        'Invalid person icon resolver %s' % self.personIconResolver
+        assert isinstance(self.blogPostChangeFeed, IBlogPostChangeFeed), \
+        'Invalid blog post change feed %s' % self.blogPostChangeFeed
+        assert isinstance(self.blogCollaboratorGroupAccess, IBlogCollaboratorGroupAccess), \
+        'Invalid blog collaborator group access %s' % self.blogCollaboratorGroupAccess
+        assert isinstance(self.published_cache_blogs, int), 'Invalid published cache blogs %s' % self.published_cache_blogs
+        assert isinstance(self.published_cache_pages, int), 'Invalid published cache pages %s' % self.published_cache_pages
+        assert isinstance(self.changes_limit, int), 'Invalid changes limit %s' % self.changes_limit
+
+        self._cache_published = OrderedDict()
+        # The published pages cache, blog id -> (last change id, OrderedDict(parameters key -> page)), the pages contain
+        # plain copies of the posts so no session bound instances are shared between requests.
+        self._cache_lock = Lock()
 
     def getById(self, blogId, postId, thumbSize=None):
         '''
@@ -69,11 +104,23 @@ class BlogPostServiceAlchemy(SessionSupport, IBlogPostService):
         except NoResultFound: raise InputError(Ref(_('No such blog post'), ref=BlogPostMapped.Id))
 
     def getPublished(self, blogId, typeId=None, creatorId=None, authorId=None, thumbSize=None, offset=None, limit=None,
-                     detailed=False, q=None):
+                     detailed=False, wait=None, eTag=None, after=None, q=None):
         '''
         @see: IBlogPostService.getPublished
         '''
         assert q is None or isinstance(q, QBlogPostPublished), 'Invalid query %s' % q
+        if wait and q and QWithCId.cId in q and AsRangeOrdered.since in q.cId: self._waitChanges(blogId, q.cId.since, wait)
+
+        key = self._publishedKey(typeId, creatorId, authorId, thumbSize, offset, limit, detailed, after, q)
+        if key is not None or detailed: lastCId = self._lastCId(blogId)
+        if key is not None:
+            tag = self._publishedTag(blogId, lastCId, key)
+            # The not modified marker is only available on the detailed posts, a plain empty list means no posts.
+            if detailed and eTag == tag:
+                return self._publishedPage(((), None, None, lastCId, tag), offset, limit, detailed, True)
+            page = self._publishedCached(blogId, lastCId, key)
+            if page is not None: return self._publishedPage(page, offset, limit, detailed)
+        else: tag = None
 
         sql = self._filterQuery(blogId, typeId, creatorId, authorId)
         sqlMore = None
@@ -86,20 +133,53 @@ class BlogPostServiceAlchemy(SessionSupport, IBlogPostService):
         if not sqlMore:
             sql = sql.filter((BlogPostMapped.PublishedOn != None) & (BlogPostMapped.DeletedOn == None))
 
-        sql = sql.order_by(desc_op(BlogPostMapped.Order))
-
-        sqlLimit = buildLimits(sql, offset, limit)
+        sqlLimit = self._buildLimits(sql, offset, limit, after)
         posts = self._addImages(self._trimPosts(sqlLimit.all()), thumbSize)
+        if key is not None:
+            posts = [copy(post, BlogPost()) if isinstance(post, BlogPostMapped) else post for post in posts]
         if detailed:
-            posts = IterPost(posts, sql.count(), offset, limit)
-
-            posts.lastCId = self.session().query(func.MAX(BlogPostMapped.CId)).filter(BlogPostMapped.Blog == blogId).scalar()
-            if sqlMore: posts.offsetMore = sqlMore.count()
-            else: posts.offsetMore = posts.total
+            total = sql.count()
+            page = (posts, total, sqlMore.count() if sqlMore else total, lastCId, tag)
+        else: page = (posts, None, None, None, tag)
+
+        if key is not None: self._publishedCache(blogId, lastCId, key, page)
+        return self._publishedPage(page, offset, limit, detailed)
+
+    def getChanges(self, blogId, cId=None, thumbSize=None, detailed=False, wait=None):
+        '''
+        @see: IBlogPostService.getChanges
+        '''
+        if cId is None: cId = 0
+        if wait: self._waitChanges(blogId, cId, wait)
+
+        # The last change id is provided by the feed, the database is read only when the feed needs to be seeded again.
+        lastCId, limited = self.blogPostChangeFeed.lastCId(blogId), False
+        if lastCId is None or lastCId < cId: lastCId = self._readLastCId(blogId) or 0
+        changes = self.blogPostChangeFeed.changesSince(blogId, cId) if lastCId > cId else (lastCId, ())
+        if changes is None:
+            # The change id is outside the feed window so we need to get the changes from the database.
+            sql = self.session().query(BlogPostMapped).filter(BlogPostMapped.Blog == blogId)
+            sql = sql.filter(BlogPostMapped.CId > cId)
+            posts = sql.order_by(BlogPostMapped.CId).limit(self.changes_limit).all()
+            if len(posts) == self.changes_limit: lastCId, limited = posts[-1].CId, True
+            posts.sort(key=lambda post: (post.Order is not None, post.Order or 0), reverse=True)
+        else:
+            lastCId, postIds = changes
+            if postIds:
+                sql = self.session().query(BlogPostMapped).filter(BlogPostMapped.Blog == blogId)
+                sql = sql.filter(BlogPostMapped.Id.in_(postIds))
+                posts = sql.order_by(desc_op(BlogPostMapped.Order)).all()
+            else: posts = ()
+
+        posts = list(self._addImages(self._trimPosts(posts), thumbSize))
+        if detailed:
+            if not limited: lastCId = max([lastCId or 0] + [post.CId for post in posts if post.CId is not None])
+            posts = IterPost(posts, len(posts), None, None)
+            posts.lastCId = lastCId
         return posts
 
     def getUnpublished(self, blogId, typeId=None, creatorId=None, authorId=None, thumbSize=None, offset=None, limit=None,
-                       detailed=False, q=None):
+                       detailed=False, after=None, q=None):
         '''
         @see: IBlogPostService.getUnpublished
         '''
@@ -118,13 +198,12 @@ class BlogPostServiceAlchemy(SessionSupport, IBlogPostService):
         if not sqlMore:
             sql = sql.filter((BlogPostMapped.PublishedOn == None) & (BlogPostMapped.DeletedOn == None))
 
-        sql = sql.order_by(desc_op(BlogPostMapped.Order))
-        sqlLimit = buildLimits(sql, offset, limit)
+        sqlLimit = self._buildLimits(sql, offset, limit, after)
         posts = self._addImages(self._trimPosts(sqlLimit.all(), unpublished=False, published=True), thumbSize)
         if detailed:
             posts = IterPost(posts, sql.count(), offset, limit)
 
-            posts.lastCId = self.session().query(func.MAX(BlogPostMapped.CId)).filter(BlogPostMapped.Blog == blogId).scalar()
+            posts.lastCId = self._lastCId(blogId)
             if sqlMore: posts.offsetMore = sqlMore.count()
             else: posts.offsetMore = posts.total
         return posts
@@ -135,7 +214,7 @@ class BlogPostServiceAlchemy(SessionSupport, IBlogPostService):
         '''
         assert q is None or isinstance(q, QBlogPostUnpublished), 'Invalid query %s' % q
 
-        updateLastAccessOn(self.session(), groupId)
+        self.blogCollaboratorGroupAccess.touch(groupId)
 
         sql = self._buildQuery(blogId, typeId, None, authorId, q)
         sql = sql.filter(BlogPostMapped.PublishedOn == None)
@@ -164,15 +243,15 @@ class BlogPostServiceAlchemy(SessionSupport, IBlogPostService):
         sql = buildLimits(sql, offset, limit)
         return sql.all()
 
-    def getAll(self, blogId, typeId=None, creatorId=None, authorId=None, thumbSize=None, offset=None, limit=None, q=None):
+    def getAll(self, blogId, typeId=None, creatorId=None, authorId=None, thumbSize=None, offset=None, limit=None,
+               after=None, q=None):
         '''
         @see: IBlogPostService.getAll
         '''
         assert q is None or isinstance(q, QBlogPost), 'Invalid query %s' % q
         sql = self._buildQuery(blogId, typeId, creatorId, authorId, q)
 
-        sql = sql.order_by(desc_op(BlogPostMapped.Order))
-        sql = buildLimits(sql, offset, limit)
+        sql = self._buildLimits(sql, offset, limit, after)
         return self._addImages(sql.all(), thumbSize)
 
     def insert(self, blogId, post):
@@ -185,6 +264,7 @@ class BlogPostServiceAlchemy(SessionSupport, IBlogPostService):
         postEntry.CId = self._nextCId()
         postEntry.Order = self._nextOrdering(blogId)
         self.session().add(postEntry)
+        self.blogPostChangeFeed.register(blogId, postEntry.blogPostId, postEntry.CId)
 
         return postEntry.blogPostId
 
@@ -199,11 +279,13 @@ class BlogPostServiceAlchemy(SessionSupport, IBlogPostService):
 
         post.PublishedOn = current_timestamp()
         self.postService.update(post)
+        self._updateBlog(blogId, post)
 
         postEntry = BlogPostEntry(Blog=blogId, blogPostId=post.Id)
         postEntry.CId = self._nextCId()
         postEntry.Order = self._nextOrdering(blogId)
         self.session().merge(postEntry)
+        self.blogPostChangeFeed.register(blogId, postId, postEntry.CId)
 
         return postId
 
@@ -218,6 +300,7 @@ class BlogPostServiceAlchemy(SessionSupport, IBlogPostService):
         postEntry.Order = self._nextOrdering(blogId)
         self.session().add(postEntry)
         self.session().query(BlogPostMapped).get(postEntry.blogPostId).PublishedOn = current_timestamp()
+        self.blogPostChangeFeed.register(blogId, postEntry.blogPostId, postEntry.CId)
 
         return postEntry.blogPostId
 
@@ -232,10 +315,12 @@ class BlogPostServiceAlchemy(SessionSupport, IBlogPostService):
 
         post.PublishedOn = None
         self.postService.update(post)
+        self._updateBlog(blogId, post)
 
         postEntry = BlogPostEntry(Blog=blogId, blogPostId=post.Id)
         postEntry.CId = self._nextCId()
         self.session().merge(postEntry)
+        self.blogPostChangeFeed.register(blogId, postId, postEntry.CId)
 
         return postId
 
@@ -246,10 +331,12 @@ class BlogPostServiceAlchemy(SessionSupport, IBlogPostService):
         assert isinstance(post, Post), 'Invalid post %s' % post
 
         self.postService.update(post)
+        self._updateBlog(blogId, post)
 
         postEntry = BlogPostEntry(Blog=blogId, blogPostId=post.Id)
         postEntry.CId = self._nextCId()
         self.session().merge(postEntry)
+        self.blogPostChangeFeed.register(blogId, post.Id, postEntry.CId)
 
     def reorder(self, blogId, postId, refPostId, before=True):
         '''
@@ -277,7 +364,7 @@ class BlogPostServiceAlchemy(SessionSupport, IBlogPostService):
         orderPrev = sql.scalar()
 
         if orderPrev: order = (order + orderPrev) / 2
-        elif before: order += 1
+        elif before: order = self._nextOrdering(blogId)
         else: order -= 1
 
         sql = self.session().query(BlogPostMapped)
@@ -290,6 +377,7 @@ class BlogPostServiceAlchemy(SessionSupport, IBlogPostService):
         post.Order = order
         post.CId = self._nextCId()
         self.session().merge(post)
+        self.blogPostChangeFeed.register(blogId, postId, post.CId)
 
     def delete(self, id):
         '''
@@ -301,6 +389,7 @@ class BlogPostServiceAlchemy(SessionSupport, IBlogPostService):
                 assert isinstance(postEntry, BlogPostEntry)
                 postEntry.CId = self._nextCId()
                 self.session().flush((postEntry,))
+                self.blogPostChangeFeed.register(postEntry.Blog, id, postEntry.CId)
             return True
         return False
 
@@ -334,6 +423,21 @@ class BlogPostServiceAlchemy(SessionSupport, IBlogPostService):
 
         return sql
 
+    def _buildLimits(self, sql, offset, limit, after):
+        '''
+        Orders the posts query descending by order and id and applies the limits, if an after cursor is provided the
+        posts are seeked by the cursor instead of being skipped by the offset.
+        '''
+        sql = sql.order_by(desc_op(BlogPostMapped.Order)).order_by(desc_op(BlogPostMapped.Id))
+        if after is None: return buildLimits(sql, offset, limit)
+
+        try:
+            order, postId = after.split(':')
+            order, postId = float(order), int(postId)
+        except ValueError: raise InputError(Ref(_('Invalid after cursor, expected {Order}:{Id}')))
+        sql = sql.filter((BlogPostMapped.Order < order) | ((BlogPostMapped.Order == order) & (BlogPostMapped.Id < postId)))
+        return buildLimits(sql, None, limit)
+
     def _trimPosts(self, posts, deleted=True, unpublished=True, published=False):
         '''
         Trim the information from the deleted posts.
@@ -352,38 +456,143 @@ class BlogPostServiceAlchemy(SessionSupport, IBlogPostService):
             else:
                 yield post
 
+    def _lastCId(self, blogId):
+        '''
+        Provides the last change id of the blog as read from the database, the change feed of this process does not
+        contain the changes made by other processes.
+        '''
+        return self._readLastCId(blogId) or None
+
+    def _readLastCId(self, blogId):
+        '''
+        Reads the last change id of the blog from the database and seeds the change feed with it.
+        '''
+        lastCId = self.session().query(func.MAX(BlogPostMapped.CId)).filter(BlogPostMapped.Blog == blogId).scalar()
+        self.blogPostChangeFeed.seed(blogId, lastCId)
+        return lastCId
+
+    def _publishedKey(self, typeId, creatorId, authorId, thumbSize, offset, limit, detailed, after, q):
+        '''
+        Provides the published pages key for the request parameters, None if the request can not be cached or tagged.
+        Only the queries that filter on the change id and order have a key.
+        '''
+        key = [typeId, creatorId, authorId, thumbSize, offset, limit, detailed, after]
+        if q:
+            for name in namesForQuery(QBlogPostPublished):
+                if getattr(QBlogPostPublished, name) not in q: continue
+                if name not in ('cId', 'order'): return None
+                crt = getattr(q, name)
+                assert isinstance(crt, AsRangeOrdered)
+                key.append(name)
+                for prop in ('start', 'since', 'end', 'until', 'ascending', 'priority'):
+                    key.append(getattr(crt, prop) if getattr(crt.__class__, prop) in crt else None)
+        return tuple(key)
+
+    def _publishedTag(self, blogId, lastCId, key):
+        '''
+        Provides the entity tag for the published page, the tag is the same across application processes.
+        '''
+        return '%s-%s-%s' % (blogId, lastCId or 0, hashlib.md5(repr(key).encode()).hexdigest()[:16])
+
+    def _publishedCached(self, blogId, lastCId, key):
+        '''
+        Provides the cached published page for the blog, None if there is no page cached for the last change id.
+        '''
+        if self.published_cache_blogs <= 0 or self.published_cache_pages <= 0: return None
+        with self._cache_lock:
+            cached = self._cache_published.get(blogId)
+            if cached is None or cached[0] != lastCId: return None
+            page = cached[1].get(key)
+            if page is not None:
+                self._cache_published.move_to_end(blogId)
+                cached[1].move_to_end(key)
+            return page
+
+    def _publishedCache(self, blogId, lastCId, key, page):
+        '''
+        Caches the published page for the blog and last change id, the pages cached for other change ids are dropped.
+        '''
+        if self.published_cache_blogs <= 0 or self.published_cache_pages <= 0: return
+        with self._cache_lock:
+            cached = self._cache_published.get(blogId)
+            if cached is None or cached[0] != lastCId:
+                cached = self._cache_published[blogId] = (lastCId, OrderedDict())
+            self._cache_published.move_to_end(blogId)
+            cached[1][key] = page
+            while len(cached[1]) > self.published_cache_pages: cached[1].popitem(last=False)
+            while len(self._cache_published) > self.published_cache_blogs: self._cache_published.popitem(last=False)
+
+    def _publishedPage(self, page, offset, limit, detailed, notModified=None):
+        '''
+        Provides the published posts for the page, the posts collection is created for each request so the cached page
+        can be shared.
+        '''
+        posts, total, offsetMore, lastCId, tag = page
+        if not detailed: return list(posts)
+        posts = IterPost(list(posts), total, offset, limit)
+        posts.lastCId = lastCId
+        posts.offsetMore = offsetMore
+        posts.eTag = tag
+        posts.notModified = notModified
+        return posts
+
+    def _waitChanges(self, blogId, cId, wait):
+        '''
+        Waits for the blog to have changes after the provided change id, returns immediately if there are already changes.
+        '''
+        lastCId = self._readLastCId(blogId)
+        if lastCId and lastCId > cId: return
+
+        commitNow()
+        # We commit in order to release the database connection while waiting.
+
+        def check():
+            # The changes made by other processes are seen only in the database.
+            self._readLastCId(blogId)
+            commitNow()
+        self.blogPostChangeFeed.waitChanges(blogId, cId, wait, check)
+
+    def _updateBlog(self, blogId, post):
+        '''
+        Updates the blog updated on date with the update date of the changed post, the blog date never moves back.
+        '''
+        assert isinstance(post, Post), 'Invalid post %s' % post
+        updatedOn = post.UpdatedOn if post.UpdatedOn is not None else current_timestamp()
+        sql = self.session().query(BlogMapped).filter(BlogMapped.Id == blogId)
+        sql = sql.filter((BlogMapped.UpdatedOn == None) | (BlogMapped.UpdatedOn < updatedOn))
+        sql.update({BlogMapped.UpdatedOn: updatedOn}, synchronize_session=False)
+
     def _nextCId(self):
         '''
         Provides the next change Id.
         '''
-        max = self.session().query(fn.max(BlogPostMapped.CId)).scalar()
-        if max: return max + 1
-        return 1
+        return nextValue(self.session(), 'livedesk_post.id_change',
+                         lambda: self.session().query(fn.max(BlogPostMapped.CId)).scalar())
 
     def _nextOrdering(self, blogId):
         '''
         Provides the next ordering.
         '''
-        max = self.session().query(fn.max(BlogPostMapped.Order)).filter(BlogPostMapped.Blog == blogId).scalar()
-        if max: return max + 1
-        return 1
+        return nextValue(self.session(), 'livedesk_post.ordering.%s' % blogId,
+                         lambda: self.session().query(fn.max(BlogPostMapped.Order)).filter(BlogPostMapped.Blog == blogId).scalar())
 
-    # TODO: nasty
     def _addImage(self, post, thumbSize='medium'):
         '''
         Takes the image for the author or creator and adds the thumbnail to the response
         '''
-        assert isinstance(post, BlogPost)
-        id = post.AuthorPerson if post.AuthorPerson is not None else post.Creator
-
-        try:
-            if id is not None:
-                post.AuthorImage = self.personIconService.getByPersonId(id=id, thumbSize=thumbSize).Thumbnail
-        except: pass
-
+        self._addImages((post,), thumbSize)
         return post
 
     def _addImages(self, posts, thumbSize='medium'):
-        for post in posts:
-            post = self._addImage(post, thumbSize)
-            yield post
+        '''
+        Takes the images for the authors or creators of the posts and adds the thumbnails to the response, the images for
+        all the posts are resolved at once.
+        '''
+        posts = list(posts)
+        personIds = [post.AuthorPerson if post.AuthorPerson is not None else post.Creator for post in posts]
+        thumbnails = self.personIconResolver.thumbnailsFor(set(personIds), thumbSize=thumbSize)
+        for post, personId in zip(posts, personIds):
+            assert isinstance(post, BlogPost)
+            thumbnail = thumbnails.get(personId)
+            if thumbnail is not None: post.AuthorImage = thumbnail
+        return posts
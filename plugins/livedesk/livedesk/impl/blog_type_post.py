@@ -21,11 +21,13 @@ from sqlalchemy.orm.util import aliased
 from sqlalchemy.sql import functions as fn
 from superdesk.person.meta.person import PersonMapped
 from superdesk.post.api.post import IPostService, Post
+from superdesk.post.impl.post import sanitizeText
 from superdesk.post.meta.type import PostTypeMapped
 from sqlalchemy.sql.operators import desc_op
 from livedesk.api.blog_type_post import IBlogTypePostService, BlogTypePost, \
     QBlogTypePost, BlogTypePostPersist
 from livedesk.meta.blog_type_post import BlogTypePostMapped, BlogTypePostEntry
+from livedesk.core.impl.sequence import nextValue
 
 # --------------------------------------------------------------------
 
@@ -76,7 +78,7 @@ class BlogTypePostServiceAlchemy(SessionSupport, IBlogTypePostService):
 
         postEntry = BlogTypePostEntry(BlogType=blogTypeId, blogTypePostId=self.postService.insert(post))
         postEntry.Order = self._nextOrdering(blogTypeId)
-        postEntry.Name = post.Name
+        postEntry.Name = sanitizeText(post.Name)
         self.session().add(postEntry)
         self.session().flush((postEntry,))
 
@@ -118,7 +120,8 @@ class BlogTypePostServiceAlchemy(SessionSupport, IBlogTypePostService):
         orderPrev = sql.scalar()
 
         if orderPrev is not None: order = (order + orderPrev) / 2
-        else: order = order - 1 if before else order + 1
+        elif before: order -= 1
+        else: order = self._nextOrdering(blogTypeId)
 
         post = self.getById(blogTypeId, postId)
         assert isinstance(post, BlogTypePostMapped)
@@ -171,6 +174,6 @@ class BlogTypePostServiceAlchemy(SessionSupport, IBlogTypePostService):
         '''
         Provides the next ordering.
         '''
-        max = self.session().query(fn.max(BlogTypePostMapped.Order)).filter(BlogTypePostMapped.BlogType == blogTypeId).scalar()
-        if max: return max + 1
-        return 1
+        return nextValue(self.session(), 'livedesk_blog_type_post.ordering.%s' % blogTypeId,
+                         lambda: self.session().query(fn.max(BlogTypePostMapped.Order)).
+                         filter(BlogTypePostMapped.BlogType == blogTypeId).scalar())
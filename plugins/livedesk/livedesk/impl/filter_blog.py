@@ -14,9 +14,7 @@ from ally.container.support import setup
 from ally.support.sqlalchemy.session import SessionSupport
 from livedesk.api.filter_blog import IBlogAdminFilterService, \
     IBlogCollaboratorFilterService
-from livedesk.meta.blog import BlogMapped
-from livedesk.meta.blog_collaborator import BlogCollaboratorMapped, \
-    BlogCollaboratorTypeMapped
+from livedesk.core.spec import IBlogMembership
 
 # --------------------------------------------------------------------
 
@@ -26,25 +24,20 @@ class BlogFilterServiceAlchemyBase(SessionSupport):
     '''
     
     collaborator_types = list
+    blogMembership = IBlogMembership
     
     def __init__(self):
         assert isinstance(self.collaborator_types, list), 'Invalid collaborator types %s' % self.collaborator_types
+        assert isinstance(self.blogMembership, IBlogMembership), 'Invalid blog membership %s' % self.blogMembership
         super().__init__()
     
     def isAllowed(self, userId, blogId):
         '''
         @see: IBlogAdminFilterService.isAllowed
         '''
-        sql = self.session().query(BlogMapped.Id)
-        sql = sql.filter(BlogMapped.Id == blogId)
-        sql = sql.filter(BlogMapped.Creator == userId)
-        if sql.count() > 0: return True
-        
-        sql = self.session().query(BlogCollaboratorMapped.Id)
-        sql = sql.join(BlogCollaboratorTypeMapped)
-        sql = sql.filter(BlogCollaboratorMapped.Blog == blogId)
-        sql = sql.filter((BlogCollaboratorMapped.User == userId) & BlogCollaboratorTypeMapped.Name.in_(self.collaborator_types))
-        return sql.count() > 0
+        isCreator, types = self.blogMembership.membershipOf(userId, blogId)
+        if isCreator: return True
+        return not types.isdisjoint(self.collaborator_types)
 
 # --------------------------------------------------------------------
 
@@ -57,6 +50,7 @@ class BlogAdminFilterServiceAlchemy(BlogFilterServiceAlchemyBase, IBlogAdminFilt
     collaborator_types = ['Administrator']; wire.config('collaborator_types', doc='''
     The collaborator type(s) name associated with the administrator filter.
     ''')
+    blogMembership = IBlogMembership; wire.entity('blogMembership')
     
     def __init__(self): super().__init__()
         
@@ -69,5 +63,6 @@ class BlogCollaboratorFilterServiceAlchemy(BlogFilterServiceAlchemyBase, IBlogCo
     collaborator_types = ['Administrator', 'Collaborator']; wire.config('collaborator_types', doc='''
     The collaborator type(s) name associated with the collaborator filter.
     ''')
+    blogMembership = IBlogMembership; wire.entity('blogMembership')
     
     def __init__(self): super().__init__()
@@ -16,8 +16,7 @@ from superdesk.meta.metadata_superdesk import Base
 from superdesk.language.meta.language import LanguageEntity
 from superdesk.user.meta.user import UserMapped
 from sqlalchemy.types import String, DateTime, Text
-from sqlalchemy.orm import column_property
-from sqlalchemy.sql.expression import select, func, case
+from sqlalchemy.sql.expression import case
 from ally.support.sqlalchemy.mapper import validate
 from ally.container.binder_op import validateManaged
 from livedesk.meta.blog_type import BlogTypeMapped
@@ -25,7 +24,7 @@ from sqlalchemy.ext.hybrid import hybrid_property
 
 # --------------------------------------------------------------------
 
-@validate(exclude=('CreatedOn',))
+@validate(exclude=('CreatedOn', 'UpdatedOn'))
 class BlogMapped(Base, Blog):
     '''
     Provides the mapping for Blog.
@@ -44,6 +43,7 @@ class BlogMapped(Base, Blog):
     CreatedOn = Column('created_on', DateTime, nullable=False)
     LiveOn = Column('live_on', DateTime)
     ClosedOn = Column('closed_on', DateTime)
+    UpdatedOn = Column('updated_on', DateTime)
     @hybrid_property
     def IsLive(self):
         return self.LiveOn is not None and self.ClosedOn is None
@@ -55,9 +55,4 @@ class BlogMapped(Base, Blog):
         return case([((cls.LiveOn != None) & (cls.ClosedOn == None), True)], else_=False)
 
 validateManaged(BlogMapped.CreatedOn)
-
-# --------------------------------------------------------------------
-
-from livedesk.meta.blog_post import BlogPostMapped
-BlogMapped.UpdatedOn = column_property(select([func.max(BlogPostMapped.UpdatedOn)]).
-                                       where(BlogPostMapped.Blog == BlogMapped.Id))
+validateManaged(BlogMapped.UpdatedOn)
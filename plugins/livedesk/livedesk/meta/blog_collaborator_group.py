@@ -29,7 +29,7 @@ class BlogCollaboratorGroupMapped(Base, BlogCollaboratorGroup):
     
     Id = Column('id', INTEGER(unsigned=True), primary_key=True)
     Blog = Column('fk_blog_id', ForeignKey(BlogMapped.Id, ondelete='CASCADE'), nullable=False)
-    LastAccessOn = Column('last_access_on', DateTime, nullable=False)
+    LastAccessOn = Column('last_access_on', DateTime, nullable=False, index=True)
 
 # --------------------------------------------------------------------
 
@@ -14,7 +14,7 @@ from livedesk.meta.blog import BlogMapped
 from sqlalchemy.dialects.mysql.base import INTEGER
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.schema import Column, ForeignKey
+from sqlalchemy.schema import Column, ForeignKey, Index
 from sqlalchemy.sql.expression import case
 from superdesk.meta.metadata_superdesk import Base
 from superdesk.post.meta.post import PostMapped
@@ -41,6 +41,8 @@ class BlogPostEntry(Base, BlogPostDefinition):
     '''
     Provides the mapping for BlogPost table where it keeps the connection between the post and the blog.
     '''
+    __table_args__ = (Index('ix_livedesk_post_change', 'fk_blog_id', 'id_change'),
+                      Index('ix_livedesk_post_ordering', 'fk_blog_id', 'ordering'), BlogPostDefinition.__table_args__)
 
 class BlogPostMapped(BlogPostDefinition, PostMapped, BlogPost):
     '''
@@ -0,0 +1,28 @@
+'''
+Created on Feb 18, 2013
+
+@package: livedesk
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Contains the SQL alchemy meta for livedesk snapshots publishing.
+'''
+
+from sqlalchemy.schema import Column
+from sqlalchemy.types import String, DateTime
+from superdesk.meta.metadata_superdesk import Base
+
+# --------------------------------------------------------------------
+
+class BlogSnapshotOwnerMapped(Base):
+    '''
+    Provides the mapping for the application process that owns the snapshots publishing.
+    This is not a REST model.
+    '''
+    __tablename__ = 'livedesk_snapshot_owner'
+    __table_args__ = dict(mysql_engine='InnoDB')
+
+    name = Column('name', String(190), primary_key=True)
+    owner = Column('owner', String(32), nullable=False)
+    expiresOn = Column('expires_on', DateTime, nullable=False)
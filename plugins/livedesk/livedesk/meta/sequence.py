@@ -0,0 +1,27 @@
+'''
+Created on Feb 15, 2013
+
+@package: livedesk
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Contains the SQL alchemy meta for livedesk sequences.
+'''
+
+from sqlalchemy.schema import Column
+from sqlalchemy.types import String, Integer
+from superdesk.meta.metadata_superdesk import Base
+
+# --------------------------------------------------------------------
+
+class SequenceMapped(Base):
+    '''
+    Provides the mapping for the sequences used in allocating change ids and orderings.
+    This is not a REST model.
+    '''
+    __tablename__ = 'livedesk_sequence'
+    __table_args__ = dict(mysql_engine='InnoDB')
+
+    name = Column('name', String(190), primary_key=True)
+    value = Column('value', Integer, nullable=False)
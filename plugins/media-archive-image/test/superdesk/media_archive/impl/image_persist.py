@@ -0,0 +1,118 @@
+'''
+Created on Feb 26, 2013
+
+@package: superdesk media archive
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Ioan v. Pocol
+
+Provides unit testing for the facets of the uploaded images.
+'''
+
+# Required in order to register the package extender whenever the unit test is run.
+if True:
+    import package_extender
+    package_extender.PACKAGE_EXTENDER.setForUnitTest(True)
+
+# --------------------------------------------------------------------
+
+from datetime import datetime
+from sqlalchemy.engine import create_engine
+from sqlalchemy.orm.session import sessionmaker
+from superdesk.media_archive.api.image_data import QImageData
+from superdesk.media_archive.api.image_info import QImageInfo
+from superdesk.media_archive.api.meta_data import QMetaData
+from superdesk.media_archive.api.meta_info import QMetaInfo
+from superdesk.media_archive.core.impl import db_search
+from superdesk.media_archive.core.impl.db_search import SqlSearchProvider
+from superdesk.media_archive.core.spec import QueryIndexer
+from superdesk.media_archive.meta import meta_data
+from superdesk.media_archive.meta.image_data import ImageDataEntry
+from superdesk.media_archive.meta.image_info import ImageInfoEntry, ImageInfoMapped
+from superdesk.media_archive.meta.meta_data import MetaDataMapped
+from superdesk.media_archive.meta.meta_facet import MetaFacet, FacetCount
+from superdesk.media_archive.meta.meta_info import MetaInfoMapped
+from superdesk.media_archive.meta.meta_type import MetaTypeMapped
+from superdesk.meta.metadata_superdesk import Base
+import unittest
+
+# --------------------------------------------------------------------
+
+class TestImageUpload(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine('sqlite://')
+        tables = (MetaTypeMapped, MetaDataMapped, MetaInfoMapped, ImageInfoEntry, ImageDataEntry, MetaFacet, FacetCount)
+        Base.metadata.create_all(engine, tables=[mapped.__table__ for mapped in tables])
+        self.session = sessionmaker(bind=engine)()
+
+        self.openSession = db_search.openSession, meta_data.openSession
+        db_search.openSession = meta_data.openSession = lambda: self.session
+
+        queryIndexer = QueryIndexer()
+        queryIndexer.register(MetaInfoMapped, QMetaInfo, MetaDataMapped, QMetaData, 'other')
+        queryIndexer.register(ImageInfoEntry, QImageInfo, ImageDataEntry, QImageData, 'image')
+        self.searchProvider = SqlSearchProvider()
+        self.searchProvider.queryIndexer = queryIndexer
+
+        metaType = MetaTypeMapped()
+        metaType.Type = 'image'
+        self.session.add(metaType)
+        self.session.flush((metaType,))
+        self.typeId = metaType.Id
+
+    def tearDown(self):
+        db_search.openSession, meta_data.openSession = self.openSession
+        self.session.close()
+
+    def upload(self, cameraMake):
+        # Provides the same state as the meta data service upload, the image handler adds the data entry to the base
+        # meta data and the search provider is updated with the base meta data.
+        metaData = MetaDataMapped()
+        metaData.Name = 'photo.jpg'
+        metaData.CreatedOn = datetime.now()
+        metaData.Creator = 1
+        metaData.typeId = self.typeId
+        metaData.Type = 'image'
+        metaData.thumbnailFormatId = 1
+        self.session.add(metaData)
+        self.session.flush((metaData,))
+
+        imageDataEntry = ImageDataEntry()
+        imageDataEntry.Id = metaData.Id
+        imageDataEntry.CameraMake = cameraMake
+        self.session.add(imageDataEntry)
+
+        imageInfo = ImageInfoMapped()
+        imageInfo.MetaData = metaData.Id
+        imageInfo.Language = 1
+        self.session.add(imageInfo)
+        self.session.flush((imageInfo,))
+
+        self.searchProvider.update(imageInfo, metaData)
+        return imageInfo, metaData
+
+    def counts(self):
+        return {(facet, value): count for facet, value, count in self.searchProvider.buildFacets(self.session)}
+
+    def testUploadCountsCameraMake(self):
+        self.upload('Canon')
+        self.upload('Canon')
+        self.upload('Nikon')
+
+        counts = self.counts()
+        self.assertEqual(2, counts[('CameraMake', 'Canon')])
+        self.assertEqual(1, counts[('CameraMake', 'Nikon')])
+        self.assertEqual(3, counts[('Type', 'image')])
+
+    def testBaseUpdateKeepsCameraMake(self):
+        imageInfo, metaData = self.upload('Canon')
+
+        metaInfo = self.session.query(MetaInfoMapped).get(imageInfo.Id)
+        self.searchProvider.update(metaInfo, metaData)
+
+        self.assertEqual(1, self.counts()[('CameraMake', 'Canon')])
+
+# --------------------------------------------------------------------
+
+if __name__ == '__main__': unittest.main()
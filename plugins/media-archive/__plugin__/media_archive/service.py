@@ -12,7 +12,7 @@ Contains the services setups for media archive superdesk.
 from ..cdm.local_cdm import server_uri, repository_path
 from ..plugin.registry import registerService
 from ..superdesk import service
-from ..superdesk.db_superdesk import bindSuperdeskSession
+from ..superdesk.db_superdesk import bindSuperdeskSession, alchemySessionCreator
 from ally.container import ioc, support
 from cdm.impl.local_filesystem import LocalFileSystemCDM, HTTPDelivery, \
     IDelivery
@@ -29,6 +29,8 @@ from superdesk.media_archive.core.impl.db_search import SqlSearchProvider
 from superdesk.media_archive.core.impl.thumbnail_processor_gm import ThumbnailProcessorGM
 from superdesk.media_archive.core.impl.thumbnail_processor_ffmpeg import ThumbnailProcessorFfmpeg
 from superdesk.media_archive.core.impl.thumbnail_processor_avconv import ThumbnailProcessorAVConv
+from superdesk.media_archive.meta.meta_facet import FacetCount
+from superdesk.media_archive.meta.meta_info import MetaInfoMapped
 
 # --------------------------------------------------------------------
 
@@ -47,6 +49,11 @@ def use_solr_search():
     ''' If true then the media archive search is made using solr'''
     return False
 
+@ioc.config
+def use_index_search():
+    ''' If true and the solr search is not used then the media archive search is made using the embedded index'''
+    return False
+
 # --------------------------------------------------------------------
 
 @ioc.entity
@@ -55,6 +62,9 @@ def searchProvider() -> ISearchProvider:
     if use_solr_search():
         from superdesk.media_archive.core.impl.solr_search import SolrSearchProvider
         b = SolrSearchProvider()
+    elif use_index_search():
+        from superdesk.media_archive.core.impl.index_search import IndexSearchProvider
+        b = IndexSearchProvider()
     else:
         b = SqlSearchProvider()
 
@@ -128,3 +138,18 @@ def thumbnailProcessor() -> IThumbnailProcessor:
 def publishQueryService():
     b = createService(queryIndexer(), cdmArchive(), support.entityFor(IThumbnailManager), searchProvider())
     registerService(b, (bindSuperdeskSession,))
+
+@ioc.after(publishQueryService)
+def populateFacets():
+    '''
+    The facet counts are maintained by the search provider, for the existing archives the facets are counted once.
+    '''
+    provider = searchProvider()
+    if not isinstance(provider, SqlSearchProvider): return
+
+    session = alchemySessionCreator()()
+    try:
+        if session.query(FacetCount).first() is None and session.query(MetaInfoMapped.Id).first() is not None:
+            provider.rebuildFacets(session)
+            session.commit()
+    finally: session.close()
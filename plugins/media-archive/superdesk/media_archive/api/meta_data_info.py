@@ -47,6 +47,17 @@ class MetaDataInfo(MetaData, MetaInfo):
 
 # --------------------------------------------------------------------
 
+@modelArchive
+class MetaDataFacet:
+    '''
+    Provides the number of meta data infos that have a facet value.
+    '''
+    Facet = str
+    Value = str
+    Count = int
+
+# --------------------------------------------------------------------
+
 @query(MetaDataInfo)
 class QMetaDataInfo:
     '''
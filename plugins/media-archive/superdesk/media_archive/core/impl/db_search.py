@@ -9,22 +9,27 @@ Created on Aug 21, 2012
 The implementation of database server based search API.
 '''
 
-from ally.api.type import typeFor
+from ally.container import wire
 from ally.container.ioc import injected
 from ally.support.api.util_service import namesForQuery
 from ally.support.sqlalchemy.util_service import buildLimits, buildQuery
-from superdesk.media_archive.api.meta_data import QMetaData
-from superdesk.media_archive.api.meta_info import QMetaInfo
 from superdesk.media_archive.meta.meta_data import MetaDataMapped
 from superdesk.media_archive.meta.meta_info import MetaInfoMapped
-from sqlalchemy.sql.expression import or_, and_, not_
-from ally.support.sqlalchemy.mapper import mappingFor
-from sqlalchemy.orm.mapper import Mapper
-from sqlalchemy.orm.properties import ColumnProperty
+from sqlalchemy.sql.expression import or_, and_, not_, func
+from ally.support.sqlalchemy.session import openSession
+from superdesk.media_archive.meta.meta_facet import MetaFacet, FacetCount
 from superdesk.media_archive.api.criteria import AsLikeExpressionOrdered, AsLikeExpression
 from superdesk.media_archive.meta.meta_type import MetaTypeMapped
 from superdesk.media_archive.api.meta_data_info import QMetaDataInfo
 from superdesk.media_archive.core.impl.query_service_creator import ISearchProvider
+from superdesk.core.reference import ReferenceCache
+
+# --------------------------------------------------------------------
+
+FACETS = ('Type', 'AudioEncoding', 'SampleRate', 'Genre', 'Year', 'CameraMake', 'VideoEncoding')
+# The meta data properties that are counted as facets.
+INSERT_IGNORE = {'mysql': 'IGNORE', 'sqlite': 'OR IGNORE'}
+# The insert prefixes by database dialect that skip the rows already inserted by a concurrent transaction.
 
 # --------------------------------------------------------------------
 
@@ -34,12 +39,26 @@ class SqlSearchProvider(ISearchProvider):
     Implementation  @see: ISearchProvider
     '''
 
+    search_count_limit = 10000; wire.config('search_count_limit', doc='''
+    The maximum number of meta data counted for a search, a search that matches more meta data reports this limit as
+    the total, if 0 the meta data are always fully counted.
+    ''')
+
+    def __init__(self):
+        '''
+        Construct the SQL search provider.
+        '''
+        assert isinstance(self.search_count_limit, int), 'Invalid search count limit %s' % self.search_count_limit
+
+        self._cache_types = ReferenceCache(MetaTypeMapped, MetaTypeMapped.Type, MetaTypeMapped.Id)
+
     def update(self, metaInfo, metaData):
         '''
         @see: ISearchProvider.update()
         '''
-        # do nothing because all search indexes are automatically managed by database server
-        pass
+        # all search indexes are automatically managed by database server, only the facets need to be counted
+        session = openSession()
+        self.updateFacets(session, metaInfo.Id, self.facetsFor(session, metaInfo, metaData))
 
     # ----------------------------------------------------------------
 
@@ -47,22 +66,178 @@ class SqlSearchProvider(ISearchProvider):
         '''
         @see: ISearchProvider.delete()
         '''
-        # do nothing because all search indexes are automatically managed by database server
-        pass
+        self.updateFacets(openSession(), idMetaInfo, {})
 
     # ----------------------------------------------------------------
 
-    def buildQuery(self, session, scheme, offset=None, limit=1000, qa=None, qi=None, qd=None):
+    def buildQuery(self, session, scheme, offset=None, limit=1000, qa=None, qi=None, qd=None, after=None):
         '''
         @see: ISearchProvider.buildQuery()
         '''
+        sql = self.buildFilter(session, qa, qi, qd)
+
+        if after is not None:
+            # The seek needs the meta data id order, the orderings of the criteria would skip or repeat meta data.
+            sql = sql.filter(MetaDataMapped.Id > after).order_by(None).order_by(MetaDataMapped.Id)
+            return (buildLimits(sql, None, limit), None)
+
+        count = sql.with_entities(MetaInfoMapped.Id).order_by(None)
+        if self.search_count_limit: count = count.limit(self.search_count_limit)
+        count = count.count()
+        sql = buildLimits(sql, offset, limit)
+
+        return (sql, count)
+
+    # ----------------------------------------------------------------
+
+    def buildFacets(self, session, qa=None, qi=None, qd=None):
+        '''
+        @see: ISearchProvider.buildFacets()
+
+        Without criteria the maintained facet counts are provided, otherwise only the facet values of the matching meta
+        info's are counted.
+        '''
+        if not (hasCriteria(qa) or hasCriteria(qi) or hasCriteria(qd)):
+            sql = session.query(FacetCount.facet, FacetCount.value, FacetCount.count).filter(FacetCount.count > 0)
+            return sql.order_by(FacetCount.facet, FacetCount.count.desc()).all()
+
+        ids = self.buildFilter(session, qa, qi, qd).with_entities(MetaInfoMapped.Id.label('metaInfoId'))
+        ids = ids.order_by(None).subquery()
+        count = func.count(MetaFacet.metaInfoId)
+        sql = session.query(MetaFacet.facet, MetaFacet.value, count).join(ids, ids.c.metaInfoId == MetaFacet.metaInfoId)
+        return sql.group_by(MetaFacet.facet, MetaFacet.value).order_by(MetaFacet.facet, count.desc()).all()
+
+    # ----------------------------------------------------------------
+
+    def facetsFor(self, session, metaInfo, metaData):
+        '''
+        Provides the facet values of the meta info and meta data, including the plugins facets kept in the entry tables.
+
+        @param session: Session
+            The session used for reading the entries.
+        @param metaInfo: MetaInfoMapped
+            The meta info, usually extended by a plugin.
+        @param metaData: MetaDataMapped
+            The meta data, usually extended by a plugin.
+        @return: dictionary{string: string}
+            The facet values indexed by facet.
+        '''
+        facets = facetsOf(metaInfo, metaData)
+        infoEntries, dataEntries = self.entriesFor(session, metaInfo, metaData)
+        for mapped in infoEntries: facets.update(facetsOf(mapped, None))
+        for mapped in dataEntries: facets.update(facetsOf(None, mapped))
+        return facets
+
+    def entriesFor(self, session, metaInfo, metaData):
+        '''
+        Provides the plugins entries of the meta info and meta data, the entries are read from the registered entry
+        tables of the meta data type since the meta info and meta data are not always the plugins mapped ones.
+
+        @param session: Session
+            The session used for reading the entries.
+        @param metaInfo: MetaInfoMapped
+            The meta info to provide the info entries for.
+        @param metaData: MetaDataMapped
+            The meta data to provide the data entries for.
+        @return: tuple(list, list)
+            The meta info entries and the meta data entries.
+        '''
+        infoEntries, dataEntries = [], []
+        for entry in self.queryIndexer.metaInfos:
+            if entry is MetaInfoMapped: continue
+            if metaData.Type and self.queryIndexer.typesByMetaInfo[entry.__name__] != metaData.Type: continue
+            mapped = session.query(entry).get(metaInfo.Id)
+            if mapped is not None: infoEntries.append(mapped)
+        for entry in self.queryIndexer.metaDatas:
+            if entry is MetaDataMapped: continue
+            if metaData.Type and self.queryIndexer.typesByMetaData[entry.__name__] != metaData.Type: continue
+            mapped = session.query(entry).get(metaData.Id)
+            if mapped is not None: dataEntries.append(mapped)
+        return infoEntries, dataEntries
+
+    def updateFacets(self, session, metaInfoId, facets):
+        '''
+        Updates the facet values of the meta info and the facet counts.
+
+        @param session: Session
+            The session used for the update.
+        @param metaInfoId: integer
+            The meta info id to update the facet values for.
+        @param facets: dictionary{string: string}
+            The facet values of the meta info, empty if the meta info was deleted.
+        '''
+        sql = session.query(MetaFacet.facet, MetaFacet.value).filter(MetaFacet.metaInfoId == metaInfoId)
+        current = dict(sql.all())
+
+        for facet, value in current.items():
+            if facets.get(facet) == value: continue
+            sql = session.query(MetaFacet).filter(and_(MetaFacet.metaInfoId == metaInfoId, MetaFacet.facet == facet))
+            sql.delete(synchronize_session=False)
+            countFacet(session, facet, value, -1)
+
+        for facet, value in facets.items():
+            if current.get(facet) == value: continue
+            metaFacet = MetaFacet()
+            metaFacet.metaInfoId = metaInfoId
+            metaFacet.facet = facet
+            metaFacet.value = value
+            session.add(metaFacet)
+            countFacet(session, facet, value, 1)
+
+    def rebuildFacets(self, session):
+        '''
+        Rebuilds the facet values and counts from all the meta info's and meta data's.
+
+        @param session: Session
+            The session used for the rebuild.
+        '''
+        session.query(MetaFacet).delete(synchronize_session=False)
+        session.query(FacetCount).delete(synchronize_session=False)
+
+        facets, byData = {}, {}
+        sql = session.query(MetaInfoMapped.Id, MetaDataMapped)
+        for metaInfoId, metaData in sql.join(MetaInfoMapped, MetaDataMapped.Id == MetaInfoMapped.MetaData).all():
+            facets[metaInfoId] = facetsOf(None, metaData)
+            byData.setdefault(metaData.Id, []).append(metaInfoId)
+
+        # The plugins facets are kept in the entry tables.
+        for entry in self.queryIndexer.metaInfos:
+            if entry is MetaInfoMapped: continue
+            for mapped in session.query(entry).all():
+                if mapped.Id in facets: facets[mapped.Id].update(facetsOf(mapped, None))
+        for entry in self.queryIndexer.metaDatas:
+            if entry is MetaDataMapped: continue
+            for mapped in session.query(entry).all():
+                values = facetsOf(None, mapped)
+                for metaInfoId in byData.get(mapped.Id, ()): facets[metaInfoId].update(values)
+
+        counts = {}
+        for metaInfoId, values in facets.items():
+            for facet, value in values.items():
+                metaFacet = MetaFacet()
+                metaFacet.metaInfoId = metaInfoId
+                metaFacet.facet = facet
+                metaFacet.value = value
+                session.add(metaFacet)
+                counts[(facet, value)] = counts.get((facet, value), 0) + 1
+
+        for (facet, value), count in counts.items():
+            facetCount = FacetCount()
+            facetCount.facet = facet
+            facetCount.value = value
+            facetCount.count = count
+            session.add(facetCount)
+
+    # ----------------------------------------------------------------
+
+    def buildFilter(self, session, qa=None, qi=None, qd=None):
+        '''
+        Provides the meta data and meta info query filtered on unified multi-plugin criteria, without limits.
+        '''
 
         metaInfos = set()
         metaDatas = set()
 
-        sqlUnion = None
-        sqlList = list()
-
         types = [self.queryIndexer.typesByMetaData[key] for key in self.queryIndexer.typesByMetaData.keys()]
 
         if qa is not None:
@@ -120,89 +295,145 @@ class SqlSearchProvider(ISearchProvider):
                 elif self.queryIndexer.typesByMetaData[getattr(MetaDataMapped, '__name__')] in types:
                     metaDatas.add(MetaDataMapped)
 
+        pairs = list()
         if not metaInfos and not metaDatas:
             pass;
         elif metaInfos and not metaDatas:
-            for metaInfo in metaInfos:
-                sql = self.buildSubquery(session, metaInfo, MetaDataMapped, qa, qi, qd, types)
-                if sql: sqlList.append(sql)
+            for metaInfo in metaInfos: pairs.append((metaInfo, MetaDataMapped))
         elif not metaInfos and metaDatas:
-            for metaData in metaDatas:
-                sql = self.buildSubquery(session, MetaInfoMapped, metaData, qa, qi, qd, types)
-                if sql: sqlList.append(sql)
+            for metaData in metaDatas: pairs.append((MetaInfoMapped, metaData))
         else:
             for metaInfo in metaInfos:
                 metaData = self.queryIndexer.metaDatasByInfo[metaInfo.__name__]
-                if metaData in metaDatas:
-                    sql = self.buildSubquery(session, metaInfo, metaData, qa, qi, qd, types)
-                    if sql: sqlList.append(sql)
-                else:
-                    sql = self.buildSubquery(session, metaInfo, MetaDataMapped, qa, qi, qd, types)
-                    if sql: sqlList.append(sql)
+                if metaData in metaDatas: pairs.append((metaInfo, metaData))
+                else: pairs.append((metaInfo, MetaDataMapped))
             for metaData in metaDatas:
                 if metaData is MetaDataMapped: continue
                 if self.queryIndexer.metaInfosByData[metaData.__name__] not in metaInfos:
-                    sql = self.buildSubquery(session, MetaInfoMapped, metaData, qa, qi, qd, types)
-                    if sql: sqlList.append(sql)
-
-        sqlLength = len(sqlList)
-        if sqlLength == 0:
-            sqlUnion = self.buildSubquery(session, MetaInfoMapped, MetaDataMapped, qa, qi, qd, types)
-        elif sqlLength == 1:
-            sqlUnion = sqlList[0]
-        else:
-            sqlUnion = sqlList.pop()
-            sqlUnion = sqlUnion.union(*sqlList)
-
-        count = sqlUnion.count()
-        sqlUnion = buildLimits(sqlUnion, offset, limit)
-
-        return (sqlUnion, count)
-
-    # ----------------------------------------------------------------
-
-    def buildSubquery(self, session, metaInfo, metaData, qa, qi, qd, types):
-        sql = session.query(MetaDataMapped)
+                    pairs.append((MetaInfoMapped, metaData))
+        if not pairs: pairs.append((MetaInfoMapped, MetaDataMapped))
 
-        if metaInfo == MetaInfoMapped and metaData == MetaDataMapped:
-            if types:
-                sql = sql.join(MetaTypeMapped, MetaTypeMapped.Id == MetaDataMapped.typeId)
-                sql = sql.filter(MetaTypeMapped.Type.in_(types))
-        elif metaInfo != MetaInfoMapped:
-            sql = sql.join(MetaTypeMapped, and_(MetaTypeMapped.Id == MetaDataMapped.typeId, MetaTypeMapped.Type == self.queryIndexer.typesByMetaInfo[metaInfo.__name__]))
-        elif metaData != MetaDataMapped:
-            sql = sql.join(MetaTypeMapped, and_(MetaTypeMapped.Id == MetaDataMapped.typeId, MetaTypeMapped.Type == self.queryIndexer.typesByMetaData[metaData.__name__]))
+        typeIds = {type: self._cache_types.get(session, type) for type in types}
 
+        sql = session.query(MetaDataMapped, MetaInfoMapped)
         sql = sql.join(MetaInfoMapped, MetaDataMapped.Id == MetaInfoMapped.MetaData)
-        sql = sql.add_entity(MetaInfoMapped)
-
-
-        if qi: sql = buildQuery(sql, qi, metaInfo)
-        if qd: sql = buildQuery(sql, qd, metaData)
+        # The plugins entries have the same id as the meta info or meta data they extend.
+        for metaInfo, metaData in pairs:
+            if metaInfo != MetaInfoMapped: sql = sql.outerjoin(metaInfo, metaInfo.Id == MetaInfoMapped.Id)
+            if metaData != MetaDataMapped: sql = sql.outerjoin(metaData, metaData.Id == MetaDataMapped.Id)
 
-        if qi and metaInfo != MetaInfoMapped:
+        if qi:
             sql = buildQuery(sql, qi, MetaInfoMapped)
-        if qd and metaData != MetaDataMapped:
+            sql = buildExpressionQuery(sql, qi, self.queryIndexer.likeColumnsByInfo[MetaInfoMapped.__name__], qa)
+        if qd:
             sql = buildQuery(sql, qd, MetaDataMapped)
+            sql = buildExpressionQuery(sql, qd, self.queryIndexer.likeColumnsByData[MetaDataMapped.__name__], qa)
+
+        if len(pairs) == 1:
+            metaInfo, metaData = pairs[0]
+            sql = self.buildBranch(sql, metaInfo, metaData, qa, qi, qd, types, typeIds)
+        else:
+            # Each branch provides the condition and the orderings for a plugin type, the branch query is used only to
+            # collect them. The plugin columns are null for the other types so the orderings can be applied together.
+            branches = [self.buildBranch(session.query(MetaDataMapped), metaInfo, metaData, qa, qi, qd, types, typeIds)
+                        for metaInfo, metaData in pairs]
+            clauses = [branch.whereclause for branch in branches]
+            if not any(clause is None for clause in clauses): sql = sql.filter(or_(*clauses))
+
+            orderings, ordered = [], set()
+            for branch in branches:
+                for ordering in branch._order_by or ():
+                    if str(ordering) in ordered: continue
+                    ordered.add(str(ordering))
+                    orderings.append(ordering)
+            if orderings: sql = sql.order_by(*orderings)
+
+        return sql
 
-        if qi: sql = buildExpressionQuery(sql, qi, metaInfo, qa)
-        if qd: sql = buildExpressionQuery(sql, qd, metaData, qa)
+    # ----------------------------------------------------------------
+
+    def buildBranch(self, sql, metaInfo, metaData, qa, qi, qd, types, typeIds):
+        '''
+        Builds on the query the conditions for the meta info and meta data plugin entries, the entries need to be already
+        joined in the query.
+        '''
+        if metaInfo != MetaInfoMapped:
+            sql = sql.filter(MetaDataMapped.typeId == typeIds[self.queryIndexer.typesByMetaInfo[metaInfo.__name__]])
+        elif metaData != MetaDataMapped:
+            sql = sql.filter(MetaDataMapped.typeId == typeIds[self.queryIndexer.typesByMetaData[metaData.__name__]])
+        elif types:
+            sql = sql.filter(MetaDataMapped.typeId.in_([typeIds[type] for type in types if typeIds[type] is not None]))
 
         if qi and metaInfo != MetaInfoMapped:
-            sql = buildExpressionQuery(sql, qi, MetaInfoMapped, qa)
+            sql = buildQuery(sql, qi, metaInfo)
+            sql = buildExpressionQuery(sql, qi, self.queryIndexer.likeColumnsByInfo[metaInfo.__name__], qa)
         if qd and metaData != MetaDataMapped:
-            sql = buildExpressionQuery(sql, qd, MetaDataMapped, qa)
+            sql = buildQuery(sql, qd, metaData)
+            sql = buildExpressionQuery(sql, qd, self.queryIndexer.likeColumnsByData[metaData.__name__], qa)
 
         if qa and qa.all:
             assert isinstance(qa, QMetaDataInfo), 'Invalid query %s' % qa
-            sql = buildAllQuery(sql, qa.all, self.queryIndexer.queryByInfo[metaInfo.__name__], metaInfo,
-                                self.queryIndexer.queryByData[metaData.__name__], metaData)
+            columns = [column for _criteria, column in self.queryIndexer.likeColumnsByInfo[metaInfo.__name__]]
+            columns.extend(column for _criteria, column in self.queryIndexer.likeColumnsByData[metaData.__name__])
+            if metaInfo != MetaInfoMapped:
+                columns.extend(column for _criteria, column in self.queryIndexer.likeColumnsByInfo[MetaInfoMapped.__name__])
+            if metaData != MetaDataMapped:
+                columns.extend(column for _criteria, column in self.queryIndexer.likeColumnsByData[MetaDataMapped.__name__])
+            sql = buildAllQuery(sql, qa.all, columns)
 
         return sql
 
 # ----------------------------------------------------------------
 
-def buildExpressionQuery(sql, query, mapped, qa):
+def facetsOf(metaInfo, metaData):
+    '''
+    Provides the facet values of the meta info and meta data.
+
+    @param metaInfo: MetaInfoMapped
+        The meta info, usually extended by a plugin.
+    @param metaData: MetaDataMapped
+        The meta data, usually extended by a plugin.
+    @return: dictionary{string: string}
+        The facet values indexed by facet.
+    '''
+    facets = {}
+    for facet in FACETS:
+        value = getattr(metaData, facet, None)
+        if value is None: value = getattr(metaInfo, facet, None)
+        if value is not None and value != '': facets[facet] = str(value)[:255]
+    return facets
+
+def countFacet(session, facet, value, delta):
+    '''
+    Changes the count of the facet value with the delta.
+    '''
+    sql = session.query(FacetCount).filter(and_(FacetCount.facet == facet, FacetCount.value == value))
+    if sql.update({FacetCount.count: FacetCount.count + delta}, synchronize_session=False) or delta < 0: return
+
+    # The count row is missing but a concurrent transaction might insert it at the same time, so an empty row is
+    # inserted ignoring the duplicate and then the count is updated again.
+    connection = session.connection()
+    insert = FacetCount.__table__.insert()
+    prefix = INSERT_IGNORE.get(connection.dialect.name)
+    if prefix: insert = insert.prefix_with(prefix)
+    connection.execute(insert, {FacetCount.facet.property.columns[0].key: facet,
+                                FacetCount.value.property.columns[0].key: value,
+                                FacetCount.count.property.columns[0].key: 0})
+    sql.update({FacetCount.count: FacetCount.count + delta}, synchronize_session=False)
+
+def hasCriteria(query):
+    '''
+    Checks if the query has at least one criteria set.
+    '''
+    if query is None: return False
+    clazz = query.__class__
+    for name in namesForQuery(clazz):
+        if getattr(clazz, name) in query: return True
+    return False
+
+# ----------------------------------------------------------------
+
+def buildExpressionQuery(sql, query, columns, qa):
     '''
     Builds the query on the SQL alchemy query.
 
@@ -210,24 +441,18 @@ def buildExpressionQuery(sql, query, mapped, qa):
         The sql alchemy query to use.
     @param query: query
         The REST query object to provide filtering on.
-    @param mapped: class
-        The mapped model class to use the query on.
+    @param columns: list((string, Column))
+        The like expression criteria names and the associated columns, as provided by the query indexer.
     '''
 
     assert query is not None, 'A query object is required'
     clazz = query.__class__
-    mapper = mappingFor(mapped)
-    assert isinstance(mapper, Mapper)
 
     all = None
     if qa: all = qa.all
 
-    columns = {cp.key.lower(): getattr(mapper.c, cp.key)
-                  for cp in mapper.iterate_properties if isinstance(cp, ColumnProperty)}
-    columns = {criteria:columns.get(criteria.lower()) for criteria in namesForQuery(clazz)}
-
-    for criteria, column in columns.items():
-        if column is None or getattr(clazz, criteria) not in query: continue
+    for criteria, column in columns:
+        if getattr(clazz, criteria) not in query: continue
         crt = getattr(query, criteria)
 
         if isinstance(crt, AsLikeExpression) or isinstance(crt, AsLikeExpressionOrdered):
@@ -267,147 +492,36 @@ def buildExpressionQuery(sql, query, mapped, qa):
 
 # ----------------------------------------------------------------
 
-def buildAllQuery(sql, all, qMetaInfo, metaInfo, qMetaData, metaData):
+def buildAllQuery(sql, all, columns):
     '''
     Builds the query for all criteria.
 
     @param sql: SQL alchemy
         The sql alchemy query to use.
-    @param qMetaInfo: query
-        The REST query object to provide filtering on for meta info.
-    @param metaInfo: class
-        The meta info mapped model class to use the query on.
-    @param qMetaData: query
-        The REST query object to provide filtering on for meta data
-    @param metaData: class
-        The meta data mapped model class to use the query on.
+    @param all: AsLikeExpression
+        The all criteria to provide filtering on.
+    @param columns: list(Column)
+        The columns that are searched by the all criteria.
     '''
 
-    infoMapper = mappingFor(metaInfo)
-    assert isinstance(infoMapper, Mapper)
-
-    dataMapper = mappingFor(metaData)
-    assert isinstance(dataMapper, Mapper)
-
-    baseInfoMapper = mappingFor(MetaInfoMapped)
-    assert isinstance(infoMapper, Mapper)
-
-    baseDataMapper = mappingFor(MetaDataMapped)
-    assert isinstance(dataMapper, Mapper)
-
-    infoProperties = {cp.key.lower(): getattr(infoMapper.c, cp.key)
-                  for cp in infoMapper.iterate_properties if isinstance(cp, ColumnProperty)}
-
-    dataProperties = {cp.key.lower(): getattr(dataMapper.c, cp.key)
-                  for cp in dataMapper.iterate_properties if isinstance(cp, ColumnProperty)}
-
-    baseInfoProperties = {cp.key.lower(): getattr(baseInfoMapper.c, cp.key)
-                  for cp in baseInfoMapper.iterate_properties if isinstance(cp, ColumnProperty)}
-
-    baseDataProperties = {cp.key.lower(): getattr(baseDataMapper.c, cp.key)
-                  for cp in baseDataMapper.iterate_properties if isinstance(cp, ColumnProperty)}
-
-    infoQueryType = typeFor(qMetaInfo)
-    dataQueryType = typeFor(qMetaData)
-
-    baseInfoQueryType = typeFor(QMetaInfo)
-    baseDataQueryType = typeFor(QMetaData)
-
     if all.inc:
         for value in all.inc:
-            clauses = list()
-
-            for criteria, crtClass in infoQueryType.query.criterias.items():
-                column = infoProperties.get(criteria.lower())
-                if column is None: continue
-                if crtClass == AsLikeExpression or crtClass == AsLikeExpressionOrdered:
-                    clauses.append(column.like(processLike(value)))
-
-            for criteria, crtClass in dataQueryType.query.criterias.items():
-                column = dataProperties.get(criteria.lower())
-                if column is None: continue
-                if crtClass == AsLikeExpression or crtClass == AsLikeExpressionOrdered:
-                    clauses.append(column.like(processLike(value)))
-
-            if metaInfo != MetaInfoMapped:
-                for criteria, crtClass in baseInfoQueryType.query.criterias.items():
-                    column = baseInfoProperties.get(criteria.lower())
-                    if column is None: continue
-                    if crtClass == AsLikeExpression or crtClass == AsLikeExpressionOrdered:
-                        clauses.append(column.like(processLike(value)))
-
-            if metaData != MetaDataMapped:
-                for criteria, crtClass in baseDataQueryType.query.criterias.items():
-                    column = baseDataProperties.get(criteria.lower())
-                    if column is None: continue
-                    if crtClass == AsLikeExpression or crtClass == AsLikeExpressionOrdered:
-                        clauses.append(column.like(processLike(value)))
+            like = processLike(value)
+            clauses = [column.like(like) for column in columns]
 
             length = len(clauses)
             if length == 1: sql = sql.filter(clauses[0])
             elif length > 1: sql = sql.filter(or_(*clauses))
 
     if all.ext:
-        clauses = list()
-        for value in all.ext:
-            for criteria, crtClass in infoQueryType.query.criterias.items():
-                column = infoProperties.get(criteria.lower())
-                if column is None: continue
-                if crtClass == AsLikeExpression or crtClass == AsLikeExpressionOrdered:
-                    clauses.append(column.like(processLike(value)))
-
-            for criteria, crtClass in dataQueryType.query.criterias.items():
-                column = dataProperties.get(criteria.lower())
-                if column is None: continue
-                if crtClass == AsLikeExpression or crtClass == AsLikeExpressionOrdered:
-                    clauses.append(column.like(processLike(value)))
-
-            if metaInfo != MetaInfoMapped:
-                for criteria, crtClass in baseInfoQueryType.query.criterias.items():
-                    column = baseInfoProperties.get(criteria.lower())
-                    if column is None: continue
-                    if crtClass == AsLikeExpression or crtClass == AsLikeExpressionOrdered:
-                        clauses.append(column.like(processLike(value)))
-
-            if metaData != MetaDataMapped:
-                for criteria, crtClass in baseDataQueryType.query.criterias.items():
-                    column = baseDataProperties.get(criteria.lower())
-                    if column is None: continue
-                    if crtClass == AsLikeExpression or crtClass == AsLikeExpressionOrdered:
-                        clauses.append(column.like(processLike(value)))
+        clauses = [column.like(processLike(value)) for value in all.ext for column in columns]
 
         length = len(clauses)
         if length == 1: sql = sql.filter(clauses[0])
         elif length > 1: sql = sql.filter(or_(*clauses))
 
     if all.exc:
-        clauses = list()
-        for value in all.exc:
-            for criteria, crtClass in infoQueryType.query.criterias.items():
-                column = infoProperties.get(criteria.lower())
-                if column is None: continue
-                if crtClass == AsLikeExpression or crtClass == AsLikeExpressionOrdered:
-                    clauses.append(not_(column.like(processLike(value))))
-
-            for criteria, crtClass in dataQueryType.query.criterias.items():
-                column = dataProperties.get(criteria.lower())
-                if column is None: continue
-                if crtClass == AsLikeExpression or crtClass == AsLikeExpressionOrdered:
-                    clauses.append(not_(column.like(processLike(value))))
-
-            if metaInfo != MetaInfoMapped:
-                for criteria, crtClass in baseInfoQueryType.query.criterias.items():
-                    column = baseInfoProperties.get(criteria.lower())
-                    if column is None: continue
-                    if crtClass == AsLikeExpression or crtClass == AsLikeExpressionOrdered:
-                        clauses.append(not_(column.like(processLike(value))))
-
-            if metaData != MetaDataMapped:
-                for criteria, crtClass in baseDataQueryType.query.criterias.items():
-                    column = baseDataProperties.get(criteria.lower())
-                    if column is None: continue
-                    if crtClass == AsLikeExpression or crtClass == AsLikeExpressionOrdered:
-                        clauses.append(not_(column.like(processLike(value))))
+        clauses = [not_(column.like(processLike(value))) for value in all.exc for column in columns]
 
         length = len(clauses)
         if length == 1: sql = sql.filter(clauses[0])
@@ -0,0 +1,473 @@
+'''
+Created on Feb 25, 2013
+
+@package: superdesk media archive
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Ioan v. Pocol
+
+The implementation of the embedded inverted index based search API.
+'''
+
+from ally.api.criteria import AsOrdered
+from ally.container import wire
+from ally.container.ioc import injected
+from ally.support.api.util_service import namesForQuery
+from ally.support.sqlalchemy.mapper import mappingFor
+from ally.support.sqlalchemy.session import openSession
+from bisect import bisect_left, insort
+from os import makedirs, rename, remove
+from os.path import join, isfile
+from sqlalchemy import event
+from sqlalchemy.orm.properties import ColumnProperty
+from superdesk.media_archive.api.criteria import AsLikeExpression
+from superdesk.media_archive.api.meta_data_info import QMetaDataInfo
+from superdesk.media_archive.core.impl.db_search import SqlSearchProvider, \
+    facetsOf, hasCriteria
+from superdesk.media_archive.meta.meta_data import MetaDataMapped
+from superdesk.media_archive.meta.meta_info import MetaInfoMapped
+from threading import Lock
+from weakref import WeakKeyDictionary
+import logging
+import pickle
+import re
+
+# --------------------------------------------------------------------
+
+log = logging.getLogger(__name__)
+
+TOKENS = re.compile(r'\w+')
+# The expression used for extracting the indexed tokens from the texts.
+
+ALL = None
+# The field key used for the tokens of all the texts of a document.
+
+# --------------------------------------------------------------------
+
+@injected
+class IndexSearchProvider(SqlSearchProvider):
+    '''
+    Implementation @see: ISearchProvider that keeps an inverted index of the meta info and meta data texts, the index
+    is fed through the update and delete methods and is persisted on disk as a snapshot and a journal of the changes
+    made after the snapshot. The text criteria are resolved by intersecting the posting lists of the searched words,
+    a searched word matches all the indexed words that start with it, and the database is used only for the page of
+    results. The changes are applied on the index only after the transaction that made them is committed. The queries that contain criteria other then the text criteria are delegated to the SQL search.
+    The index files are not locked between processes, so this provider is only for deployments that run the media
+    archive in a single process, the multi process deployments need to use the SQL or Solr search.
+    '''
+
+    index_search_path = join('workspace', 'index', 'media_archive'); wire.config('index_search_path', doc='''
+    The directory where the media archive search index is persisted, if the directory has no index the index is
+    rebuilt from the database on the first search. The directory can be used by a single application process.
+    ''')
+    index_search_compact = 10000; wire.config('index_search_compact', doc='''
+    The number of index changes kept in the journal before the index snapshot is written again.
+    ''')
+
+    def __init__(self):
+        '''
+        Construct the index search provider.
+        '''
+        assert isinstance(self.index_search_path, str), 'Invalid index search path %s' % self.index_search_path
+        assert isinstance(self.index_search_compact, int), \
+        'Invalid index search compact %s' % self.index_search_compact
+        super().__init__()
+
+        self._documents = {}
+        # The indexed documents, meta info id -> (meta data id, type, {field key: tuple(tokens)}, {facet: value})
+        self._postings = {}
+        # The posting lists, field key -> {token: set(meta info ids)}
+        self._tokens = {}
+        # The sorted tokens used for the prefix lookups, field key -> list(tokens)
+        self._columns = {}
+        # The mapped classes text columns, mapped class -> {criteria name: attribute name}
+        self._loaded = self._built = False
+        self._journal = None
+        self._changes = 0
+        self._building = None
+        # The changes committed while the index is built from the database, list((meta info id, document or None))
+        self._pending = WeakKeyDictionary()
+        # The changes made by the sessions that are not yet committed, session -> list((meta info id, document or None))
+        self._lock = Lock()
+        self._buildLock = Lock()
+
+    def update(self, metaInfo, metaData):
+        '''
+        @see: ISearchProvider.update()
+        '''
+        assert isinstance(metaInfo, MetaInfoMapped), 'Invalid meta info %s' % metaInfo
+        assert isinstance(metaData, MetaDataMapped), 'Invalid meta data %s' % metaData
+
+        super().update(metaInfo, metaData)
+
+        session = openSession()
+        self._change(session, metaInfo.Id, self._document(session, metaInfo, metaData))
+
+    def delete(self, idMetaInfo, metaType):
+        '''
+        @see: ISearchProvider.delete()
+        '''
+        super().delete(idMetaInfo, metaType)
+
+        self._change(openSession(), idMetaInfo, None)
+
+    def buildQuery(self, session, scheme, offset=None, limit=1000, qa=None, qi=None, qd=None, after=None):
+        '''
+        @see: ISearchProvider.buildQuery()
+        '''
+        if not (self._indexed(qa, ('all', 'type', 'language')) and self._indexed(qi) and self._indexed(qd)):
+            return super().buildQuery(session, scheme, offset, limit, qa, qi, qd, after)
+
+        self._build(session)
+        with self._lock:
+            ids = self._search(qa, qi, qd)
+            if after is not None: ids = [id for id in ids if self._documents[id][0] > after]
+            ids = sorted(ids, key=lambda id: (self._documents[id][0], id))
+
+        count = None if after is not None else len(ids)
+        if offset and after is None: ids = ids[offset:]
+        if limit is not None: ids = ids[:limit]
+
+        sql = session.query(MetaDataMapped, MetaInfoMapped)
+        sql = sql.join(MetaInfoMapped, MetaDataMapped.Id == MetaInfoMapped.MetaData)
+        if ids: sql = sql.filter(MetaInfoMapped.Id.in_(ids))
+        else: sql = sql.limit(0)
+        sql = sql.order_by(MetaDataMapped.Id, MetaInfoMapped.Id)
+
+        return (sql, count)
+
+    def buildFacets(self, session, qa=None, qi=None, qd=None):
+        '''
+        @see: ISearchProvider.buildFacets()
+        '''
+        if not (hasCriteria(qa) or hasCriteria(qi) or hasCriteria(qd)) or \
+        not (self._indexed(qa, ('all', 'type', 'language')) and self._indexed(qi) and self._indexed(qd)):
+            return super().buildFacets(session, qa, qi, qd)
+
+        counts = {}
+        self._build(session)
+        with self._lock:
+            for id in self._search(qa, qi, qd):
+                for facet, value in self._documents[id][3].items():
+                    counts[(facet, value)] = counts.get((facet, value), 0) + 1
+
+        facets = [(facet, value, count) for (facet, value), count in counts.items()]
+        facets.sort(key=lambda facet: (facet[0], -facet[2]))
+        return facets
+
+    # ----------------------------------------------------------------
+
+    def _search(self, qa, qi, qd):
+        '''
+        Provides the ids of the documents that match the queries, the index needs to be built and the lock acquired.
+        '''
+        ids = None
+        if qa is not None:
+            assert isinstance(qa, QMetaDataInfo), 'Invalid query %s' % qa
+            if QMetaDataInfo.all in qa: ids = self._restrict(ids, ALL, qa.all)
+        for prefix, q in (('i', qi), ('d', qd)):
+            if q is None: continue
+            for name in namesForQuery(q):
+                if getattr(q.__class__, name) in q: ids = self._restrict(ids, (prefix, name), getattr(q, name))
+
+        if ids is None: ids = self._documents.keys()
+        if qa is not None and QMetaDataInfo.type in qa:
+            types = set(qa.type.values)
+            ids = [id for id in ids if self._documents[id][1] in types]
+        return ids
+
+    def _document(self, session, metaInfo, metaData):
+        '''
+        Provides the index document of the meta info and meta data, the plugins texts and facets are read from the
+        entry tables.
+        '''
+        fields = {}
+        self._extract(fields, 'i', metaInfo, self.queryIndexer.infoCriterias)
+        self._extract(fields, 'd', metaData, self.queryIndexer.dataCriterias)
+        facets = facetsOf(metaInfo, metaData)
+
+        infoEntries, dataEntries = self.entriesFor(session, metaInfo, metaData)
+        for mapped in infoEntries:
+            self._extract(fields, 'i', mapped, self.queryIndexer.infoCriterias)
+            facets.update(facetsOf(mapped, None))
+        for mapped in dataEntries:
+            self._extract(fields, 'd', mapped, self.queryIndexer.dataCriterias)
+            facets.update(facetsOf(None, mapped))
+        return (metaData.Id, metaData.Type, fields, facets)
+
+    def _indexed(self, query, names=None):
+        '''
+        Checks if the query can be resolved by the index, this means that the query has only text criteria without
+        ordering or, if provided, only criteria from the names.
+        '''
+        if query is None: return True
+        clazz = query.__class__
+        for name in namesForQuery(clazz):
+            if getattr(clazz, name) not in query: continue
+            if names is not None and name not in names: return False
+            crt = getattr(query, name)
+            if isinstance(crt, AsOrdered) and AsOrdered.ascending in crt: return False
+            if names is None and not isinstance(crt, AsLikeExpression): return False
+        return True
+
+    def _restrict(self, ids, field, crt):
+        '''
+        Restricts the ids to the documents that match the like expression criteria on the field, None ids stands
+        for all the documents.
+        '''
+        assert isinstance(crt, AsLikeExpression), 'Invalid criteria %s' % crt
+        if AsLikeExpression.inc in crt:
+            for value in crt.inc: ids = intersect(ids, self._match(field, value))
+
+        if AsLikeExpression.ext in crt and crt.ext:
+            extended = set()
+            for value in crt.ext:
+                matched = self._match(field, value)
+                if matched is None:
+                    extended = None
+                    break
+                extended.update(matched)
+            ids = intersect(ids, extended)
+
+        if AsLikeExpression.exc in crt:
+            for value in crt.exc:
+                matched = self._match(field, value)
+                if matched is None: return set()
+                ids = (set(self._documents) if ids is None else ids).difference(matched)
+        return ids
+
+    def _match(self, field, value):
+        '''
+        Provides the ids of the documents that have on the field all the tokens of the value as token prefixes, None
+        if the value has no tokens and it matches all the documents.
+        '''
+        matched = None
+        postings, tokens = self._postings.get(field, {}), self._tokens.get(field, [])
+        for prefix in TOKENS.findall(value.lower()):
+            ids = set()
+            index = bisect_left(tokens, prefix)
+            while index < len(tokens) and tokens[index].startswith(prefix):
+                ids.update(postings[tokens[index]])
+                index += 1
+            matched = ids if matched is None else matched.intersection(ids)
+            if not matched: break
+        return matched
+
+    def _extract(self, fields, prefix, mapped, criterias):
+        '''
+        Extracts in the fields the tokens of the mapped object texts for the like expression criterias.
+        '''
+        clazz = mapped.__class__
+        columns = self._columns.get(clazz)
+        if columns is None:
+            mapper = mappingFor(clazz)
+            attributes = {cp.key.lower(): cp.key for cp in mapper.iterate_properties if isinstance(cp, ColumnProperty)}
+            columns = self._columns[clazz] = {name: attributes[name.lower()] for name, criteria in criterias.items()
+                                              if issubclass(criteria, AsLikeExpression) and name.lower() in attributes}
+
+        for name, attribute in columns.items():
+            value = getattr(mapped, attribute)
+            if value: fields[(prefix, name)] = tuple(set(TOKENS.findall(value.lower())))
+
+    # ----------------------------------------------------------------
+
+    def _change(self, session, id, document):
+        '''
+        Keeps the document change until the session is committed.
+        '''
+        with self._lock:
+            pending = self._pending.get(session)
+            if pending is None:
+                pending = self._pending[session] = []
+                event.listen(session, 'after_commit', self._onCommit)
+                event.listen(session, 'after_rollback', self._onRollback)
+            pending.append((id, document))
+
+    def _onCommit(self, session):
+        '''
+        Applies on the index the changes made by the committed session.
+        '''
+        with self._lock:
+            pending = self._pending.get(session)
+            if not pending: return
+            self._load()
+            for id, document in pending:
+                # Until the index is built from the database the changes are not needed.
+                if not self._built:
+                    if self._building is not None: self._building.append((id, document))
+                    continue
+                self._remove(id)
+                if document is not None: self._add(id, document)
+                self._record((id, document))
+            del pending[:]
+
+    def _onRollback(self, session):
+        '''
+        Discards the changes made by the rolled back session.
+        '''
+        with self._lock:
+            pending = self._pending.get(session)
+            if pending: del pending[:]
+
+    def _add(self, id, document):
+        '''
+        Adds the document tokens to the posting lists.
+        '''
+        self._documents[id] = document
+        _metaDataId, _type, fields, _facets = document
+        for field, tokens in fields.items():
+            for key in (field, ALL):
+                postings = self._postings.get(key)
+                if postings is None: postings = self._postings[key] = {}
+                for token in tokens:
+                    ids = postings.get(token)
+                    if ids is None:
+                        ids = postings[token] = set()
+                        insort(self._tokens.setdefault(key, []), token)
+                    ids.add(id)
+
+    def _remove(self, id):
+        '''
+        Removes the document tokens from the posting lists.
+        '''
+        document = self._documents.pop(id, None)
+        if document is None: return
+        _metaDataId, _type, fields, _facets = document
+        for field, tokens in fields.items():
+            for key in (field, ALL):
+                postings = self._postings[key]
+                for token in tokens:
+                    ids = postings.get(token)
+                    if ids is None: continue
+                    ids.discard(id)
+                    if not ids:
+                        del postings[token]
+                        sortedTokens = self._tokens[key]
+                        del sortedTokens[bisect_left(sortedTokens, token)]
+
+    # ----------------------------------------------------------------
+
+    def _build(self, session):
+        '''
+        Builds the index from the database, if not already built. The database is read without holding the index lock,
+        the changes committed meanwhile are kept and applied after the read documents.
+        '''
+        with self._lock:
+            self._load()
+            if self._built: return
+
+        with self._buildLock:
+            with self._lock:
+                if self._built: return
+                self._building = []
+            try: documents = self._read(session)
+            except:
+                with self._lock: self._building = None
+                raise
+
+            with self._lock:
+                self._documents, self._postings, self._tokens = {}, {}, {}
+                for id, document in documents.items(): self._add(id, document)
+                for id, document in self._building:
+                    self._remove(id)
+                    if document is not None: self._add(id, document)
+                self._building = None
+                self._snapshot()
+                self._built = True
+
+    def _read(self, session):
+        '''
+        Reads the index documents from the database.
+        '''
+        log.info('Building the media archive search index in \'%s\'', self.index_search_path)
+        documents, byData = {}, {}
+        sql = session.query(MetaDataMapped, MetaInfoMapped)
+        sql = sql.join(MetaInfoMapped, MetaDataMapped.Id == MetaInfoMapped.MetaData)
+        for metaData, metaInfo in sql.all():
+            fields = {}
+            self._extract(fields, 'i', metaInfo, self.queryIndexer.infoCriterias)
+            self._extract(fields, 'd', metaData, self.queryIndexer.dataCriterias)
+            documents[metaInfo.Id] = (metaData.Id, metaData.Type, fields, facetsOf(metaInfo, metaData))
+            byData.setdefault(metaData.Id, []).append(metaInfo.Id)
+
+        # The plugins texts are kept in the entry tables.
+        for entry in self.queryIndexer.metaInfos:
+            if entry is MetaInfoMapped: continue
+            for mapped in session.query(entry).all():
+                if mapped.Id in documents:
+                    self._extract(documents[mapped.Id][2], 'i', mapped, self.queryIndexer.infoCriterias)
+                    documents[mapped.Id][3].update(facetsOf(mapped, None))
+        for entry in self.queryIndexer.metaDatas:
+            if entry is MetaDataMapped: continue
+            for mapped in session.query(entry).all():
+                values = facetsOf(None, mapped)
+                for id in byData.get(mapped.Id, ()):
+                    self._extract(documents[id][2], 'd', mapped, self.queryIndexer.dataCriterias)
+                    documents[id][3].update(values)
+        return documents
+
+    def _load(self):
+        '''
+        Loads the index snapshot and replays the journal, if not already loaded.
+        '''
+        if self._loaded: return
+        self._loaded = True
+        makedirs(self.index_search_path, exist_ok=True)
+
+        snapshot, journal = self._paths()
+        if not isfile(snapshot): return
+        with open(snapshot, 'rb') as f: documents = pickle.load(f)
+        for id, document in documents.items(): self._add(id, document)
+
+        if isfile(journal):
+            with open(journal, 'rb') as f:
+                while True:
+                    # A change that was not completely written is ignored.
+                    try: id, document = pickle.load(f)
+                    except (EOFError, pickle.UnpicklingError): break
+                    self._remove(id)
+                    if document is not None: self._add(id, document)
+                    self._changes += 1
+        self._built = True
+
+    def _record(self, change):
+        '''
+        Records the change in the journal, the snapshot is written again when the journal is too large.
+        '''
+        if self._changes >= self.index_search_compact:
+            self._snapshot()
+            return
+        if self._journal is None: self._journal = open(self._paths()[1], 'ab')
+        pickle.dump(change, self._journal)
+        self._journal.flush()
+        self._changes += 1
+
+    def _snapshot(self):
+        '''
+        Writes the index snapshot and clears the journal.
+        '''
+        snapshot, journal = self._paths()
+        with open(snapshot + '.tmp', 'wb') as f: pickle.dump(self._documents, f, pickle.HIGHEST_PROTOCOL)
+        # The rename can not replace an existing file on all platforms.
+        if isfile(snapshot): remove(snapshot)
+        rename(snapshot + '.tmp', snapshot)
+
+        if self._journal is not None: self._journal.close()
+        self._journal = open(journal, 'wb')
+        self._changes = 0
+
+    def _paths(self):
+        '''
+        Provides the snapshot and journal paths.
+        '''
+        return join(self.index_search_path, 'index.snapshot'), join(self.index_search_path, 'index.journal')
+
+# --------------------------------------------------------------------
+
+def intersect(ids, matched):
+    '''
+    Intersects the ids with the matched ids, None stands for all the ids.
+    '''
+    if matched is None: return ids
+    if ids is None: return set(matched)
+    return ids.intersection(matched)
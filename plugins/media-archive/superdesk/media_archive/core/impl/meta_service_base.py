@@ -196,6 +196,7 @@ class MetaInfoServiceBaseAlchemy(EntityGetCRUDServiceAlchemy):
     def insert(self, metaInfo):
         id = EntityGetCRUDServiceAlchemy.insert(self, metaInfo)
 
+        metaInfo = self.session().query(self.MetaInfo).filter(self.MetaInfo.Id == id).one()
         metaData = self.session().query(self.MetaData).filter(self.MetaData.Id == metaInfo.MetaData).one()
         self.searchProvider.update(metaInfo, metaData)
         return id
@@ -20,7 +20,7 @@ from superdesk.media_archive.meta.meta_data import MetaDataMapped
 from ally.api.extension import IterPart
 from cdm.spec import ICDM
 from superdesk.media_archive.api.meta_data_info import MetaDataInfo, \
-    QMetaDataInfo
+    QMetaDataInfo, MetaDataFacet
 
 
 def createService(queryIndexer, cdmArchive, thumbnailManager, searchProvider):
@@ -35,9 +35,11 @@ def createService(queryIndexer, cdmArchive, thumbnailManager, searchProvider):
     qMetaDataClass = type('Compund$QMetaData', (QMetaData,), queryIndexer.dataCriterias)
     qMetaDataClass = query(MetaData)(qMetaDataClass)
 
-    types = (Iter(MetaDataInfo), Scheme, int, int, QMetaDataInfo, qMetaInfoClass, qMetaDataClass, str)
+    types = (Iter(MetaDataInfo), Scheme, int, int, QMetaDataInfo, qMetaInfoClass, qMetaDataClass, str, int)
     apiClass = type('Generated$IQueryService', (IQueryService,), {})
     apiClass.getMetaInfos = call(*types, webName='Query')(apiClass.getMetaInfos)
+    types = (Iter(MetaDataFacet), QMetaDataInfo, qMetaInfoClass, qMetaDataClass)
+    apiClass.getFacets = call(*types, webName='Facets')(apiClass.getFacets)
     apiClass = service(apiClass)
 
     return type('Generated$QueryServiceAlchemy', (QueryServiceAlchemy, apiClass), {}
@@ -50,9 +52,16 @@ class IQueryService:
     Provides the service methods for the unified multi-plugin criteria query.
     '''
 
-    def getMetaInfos(self, scheme, offset=None, limit=10, qa=None, qi=None, qd=None, thumbSize=None):
+    def getMetaInfos(self, scheme, offset=None, limit=10, qa=None, qi=None, qd=None, thumbSize=None, after=None):
         '''
-        Provides the meta data based on unified multi-plugin criteria.
+        Provides the meta data based on unified multi-plugin criteria. If the after meta data id is provided the meta
+        data are provided in the id order starting after it, without an offset scan or count, the criteria orderings are
+        ignored.
+        '''
+
+    def getFacets(self, qa=None, qi=None, qd=None):
+        '''
+        Provides the facet values counts for the meta data that match the unified multi-plugin criteria.
         '''
 
 # --------------------------------------------------------------------
@@ -62,9 +71,10 @@ class ISearchProvider:
     Provides the methods for search related functionality.
     '''
 
-    def buildQuery(self, session, scheme, offset, limit, qa=None, qi=None, qd=None):
+    def buildQuery(self, session, scheme, offset, limit, qa=None, qi=None, qd=None, after=None):
         '''
-        Provides the meta data based query on unified multi-plugin criteria.
+        Provides the meta data based query on unified multi-plugin criteria, and the total count which is None if the
+        query is seeked after a meta data id.
         '''
 
     # --------------------------------------------------------------------
@@ -81,6 +91,13 @@ class ISearchProvider:
         Provides the delete of data from search indexes.
         '''
 
+    # --------------------------------------------------------------------
+
+    def buildFacets(self, session, qa=None, qi=None, qd=None):
+        '''
+        Provides the facet values counts on unified multi-plugin criteria, as (facet, value, count) tuples.
+        '''
+
 # --------------------------------------------------------------------
 
 class QueryServiceAlchemy(SessionSupport):
@@ -118,12 +135,12 @@ class QueryServiceAlchemy(SessionSupport):
 
     # --------------------------------------------------------------------
 
-    def getMetaInfos(self, scheme, offset=None, limit=1000, qa=None, qi=None, qd=None, thumbSize=None):
+    def getMetaInfos(self, scheme, offset=None, limit=1000, qa=None, qi=None, qd=None, thumbSize=None, after=None):
         '''
         Provides the meta data based on unified multi-plugin criteria.
         '''
 
-        sql, count = self.searchProvider.buildQuery(self.session(), scheme, offset, limit, qa, qi, qd)
+        sql, count = self.searchProvider.buildQuery(self.session(), scheme, offset, limit, qa, qi, qd, after)
         
         indexDict = {}
         languageId = None
@@ -135,7 +152,7 @@ class QueryServiceAlchemy(SessionSupport):
         if count == 0:
             return IterPart(metaDataInfos, count, offset, limit)
         
-        count = 0
+        index = 0
 
         for row in sql.all():
             metaDataMapped = row[0]
@@ -144,9 +161,8 @@ class QueryServiceAlchemy(SessionSupport):
             if languageId and metaDataMapped.Id in indexDict:
                 if languageId != metaInfoMapped.Language: continue
                 else: 
-                    index = indexDict[metaDataMapped.Id]
-                    del metaDataInfos[index]
-                    count = count - 1
+                    del metaDataInfos[indexDict[metaDataMapped.Id]]
+                    index = index - 1
            
             assert isinstance(metaDataMapped, MetaDataMapped), 'Invalid meta data %s' % metaDataMapped
             metaDataMapped.Content = self.cdmArchive.getURI(metaDataMapped.content, scheme)
@@ -170,7 +186,24 @@ class QueryServiceAlchemy(SessionSupport):
 
             metaDataInfos.append(metaDataInfo)
             
-            indexDict[metaDataMapped.Id] = count
-            count = count + 1
+            indexDict[metaDataMapped.Id] = index
+            index = index + 1
             
-        return IterPart(metaDataInfos, count, offset, limit)
+        # The total is provided by the search, a seeked query has no total so the page size is provided.
+        return IterPart(metaDataInfos, index if count is None else count, offset, limit)
+
+    # --------------------------------------------------------------------
+
+    def getFacets(self, qa=None, qi=None, qd=None):
+        '''
+        Provides the facet values counts based on unified multi-plugin criteria.
+        '''
+        facets = list()
+        for facet, value, count in self.searchProvider.buildFacets(self.session(), qa, qi, qd):
+            metaDataFacet = MetaDataFacet()
+            metaDataFacet.Facet = facet
+            metaDataFacet.Value = value
+            metaDataFacet.Count = count
+            facets.append(metaDataFacet)
+
+        return facets
@@ -9,19 +9,25 @@ Created on Jan 10, 2013
 The implementation for Solr based search API.
 '''
 
+from httplib2 import Http
+from io import BytesIO
 from sunburnt import SolrInterface
+from sunburnt.schema import SolrSchema
+from threading import Lock, local
+from urllib.parse import urljoin
+import time
 from ally.container.ioc import injected
 from superdesk.media_archive.core.impl.query_service_creator import QMetaDataInfo, \
      ISearchProvider
 from superdesk.media_archive.api.criteria import AsLikeExpression
 from superdesk.media_archive.meta.meta_data import MetaDataMapped
 from superdesk.media_archive.meta.meta_info import MetaInfoMapped
+from superdesk.media_archive.core.impl.db_search import FACETS
 from ally.container import wire
 from itertools import chain
 from ally.api.criteria import AsBoolean, AsLike, AsEqual, AsDate, AsDateTime, \
     AsRange, AsTime, AsOrdered
 from ally.support.api.util_service import namesForQuery
-from ally.api.extension import IterPart
 
 @injected
 class SolrSearchProvider(ISearchProvider):
@@ -31,10 +37,16 @@ class SolrSearchProvider(ISearchProvider):
 
     solr_server_url = 'localhost:8983/solr/'; wire.config('solr_server_url', doc='''The Solr server address
     ''')
+    solr_schema_timeout = 300; wire.config('solr_schema_timeout', doc='''
+    The number of seconds after which the Solr cores schemas are fetched again.
+    ''')
 
 
     def __init__(self):
         assert isinstance(self.solr_server_url, str), 'Invalid solr server url %s' % self.solr_server_url
+        assert isinstance(self.solr_schema_timeout, int), 'Invalid solr schema timeout %s' % self.solr_schema_timeout
+
+        self._interfaces = SolrInterfaces('http://%s' % self.solr_server_url, self.solr_schema_timeout)
 
     # ----------------------------------------------------------------
 
@@ -43,7 +55,7 @@ class SolrSearchProvider(ISearchProvider):
         @see: ISearchProvider.update()
         '''
 
-        si = SolrInterface('http://%s%s' % (self.solr_server_url, metaData.Type))
+        si = self._interfaces.interfaceFor(metaData.Type)
 
         document = dict()
 
@@ -71,7 +83,7 @@ class SolrSearchProvider(ISearchProvider):
         '''
         @see: ISearchProvider.delete()
         '''
-        si = SolrInterface('http://%s%s' % (self.solr_server_url, metaType))
+        si = self._interfaces.interfaceFor(metaType)
         si.delete(str(idMetaInfo))
         si.commit()
 
@@ -82,7 +94,7 @@ class SolrSearchProvider(ISearchProvider):
         Creates the solr query based on received REST queries
         '''
 
-        si = SolrInterface('http://%sother' % self.solr_server_url)
+        si = self._interfaces.interfaceFor('other')
         types = [self.queryIndexer.typesByMetaData[key] for key in self.queryIndexer.typesByMetaData.keys()]
 
         solrQuery = None
@@ -115,7 +127,7 @@ class SolrSearchProvider(ISearchProvider):
 
     # ----------------------------------------------------------------
 
-    def buildQuery(self, session, scheme, offset=None, limit=1000, qa=None, qi=None, qd=None):
+    def buildQuery(self, session, scheme, offset=None, limit=1000, qa=None, qi=None, qd=None, after=None):
         '''
         @see: ISearchProvider.buildQuery()
 
@@ -124,6 +136,9 @@ class SolrSearchProvider(ISearchProvider):
         '''
 
         solrQuery = self.processQuery(session, scheme, qa, qi, qd)
+        if after is not None:
+            solrQuery = solrQuery.query(MetaDataId__gt=after).sort_by('MetaDataId')
+            offset = None
         solrQuery = buildLimits(solrQuery, offset, limit)
 
         response = solrQuery.execute()
@@ -141,51 +156,116 @@ class SolrSearchProvider(ISearchProvider):
 
         if idList:
             sql = sql.filter(MetaInfoMapped.Id.in_(idList))
-
-        # TODO: test
-        self.buildFacetsQuery(session, scheme, qa=None, qi=None, qd=None)
+        if after is not None: sql = sql.order_by(MetaDataMapped.Id)
 
         return (sql, count)
 
 
 # ----------------------------------------------------------------
 
-    def buildFacetsQuery(self, session, scheme, qa=None, qi=None, qd=None):
+    def buildFacets(self, session, qa=None, qi=None, qd=None):
         '''
-        @see: ISearchProvider.getFacets()
+        @see: ISearchProvider.buildFacets()
 
         Creates the solr facets query and then return the list of facets
         '''
 
-        facets = []
-
-        solrQuery = self.processQuery(session, scheme, qa, qi, qd)
+        solrQuery = self.processQuery(session, None, qa, qi, qd)
 
         # construct the facets query
-        solrQuery = solrQuery.facet_by("Type")
-        solrQuery = solrQuery.facet_by("AudioEncoding")
-        solrQuery = solrQuery.facet_by("SampleRate")
-        solrQuery = solrQuery.facet_by("AudioBitrate")
-        solrQuery = solrQuery.facet_by("Genre")
-        solrQuery = solrQuery.facet_by("Year")
-        solrQuery = solrQuery.facet_by("CameraMake")
-        solrQuery = solrQuery.facet_by("VideoEncoding")
-        solrQuery = solrQuery.facet_by("VideoBitrate")
+        for facet in FACETS: solrQuery = solrQuery.facet_by(facet)
 
-        response = solrQuery.execute()
+        response = solrQuery.paginate(rows=0).execute()
         if response.status != 0:
-            return None
-
-        count = response.result.numFound
+            return []
 
-        # init the list of facets
-        print (response.facet_counts.facet_fields)
+        facets = []
+        for facet, values in response.facet_counts.facet_fields.items():
+            facets.extend((facet, str(value), count) for value, count in values if count)
 
-        return IterPart(facets, count, 0, count)
+        return facets
 
 # ----------------------------------------------------------------
 
 
+class SolrInterfaces:
+    '''
+    Registry for the Solr interfaces of the cores. The schema of a core is fetched and parsed once for all the threads
+    and it is fetched again after the timeout. Each thread has its own interfaces and http connection, since the
+    connections are not thread safe, the http connection is kept alive and shared by all the cores of the thread.
+    '''
+
+    def __init__(self, url, timeout):
+        '''
+        Construct the Solr interfaces registry.
+
+        @param url: string
+            The Solr server URL, the core name is appended to it.
+        @param timeout: integer
+            The number of seconds after which the schema of a core is fetched again.
+        '''
+        assert isinstance(url, str), 'Invalid url %s' % url
+        assert isinstance(timeout, int), 'Invalid timeout %s' % timeout
+        self.url = url
+        self.timeout = timeout
+
+        self._schemas = {}
+        # The cores schemas, core -> (schema, fetched on)
+        self._lock = Lock()
+        self._local = local()
+
+    def interfaceFor(self, core):
+        '''
+        Provides the Solr interface of the core for the current thread.
+
+        @param core: string
+            The core name.
+        @return: SolrInterface
+            The Solr interface.
+        '''
+        assert isinstance(core, str), 'Invalid core %s' % core
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = Http()
+            self._local.interfaces = {}
+
+        with self._lock: schema = self._schemas.get(core)
+        if schema is None or schema[1] + self.timeout < time.time():
+            schema = (self._fetchSchema(http, core), time.time())
+            with self._lock: self._schemas[core] = schema
+
+        interface = self._local.interfaces.get(core)
+        if interface is None or interface.schema is not schema[0]:
+            interface = self._local.interfaces[core] = ParsedSolrInterface(self.url + core, schemadoc=schema[0],
+                                                                           http_connection=http)
+        return interface
+
+    # ----------------------------------------------------------------
+
+    def _fetchSchema(self, http, core):
+        '''
+        Fetches and parses the schema of the core.
+        '''
+        url = urljoin(self.url + core + '/', SolrInterface.remote_schema_file)
+        response, content = http.request(url)
+        if response.status != 200:
+            raise EnvironmentError('Couldn\'t retrieve schema document from server - received status code %s\n%s' %
+                                   (response.status, content))
+        return SolrSchema(BytesIO(content))
+
+class ParsedSolrInterface(SolrInterface):
+    '''
+    Solr interface that receives as the schema document the already parsed schema.
+    '''
+
+    def init_schema(self):
+        '''
+        @see: SolrInterface.init_schema
+        '''
+        self.schema = self.schemadoc
+
+# ----------------------------------------------------------------
+
 def buildSolrQuery(si, solrQuery, query, orClauses):
     '''
     Builds the Solr query based on a given REST query.
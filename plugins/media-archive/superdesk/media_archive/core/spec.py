@@ -12,7 +12,11 @@ Provides the specification classes for the media archive.
 from ally.api.operator.type import TypeCriteriaEntry
 from ally.api.type import typeFor
 from ally.support.api.util_service import namesForQuery
+from ally.support.sqlalchemy.mapper import mappingFor
 from inspect import isclass
+from sqlalchemy.orm.properties import ColumnProperty
+from superdesk.media_archive.api.criteria import AsLikeExpression, \
+    AsLikeExpressionOrdered
 from superdesk.media_archive.api.meta_data import QMetaData
 from superdesk.media_archive.api.meta_info import QMetaInfo
 from superdesk.media_archive.meta.meta_data import MetaDataMapped
@@ -208,6 +212,11 @@ class QueryIndexer(IQueryIndexer):
         @ivar dataCriterias: dict{CriteriaName, Criteria class)
         Contains all meta data related criteria names and associated criteria class
 
+        @ivar likeColumnsByInfo: dict{MetaInfoName: list((CriteriaName, Column))}
+        Contains for all MetaInfo Names the like expression criteria names of the associated query and the columns
+        @ivar likeColumnsByData: dict{MetaDataName: list((CriteriaName, Column))}
+        Contains for all MetaData Names the like expression criteria names of the associated query and the columns
+
         '''
 
         self.metaDatasByInfo = dict()
@@ -228,6 +237,9 @@ class QueryIndexer(IQueryIndexer):
         self.infoCriterias = dict()
         self.dataCriterias = dict()
 
+        self.likeColumnsByInfo = dict()
+        self.likeColumnsByData = dict()
+
     # --------------------------------------------------------------------
 
     def register(self, EntryMetaInfoClass, QMetaInfoClass, EntryMetaDataClass, QMetaDataClass, type):
@@ -272,6 +284,9 @@ class QueryIndexer(IQueryIndexer):
         self.queryByData[EntryMetaDataClass.__name__] = QMetaDataClass
         self.queryByInfo[EntryMetaInfoClass.__name__] = QMetaInfoClass
 
+        self.likeColumnsByData[EntryMetaDataClass.__name__] = likeColumnsFor(EntryMetaDataClass, QMetaDataClass)
+        self.likeColumnsByInfo[EntryMetaInfoClass.__name__] = likeColumnsFor(EntryMetaInfoClass, QMetaInfoClass)
+
 
         for criteria in namesForQuery(QMetaInfoClass):
             criteriaClass = self.infoCriterias.get(criteria)
@@ -324,3 +339,27 @@ class QueryIndexer(IQueryIndexer):
                 self.dataCriterias[criteria] = criteriaType.clazz
 
             dataSet.add(EntryMetaDataClass)
+
+# --------------------------------------------------------------------
+
+def likeColumnsFor(mapped, queryClass):
+    '''
+    Provides the columns of the mapped class that are filtered by the like expression criteria of the query.
+
+    @param mapped: class
+        The mapped class to provide the columns for.
+    @param queryClass: class
+        The query class to provide the criteria for.
+    @return: list((string, Column))
+        The criteria names and the associated columns.
+    '''
+    mapper = mappingFor(mapped)
+    columns = {cp.key.lower(): getattr(mapper.c, cp.key)
+               for cp in mapper.iterate_properties if isinstance(cp, ColumnProperty)}
+
+    likeColumns = []
+    for criteria, criteriaClass in typeFor(queryClass).query.criterias.items():
+        if criteriaClass is not AsLikeExpression and criteriaClass is not AsLikeExpressionOrdered: continue
+        column = columns.get(criteria.lower())
+        if column is not None: likeColumns.append((criteria, column))
+    return likeColumns
@@ -15,7 +15,7 @@ from ally.container.ioc import injected
 from ally.container.support import setup
 from ally.support.api.util_service import processQuery
 from babel.core import Locale
-from babel.localedata import locale_identifiers
+from superdesk.core.spec import ILocaleRegistry
 from superdesk.media_archive.api.query_criteria import QueryCriteria
 from superdesk.media_archive.core.spec import IQueryIndexer
 
@@ -29,13 +29,15 @@ class QueryCriteriaService(IQueryCriteriaService):
     '''
 
     queryIndexer = IQueryIndexer;wire.entity('queryIndexer')
+    localeRegistry = ILocaleRegistry; wire.entity('localeRegistry')
+    # The shared locale registry.
 
     def __init__(self):
         '''
         Construct the query criteria service.
         '''
         assert isinstance(self.queryIndexer, IQueryIndexer), 'Invalid IQueryIndexer %s' % self.queryIndexer
-        self._locales = {code:Locale.parse(code) for code in locale_identifiers()}
+        assert isinstance(self.localeRegistry, ILocaleRegistry), 'Invalid locale registry %s' % self.localeRegistry
 
     def getCriterias(self, locales, q=None):
         '''
@@ -62,18 +64,6 @@ class QueryCriteriaService(IQueryCriteriaService):
 
     # ----------------------------------------------------------------
 
-    def _localeOf(self, code):
-        '''
-        Helper that parses the code to a babel locale.
-
-        @param code: string
-            The language code to provide the locale for.
-        @return: Locale|None
-            The locale for the code or None if the code is not valid.
-        '''
-        assert isinstance(code, str), 'Invalid code %s' % code
-        return self._locales.get(code.replace('-', '_'))
-
     def _localesOf(self, codes):
         '''
         Helper method that based on a language code list will provide a babel locales.
@@ -83,8 +73,7 @@ class QueryCriteriaService(IQueryCriteriaService):
         @return: Locale|None
             The locale for the code or None if the code is not valid.
         '''
-        if isinstance(codes, str): codes = [codes]
-        return list(filter(None, (self._localeOf(code) for code in codes)))
+        return self.localeRegistry.localesOf(codes)
 
     def _translate(self, key, default, locales):
         '''
@@ -0,0 +1,42 @@
+'''
+Created on Feb 26, 2013
+
+@package: superdesk media archive
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Ioan v. Pocol
+
+Contains the SQL alchemy meta for the media archive facets.
+'''
+
+from sqlalchemy.dialects.mysql.base import INTEGER
+from sqlalchemy.schema import Column
+from sqlalchemy.types import String, Integer
+from superdesk.meta.metadata_superdesk import Base
+
+# --------------------------------------------------------------------
+
+class MetaFacet(Base):
+    '''
+    Provides the mapping for the facet values of the meta info's.
+    This is not a REST model.
+    '''
+    __tablename__ = 'archive_meta_facet'
+    __table_args__ = dict(mysql_engine='InnoDB', mysql_charset='utf8')
+
+    # The meta info is not a foreign key because the facet values are needed after the meta info is deleted.
+    metaInfoId = Column('meta_info_id', INTEGER(unsigned=True), primary_key=True)
+    facet = Column('facet', String(50), primary_key=True)
+    value = Column('value', String(255), nullable=False)
+
+class FacetCount(Base):
+    '''
+    Provides the mapping for the number of meta info's that have a facet value.
+    This is not a REST model.
+    '''
+    __tablename__ = 'archive_facet_count'
+    __table_args__ = dict(mysql_engine='InnoDB', mysql_charset='utf8')
+
+    facet = Column('facet', String(50), primary_key=True)
+    value = Column('value', String(255), primary_key=True)
+    count = Column('count', Integer, nullable=False)
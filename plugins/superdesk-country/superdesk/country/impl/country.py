@@ -9,7 +9,8 @@ Created on Jun 23, 2011
 SQL alchemy implementation for language API.
 '''
 
-from ..api.country import Country, ICountryService
+from ..api.country import Country, ICountryService, QCountry
+from ally.api.criteria import AsLikeOrdered
 from ally.api.extension import IterPart
 from ally.container import wire
 from ally.container.ioc import injected
@@ -18,7 +19,10 @@ from ally.exception import InputError, Ref
 from ally.internationalization import _
 from ally.support.api.util_service import trimIter, processQuery
 from babel.core import Locale
-from babel.localedata import locale_identifiers
+from collections import OrderedDict
+from superdesk.core.catalog import Catalog, likePrefix
+from superdesk.core.spec import ILocaleRegistry
+from threading import Lock
 
 # --------------------------------------------------------------------
 
@@ -36,13 +40,24 @@ class CountryServiceBabelAlchemy(ICountryService):
     '''
 
     countries = Countries; wire.entity('countries')
+    localeRegistry = ILocaleRegistry; wire.entity('localeRegistry')
+    # The shared locale registry.
+    catalog_cache_size = 20; wire.config('catalog_cache_size', doc='''
+    The number of available countries catalogs to keep in memory, a catalog is kept for each distinct list of locales
+    that the countries are translated with.
+    ''')
 
     def __init__(self):
         '''
         Construct the country service.
         '''
         assert isinstance(self.countries, Countries), 'Invalid countries %s' % self.countries
-        self._locales = {code:Locale.parse(code) for code in locale_identifiers()}
+        assert isinstance(self.localeRegistry, ILocaleRegistry), 'Invalid locale registry %s' % self.localeRegistry
+        assert isinstance(self.catalog_cache_size, int), 'Invalid catalog cache size %s' % self.catalog_cache_size
+
+        self._catalogs = OrderedDict()
+        # The countries catalogs, tuple(locale codes) -> Catalog of (code, name)
+        self._lock = Lock()
 
     def getByCode(self, code, locales):
         '''
@@ -55,43 +70,60 @@ class CountryServiceBabelAlchemy(ICountryService):
         '''
         @see: ILanguageService.getAllAvailable
         '''
-        locales = self._localesOf(locales)
+        catalog = self._catalogOf(self._localesOf(locales))
+        assert isinstance(catalog, Catalog)
         if q:
-            countries = (Country(code, self._translate(code, locales)) for code in self.countries)
-            countries = processQuery(countries, q, Country)
+            assert isinstance(q, QCountry), 'Invalid query %s' % q
+            entries = catalog.entries
+            if QCountry.name in q and AsLikeOrdered.like in q.name:
+                # Only the countries that can match the name prefix are provided to the query processing.
+                prefix = likePrefix(q.name.like)
+                if prefix is not None: entries = catalog.prefixed(prefix)
+            countries = processQuery((Country(code, name) for code, name in entries), q, Country)
             length = len(countries)
             countries = trimIter(countries, length, offset, limit)
         else:
-            length = len(self.countries)
-            countries = trimIter(self.countries, length, offset, limit)
-            countries = (Country(code, self._translate(code, locales)) for code in countries)
+            length = len(catalog.entries)
+            countries = trimIter(catalog.entries, length, offset, limit)
+            countries = (Country(code, name) for code, name in countries)
         return IterPart(countries, length, offset, limit)
 
     # ----------------------------------------------------------------
 
-    def _localeOf(self, code):
+    def _localesOf(self, codes):
         '''
-        Helper that parses the code to a babel locale.
+        Helper method that based on a language code list will provide a babel locales.
         
-        @param code: string
+        @param codes: string|iter(string)
             The language code to provide the locale for.
         @return: Locale|None
             The locale for the code or None if the code is not valid.
         '''
-        assert isinstance(code, str), 'Invalid code %s' % code
-        return self._locales.get(code.replace('-', '_'))
+        return self.localeRegistry.localesOf(codes)
 
-    def _localesOf(self, codes):
+    def _catalogOf(self, locales):
         '''
-        Helper method that based on a language code list will provide a babel locales.
+        Helper method that provides the catalog of the countries translated with the locales, the catalog is built
+        when the locales are first used.
         
-        @param codes: string|iter(string)
-            The language code to provide the locale for.
-        @return: Locale|None
-            The locale for the code or None if the code is not valid.
+        @param locales: list[Locale]
+            The locales to translate the countries names with.
+        @return: Catalog
+            The countries catalog, in the countries order and indexed by the country name.
         '''
-        if isinstance(codes, str): codes = [codes]
-        return list(filter(None, (self._localeOf(code) for code in codes)))
+        key = tuple(str(locale) for locale in locales)
+        with self._lock:
+            catalog = self._catalogs.get(key)
+            if catalog is not None:
+                self._catalogs.move_to_end(key)
+                return catalog
+
+        catalog = Catalog(((code, self._translate(code, locales)) for code in self.countries), lambda entry: entry[1])
+
+        with self._lock:
+            self._catalogs[key] = catalog
+            while len(self._catalogs) > self.catalog_cache_size: self._catalogs.popitem(last=False)
+        return catalog
 
     def _translate(self, code, locales):
         '''
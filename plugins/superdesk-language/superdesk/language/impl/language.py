@@ -9,6 +9,7 @@ Created on Jun 23, 2011
 SQL alchemy implementation for language API.
 '''
 
+from ally.container import wire
 from ally.container.binder_op import validateProperty
 from ally.container.ioc import injected
 from ally.container.support import setup
@@ -16,12 +17,15 @@ from ally.exception import InputError, DevelError, Ref
 from ally.internationalization import _
 from ally.support.api.util_service import trimIter, processQuery
 from babel.core import Locale
-from babel.localedata import locale_identifiers
 from collections import OrderedDict
 from sql_alchemy.impl.entity import EntityNQServiceAlchemy
-from superdesk.language.api.language import Language, ILanguageService
+from superdesk.core.catalog import Catalog, likePrefix
+from superdesk.core.spec import ILocaleRegistry
+from superdesk.language.api.language import Language, ILanguageService, QLanguage
 from superdesk.language.meta.language import LanguageEntity
+from ally.api.criteria import AsLikeOrdered
 from ally.api.extension import IterPart
+from threading import Lock
 
 # --------------------------------------------------------------------
 
@@ -32,40 +36,54 @@ class LanguageServiceBabelAlchemy(EntityNQServiceAlchemy, ILanguageService):
     Implementation for @see: ILanguageService using Babel library.
     '''
 
+    localeRegistry = ILocaleRegistry; wire.entity('localeRegistry')
+    # The shared locale registry.
+    catalog_cache_size = 20; wire.config('catalog_cache_size', doc='''
+    The number of available languages catalogs to keep in memory, a catalog is kept for each distinct list of locales
+    that the languages are translated with.
+    ''')
+
     def __init__(self):
         '''
         Construct the language service.
         '''
+        assert isinstance(self.localeRegistry, ILocaleRegistry), 'Invalid locale registry %s' % self.localeRegistry
+        assert isinstance(self.catalog_cache_size, int), 'Invalid catalog cache size %s' % self.catalog_cache_size
         EntityNQServiceAlchemy.__init__(self, LanguageEntity)
-        locales = [(code, Locale.parse(code)) for code in locale_identifiers()]
-        locales.sort(key=lambda pack: pack[0])
-        self._locales = OrderedDict(locales)
         validateProperty(LanguageEntity.Code, self._validateCode)
 
+        self._catalogs = OrderedDict()
+        # The languages catalogs, tuple(locale codes) -> Catalog of (code, name, territory, script, variant)
+        self._lock = Lock()
+
     def getByCode(self, code, locales):
         '''
         @see: ILanguageService.getByCode
         '''
         locale = self._localeOf(code)
         if not locale: raise InputError(Ref(_('Unknown language code'), ref=Language.Code))
-        return self._populate(Language(code), self._translator(locale, self._localesOf(locales)))
+        return self._populate(Language(code), self._translator(code, self._localesOf(locales)))
 
     def getAllAvailable(self, locales, offset=None, limit=None, q=None):
         '''
         @see: ILanguageService.getAllAvailable
         '''
-        locales = self._localesOf(locales)
+        catalog = self._catalogOf(self._localesOf(locales))
+        assert isinstance(catalog, Catalog)
         if q:
-            languages = (self._populate(Language(code), self._translator(locale, locales))
-                         for code, locale in self._locales.items())
-            languages = processQuery(languages, q, Language)
+            assert isinstance(q, QLanguage), 'Invalid query %s' % q
+            entries = catalog.entries
+            if QLanguage.name in q and AsLikeOrdered.like in q.name:
+                # Only the languages that can match the name prefix are provided to the query processing.
+                prefix = likePrefix(q.name.like)
+                if prefix is not None: entries = catalog.prefixed(prefix)
+            languages = processQuery((self._languageOf(entry) for entry in entries), q, Language)
             length = len(languages)
             languages = trimIter(languages, length, offset, limit)
         else:
-            length = len(self._locales)
-            languages = trimIter(self._locales.items(), length, offset, limit)
-            languages = (self._populate(Language(code), self._translator(locale, locales))
-                         for code, locale in languages)
+            length = len(catalog.entries)
+            languages = trimIter(catalog.entries, length, offset, limit)
+            languages = (self._languageOf(entry) for entry in languages)
         return IterPart(languages, length, offset, limit)
 
     def getById(self, id, locales):
@@ -75,7 +93,7 @@ class LanguageServiceBabelAlchemy(EntityNQServiceAlchemy, ILanguageService):
         locales = self._localesOf(locales)
         language = self.session().query(LanguageEntity).get(id)
         if not language: raise InputError(Ref(_('Unknown language id'), ref=LanguageEntity.Id))
-        return self._populate(language, self._translator(self._localeOf(language.Code), locales))
+        return self._populate(language, self._translator(language.Code, locales))
 
     def getAll(self, locales=(), offset=None, limit=None, detailed=False):
         '''
@@ -84,8 +102,7 @@ class LanguageServiceBabelAlchemy(EntityNQServiceAlchemy, ILanguageService):
         locales = self._localesOf(locales)
         if detailed: languages, total = self._getAllWithCount(offset=offset, limit=limit)
         else: languages = self._getAll(offset=offset, limit=limit)
-        languages = (self._populate(language, self._translator(self._localeOf(language.Code), locales))
-                for language in languages)
+        languages = (self._populate(language, self._translator(language.Code, locales)) for language in languages)
         if detailed: return IterPart(languages, total, offset, limit)
         return languages
 
@@ -100,8 +117,7 @@ class LanguageServiceBabelAlchemy(EntityNQServiceAlchemy, ILanguageService):
         @return: Locale|None
             The locale for the code or None if the code is not valid.
         '''
-        assert isinstance(code, str), 'Invalid code %s' % code
-        return self._locales.get(code.replace('-', '_'))
+        return self.localeRegistry.localeOf(code)
 
     def _localesOf(self, codes):
         '''
@@ -112,27 +128,24 @@ class LanguageServiceBabelAlchemy(EntityNQServiceAlchemy, ILanguageService):
         @return: Locale|None
             The locale for the code or None if the code is not valid.
         '''
-        if isinstance(codes, str): codes = [codes]
-        return list(filter(None, (self._localeOf(code) for code in codes)))
+        return self.localeRegistry.localesOf(codes)
 
-    def _translator(self, locale, locales):
+    def _translator(self, code, locales):
         '''
         Helper method that provides the translated language name for locale based on the locales list, the first
         locale will be used if not translation will be available for that than it will fall back to the next.
         
-        @param locale: Locale
-            The locale to get the translator for.
+        @param code: string
+            The language code to get the translator for.
         @param locales: list[Locale]|tuple(Locale)
             The locales to translate the name for.
-        @return: Locale
-            The translating locale.
+        @return: Locale|None
+            The translating locale, None if the language locale itself should be used.
         '''
-        assert isinstance(locale, Locale), 'Invalid locale %s' % locale
         assert isinstance(locales, (list, tuple)), 'Invalid locales %s' % locales
         for loc in locales:
             assert isinstance(loc, Locale), 'Invalid locale %s' % loc
-            if locale.language in loc.languages: return loc
-        return locale
+            if self.localeRegistry.namesOf(code, loc)[0]: return loc
 
     def _populate(self, language, translator):
         '''
@@ -140,19 +153,57 @@ class LanguageServiceBabelAlchemy(EntityNQServiceAlchemy, ILanguageService):
         
         @param language: Language
             The language to be populated with info from the locale.
-        @param translator: Locale
-            The translating locale to populate from.
+        @param translator: Locale|None
+            The translating locale to populate from, None to use the language locale.
         '''
         assert isinstance(language, Language), 'Invalid language %s' % language
-        assert isinstance(translator, Locale), 'Invalid translator locale %s' % translator
+        assert translator is None or isinstance(translator, Locale), 'Invalid translator locale %s' % translator
 
-        locale = self._localeOf(language.Code)
-        if not locale: raise DevelError('Invalid language code %r' % language.Code)
+        names = self.localeRegistry.namesOf(language.Code, translator)
+        if not names: raise DevelError('Invalid language code %r' % language.Code)
+
+        language.Name, territory, script, variant = names
+        if territory: language.Territory = territory
+        if script: language.Script = script
+        if variant: language.Variant = variant
+        return language
 
-        language.Name = translator.languages.get(locale.language)
-        if locale.territory: language.Territory = translator.territories.get(locale.territory)
-        if locale.script: language.Script = translator.scripts.get(locale.script)
-        if locale.variant: language.Variant = translator.variants.get(locale.variant)
+    def _catalogOf(self, locales):
+        '''
+        Helper method that provides the catalog of the available languages translated with the locales, the catalog is
+        built when the locales are first used.
+        
+        @param locales: list[Locale]
+            The locales to translate the languages names with.
+        @return: Catalog
+            The languages catalog, sorted by the language code and indexed by the language name.
+        '''
+        key = tuple(str(locale) for locale in locales)
+        with self._lock:
+            catalog = self._catalogs.get(key)
+            if catalog is not None:
+                self._catalogs.move_to_end(key)
+                return catalog
+
+        entries = ((code,) + self.localeRegistry.namesOf(code, self._translator(code, locales))
+                   for code in self.localeRegistry.codes())
+        catalog = Catalog(entries, lambda entry: entry[1])
+
+        with self._lock:
+            self._catalogs[key] = catalog
+            while len(self._catalogs) > self.catalog_cache_size: self._catalogs.popitem(last=False)
+        return catalog
+
+    def _languageOf(self, entry):
+        '''
+        Helper method that creates the language for a catalog entry.
+        '''
+        code, name, territory, script, variant = entry
+        language = Language(code)
+        language.Name = name
+        if territory: language.Territory = territory
+        if script: language.Script = script
+        if variant: language.Variant = variant
         return language
 
     def _validateCode(self, language, model, prop, errors):
@@ -19,6 +19,7 @@ if True:
 from ally.container import ioc
 from profile import Profile
 from superdesk.language.api.language import QLanguage
+from superdesk.core.impl.locale_registry import LocaleRegistryBabel
 from superdesk.language.impl.language import LanguageServiceBabelAlchemy
 import pstats
 import unittest
@@ -33,8 +34,13 @@ class TestLanguage(unittest.TestCase):
         localedata._dirname = localedata._dirname.replace('.egg', '')
         core._filename = core._filename.replace('.egg', '')
     
+        localeRegistry = LocaleRegistryBabel()
+        ioc.initialize(localeRegistry)
         languageService = LanguageServiceBabelAlchemy()
+        languageService.localeRegistry = localeRegistry
         ioc.initialize(languageService)
+        # The first call builds the catalog for the locales, the profiling is done on the catalog query.
+        languageService.getAllAvailable(['en'], 0, 10, QLanguage(name='rom%'))
         
         profile = Profile()
         qlang = QLanguage(name='rom%')
@@ -0,0 +1,34 @@
+'''
+Created on Feb 15, 2013
+
+@package: superdesk person icon
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Mugur Rus
+
+Provides the specification classes for the person icons.
+'''
+
+import abc
+
+# --------------------------------------------------------------------
+
+class IPersonIconResolver(metaclass=abc.ABCMeta):
+    '''
+    The person icons bulk resolving specification.
+    '''
+
+    @abc.abstractclassmethod
+    def thumbnailsFor(self, personIds, scheme='http', thumbSize=None):
+        '''
+        Provides the icon thumbnails for the provided persons.
+
+        @param personIds: Iterable(integer)
+            The ids of the persons to provide the thumbnails for.
+        @param scheme: string
+            The scheme protocol to provide the thumbnails references for.
+        @param thumbSize: string|None
+            The thumbnail size.
+        @return: dictionary{integer: string}
+            The thumbnails references indexed by person id, the persons that have no icon are not present.
+        '''
@@ -18,25 +18,59 @@ from ally.support.sqlalchemy.session import SessionSupport
 from ally.support.sqlalchemy.util_service import handle
 from sqlalchemy.exc import SQLAlchemyError
 from superdesk.media_archive.api.meta_data import IMetaDataService
+from superdesk.media_archive.core.spec import IThumbnailManager
+from superdesk.media_archive.meta.meta_data import MetaDataMapped
 from superdesk.person_icon.api.person_icon import IPersonIconService
+from superdesk.person_icon.core.spec import IPersonIconResolver
 from superdesk.person_icon.meta.person_icon import PersonIconMapped
+from collections import OrderedDict
+from sqlalchemy import event
+from threading import Lock
+from weakref import WeakKeyDictionary
+import logging
+import time
+
+# --------------------------------------------------------------------
+
+log = logging.getLogger(__name__)
 
 # --------------------------------------------------------------------
 
 @injected
-@setup(IPersonIconService, name='personIconService')
-class PersonIconServiceAlchemy(SessionSupport, IPersonIconService):
+@setup(IPersonIconService, IPersonIconResolver, name='personIconService')
+class PersonIconServiceAlchemy(SessionSupport, IPersonIconService, IPersonIconResolver):
     '''
-    Implementation for @see: IPersonIconService
+    Implementation for @see: IPersonIconService and @see: IPersonIconResolver
     '''
     metaDataService = IMetaDataService; wire.entity('metaDataService')
     # provides the metadata service in order to retrieve metadata of the person icon
+    thumbnailManager = IThumbnailManager; wire.entity('thumbnailManager')
+    # provides the thumbnails for the bulk resolved person icons
+    thumbnails_cache_size = 2000; wire.config('thumbnails_cache_size', doc='''
+    The maximum number of persons for which to keep the icon thumbnails references in memory, 0 disables the cache.
+    ''')
+    thumbnails_cache_timeout = 300; wire.config('thumbnails_cache_timeout', doc='''
+    The number of seconds the cached icon thumbnails references are valid, the icons set through this service
+    invalidate the cache right away but the icons changed by other processes are seen only after this timeout.
+    ''')
 
     def __init__(self):
         '''
         Construct the service
         '''
         assert isinstance(self.metaDataService, IMetaDataService), 'Invalid metadata service %s' % self.metaDataService
+        assert isinstance(self.thumbnailManager, IThumbnailManager), 'Invalid thumbnail manager %s' % self.thumbnailManager
+        assert isinstance(self.thumbnails_cache_size, int), \
+        'Invalid thumbnails cache size %s' % self.thumbnails_cache_size
+        assert isinstance(self.thumbnails_cache_timeout, int), \
+        'Invalid thumbnails cache timeout %s' % self.thumbnails_cache_timeout
+
+        self._cache_thumbnails = OrderedDict()
+        # The thumbnails cache, person id -> (expire time, dictionary of thumbnails references (or None if the person
+        # has no icon) indexed by scheme and thumbnail size)
+        self._pending = WeakKeyDictionary()
+        # The persons to invalidate when the session ends, session -> set(person ids)
+        self._lock = Lock()
 
     def getByPersonId(self, id, scheme='http', thumbSize=None):
         '''
@@ -59,4 +93,74 @@ class PersonIconServiceAlchemy(SessionSupport, IPersonIconService):
             self.session().merge(entityDb)
             self.session().flush((entityDb,))
         except SQLAlchemyError as e: handle(e, entityDb)
+        self._invalidate(personId)
         return entityDb.Id
+
+    def thumbnailsFor(self, personIds, scheme='http', thumbSize=None):
+        '''
+        @see: IPersonIconResolver.thumbnailsFor
+        '''
+        key, thumbnails, missing, resolved = (scheme, thumbSize), {}, set(), {}
+        with self._lock:
+            now = time.time()
+            for personId in personIds:
+                if personId is None: continue
+                cached = self._cache_thumbnails.get(personId)
+                if cached is None or cached[0] <= now or key not in cached[1]: missing.add(personId)
+                else:
+                    self._cache_thumbnails.move_to_end(personId)
+                    if cached[1][key] is not None: thumbnails[personId] = cached[1][key]
+
+        if missing:
+            sql = self.session().query(PersonIconMapped.Id, MetaDataMapped)
+            sql = sql.join(MetaDataMapped, MetaDataMapped.Id == PersonIconMapped.MetaData)
+            sql = sql.filter(PersonIconMapped.Id.in_(missing))
+            for personId, metaData in sql.all():
+                try: thumbnail = self.thumbnailManager.populate(metaData, scheme, thumbSize).Thumbnail
+                except Exception:
+                    assert log.debug('Cannot provide the icon thumbnail for person %s', personId, exc_info=True) or True
+                    thumbnail = None
+                resolved[personId] = thumbnail
+                if thumbnail is not None: thumbnails[personId] = thumbnail
+            for personId in missing: resolved.setdefault(personId, None)
+
+        if resolved and self.thumbnails_cache_size > 0:
+            with self._lock:
+                now = time.time()
+                for personId, thumbnail in resolved.items():
+                    cached = self._cache_thumbnails.get(personId)
+                    if cached is None or cached[0] <= now:
+                        cached = self._cache_thumbnails[personId] = (now + self.thumbnails_cache_timeout, {})
+                    cached[1][key] = thumbnail
+                    self._cache_thumbnails.move_to_end(personId)
+                while len(self._cache_thumbnails) > self.thumbnails_cache_size:
+                    self._cache_thumbnails.popitem(last=False)
+
+        return thumbnails
+
+    # ----------------------------------------------------------------
+
+    def _invalidate(self, personId):
+        '''
+        Removes the cached thumbnails of the person, the thumbnails are removed again when the current session ends so
+        the thumbnails read by a concurrent request before the commit are not kept in the cache.
+        '''
+        session = self.session()
+        with self._lock:
+            self._cache_thumbnails.pop(personId, None)
+            pending = self._pending.get(session)
+            if pending is None:
+                pending = self._pending[session] = set()
+                event.listen(session, 'after_commit', self._onEnd)
+                event.listen(session, 'after_rollback', self._onEnd)
+            pending.add(personId)
+
+    def _onEnd(self, session):
+        '''
+        Removes the cached thumbnails of the persons changed by the ended session.
+        '''
+        with self._lock:
+            pending = self._pending.get(session)
+            if not pending: return
+            for personId in pending: self._cache_thumbnails.pop(personId, None)
+            pending.clear()
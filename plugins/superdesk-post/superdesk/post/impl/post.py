@@ -16,21 +16,54 @@ from ally.api.extension import IterPart
 from ally.container import wire
 from ally.container.ioc import injected
 from ally.container.support import setup
-from ally.exception import InputError, Ref
+from ally.exception import InputError, Ref, DevelError
 from ally.internationalization import _
 from ally.support.api.util_service import copy
 from ally.support.sqlalchemy.util_service import buildQuery, buildLimits
 from sql_alchemy.impl.entity import EntityGetServiceAlchemy
-from sqlalchemy.orm.exc import NoResultFound
 from superdesk.collaborator.meta.collaborator import CollaboratorMapped
+from superdesk.core.reference import ReferenceCache
 from superdesk.post.api.post import Post, QPostUnpublished, QPost
 from superdesk.source.meta.source import SourceMapped
 from sqlalchemy.sql.functions import current_timestamp
+import re
+import sys
 
 # --------------------------------------------------------------------
 
 COPY_EXCLUDE = ('Type', 'IsModified', 'IsPublished', 'AuthorName')
 
+if sys.maxunicode > 0xFFFF: SANITIZE_TEXT = re.compile('[\U00010000-\U0010FFFF]')
+else: SANITIZE_TEXT = re.compile('[\ud800-\udbff][\udc00-\udfff]')
+# The characters outside the basic multilingual plane, they cannot be stored in the MySQL utf8 columns. On the narrow
+# builds these characters are kept as surrogate pairs.
+
+def sanitizeText(text):
+    '''
+    Removes from the text the characters that cannot be stored in the database.
+    
+    @param text: string|None
+        The text to sanitize.
+    @return: string|None
+        The sanitized text.
+    '''
+    if not text: return text
+    return SANITIZE_TEXT.sub('', text)
+
+def sanitizePost(post):
+    '''
+    Sanitizes the post texts, @see: sanitizeText.
+    
+    @param post: Post
+        The post to sanitize the texts for.
+    '''
+    assert isinstance(post, Post), 'Invalid post %s' % post
+    for name in ('Meta', 'Content', 'ContentPlain'):
+        text = getattr(post, name)
+        if not text: continue
+        sanitized = sanitizeText(text)
+        if sanitized != text: setattr(post, name, sanitized)
+
 @injected
 @setup(IPostService)
 class PostServiceAlchemy(EntityGetServiceAlchemy, IPostService):
@@ -46,6 +79,8 @@ class PostServiceAlchemy(EntityGetServiceAlchemy, IPostService):
         '''
         EntityGetServiceAlchemy.__init__(self, PostMapped)
 
+        self._cache_types = ReferenceCache(PostTypeMapped, PostTypeMapped.Key, PostTypeMapped.id)
+
     def getUnpublished(self, creatorId=None, authorId=None, offset=None, limit=None, detailed=False, q=None):
         '''
         @see: IPostService.getUnpublished
@@ -89,11 +124,7 @@ class PostServiceAlchemy(EntityGetServiceAlchemy, IPostService):
         copy(post, postDb, exclude=COPY_EXCLUDE)
         postDb.typeId = self._typeId(post.Type)
 
-        # TODO: implement the proper fix using SQLAlchemy compilation rules
-        nohigh = { i: None for i in range(0x10000, 0x110000) }
-        if postDb.Meta: postDb.Meta = postDb.Meta.translate(nohigh)
-        if postDb.Content: postDb.Content = postDb.Content.translate(nohigh)
-        if postDb.ContentPlain: postDb.ContentPlain = postDb.ContentPlain.translate(nohigh)
+        sanitizePost(postDb)
 
         if post.CreatedOn is None: postDb.CreatedOn = current_timestamp()
         if not postDb.Author:
@@ -101,8 +132,10 @@ class PostServiceAlchemy(EntityGetServiceAlchemy, IPostService):
             if not colls:
                 coll = CollaboratorMapped()
                 coll.User = postDb.Creator
-                src = self.session().query(SourceMapped).filter(SourceMapped.Name == PostServiceAlchemy.default_source_name).one()
-                coll.Source = src.Id
+                sql = self.session().query(SourceMapped.Id)
+                sql = sql.filter(SourceMapped.Name == PostServiceAlchemy.default_source_name)
+                coll.Source = sql.order_by(SourceMapped.Id).limit(1).scalar()
+                if coll.Source is None: raise DevelError('No default source %r' % PostServiceAlchemy.default_source_name)
                 self.session().add(coll)
                 self.session().flush((coll,))
                 colls = (coll,)
@@ -124,7 +157,9 @@ class PostServiceAlchemy(EntityGetServiceAlchemy, IPostService):
         if Post.Type in post: postDb.typeId = self._typeId(post.Type)
         if post.UpdatedOn is None: postDb.UpdatedOn = current_timestamp()
 
-        self.session().flush((copy(post, postDb, exclude=COPY_EXCLUDE),))
+        copy(post, postDb, exclude=COPY_EXCLUDE)
+        sanitizePost(postDb)
+        self.session().flush((postDb,))
 
     def delete(self, id):
         '''
@@ -157,8 +192,6 @@ class PostServiceAlchemy(EntityGetServiceAlchemy, IPostService):
         '''
         Provides the post type id that has the provided key.
         '''
-        try:
-            sql = self.session().query(PostTypeMapped.id).filter(PostTypeMapped.Key == key)
-            return sql.one()[0]
-        except NoResultFound:
-            raise InputError(Ref(_('Invalid post type %(type)s') % dict(type=key), ref=Post.Type))
+        typeId = self._cache_types.get(self.session(), key)
+        if typeId is None: raise InputError(Ref(_('Invalid post type %(type)s') % dict(type=key), ref=Post.Type))
+        return typeId
@@ -0,0 +1,46 @@
+'''
+Created on Feb 22, 2013
+
+@package: superdesk posts
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Provides the micro benchmark for the posts text sanitization.
+'''
+
+# Required in order to register the package extender whenever the unit test is run.
+if True:
+    import package_extender
+    package_extender.PACKAGE_EXTENDER.setForUnitTest(True)
+
+# --------------------------------------------------------------------
+
+from superdesk.post.impl.post import sanitizeText
+from timeit import timeit
+import unittest
+
+# --------------------------------------------------------------------
+
+class TestPostSanitize(unittest.TestCase):
+
+    def testPerformance(self):
+        texts = ('<p>Breaking news from the live event, more updates to follow.</p>' * 50,
+                 '<p>Reactions \U0001F600 from the crowd \U0001F44D</p>' * 50)
+
+        def translate():
+            # The previous sanitization that was building the translation table for each post.
+            nohigh = { i: None for i in range(0x10000, 0x110000) }
+            return [text.translate(nohigh) for text in texts]
+
+        def sanitize(): return [sanitizeText(text) for text in texts]
+
+        self.assertEqual(translate(), sanitize())
+
+        timeTranslate = timeit(translate, number=5)
+        timeSanitize = timeit(sanitize, number=5)
+        print('Translate table: %.6f seconds, sanitize: %.6f seconds' % (timeTranslate, timeSanitize))
+
+# --------------------------------------------------------------------
+
+if __name__ == '__main__': unittest.main()
@@ -0,0 +1,44 @@
+'''
+Created on Feb 22, 2013
+
+@package: superdesk posts
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Provides unit testing for the posts text sanitization.
+'''
+
+# Required in order to register the package extender whenever the unit test is run.
+if True:
+    import package_extender
+    package_extender.PACKAGE_EXTENDER.setForUnitTest(True)
+
+# --------------------------------------------------------------------
+
+from superdesk.post.api.post import Post
+from superdesk.post.impl.post import sanitizeText, sanitizePost
+import unittest
+
+# --------------------------------------------------------------------
+
+class TestPostSanitize(unittest.TestCase):
+
+    def testSanitizeText(self):
+        self.assertEqual(None, sanitizeText(None))
+        self.assertEqual('', sanitizeText(''))
+        self.assertEqual('<p>Breaking news</p>', sanitizeText('<p>Breaking news</p>'))
+        self.assertEqual('Reactions  from the crowd ', sanitizeText('Reactions \U0001F600 from the crowd \U0001F44D'))
+        self.assertEqual('\u0103\u00eet \u20ac\uffff', sanitizeText('\u0103\u00eet \u20ac\uffff\U00010000\U0010FFFF'))
+
+    def testSanitizePost(self):
+        post = Post()
+        post.Content = 'Goal \U0001F3C6'
+        post.Meta = '{"icon": "\U0001F600"}'
+        sanitizePost(post)
+        self.assertEqual('Goal ', post.Content)
+        self.assertEqual('{"icon": ""}', post.Meta)
+
+# --------------------------------------------------------------------
+
+if __name__ == '__main__': unittest.main()
@@ -10,9 +10,13 @@ Contains the default data for the user plugin.
 '''
 
 from ..security_rbac.populate import rootRoleId
+from ..superdesk.db_superdesk import alchemySessionCreator
 from ally.container import support
 from distribution.container import app
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm.session import Session
 from superdesk.security.api.user_rbac import IUserRbacService
+from superdesk.security.meta.authentication import TokenMapped, LoginMapped
 from superdesk.user.api.user import IUserService, User, QUser
 import hashlib
 
@@ -34,3 +38,20 @@ def populateRootUser():
     else: user = users[0]
     
     userRbacService.assignRole(user.Id, rootRoleId())
+
+@app.populate
+def upgradeExpiryIndexes():
+    '''
+    The expired authentications and sessions are cleaned based on the request and access dates, for the existing
+    databases the indexes on these dates are created.
+    '''
+    creator = alchemySessionCreator()
+    session = creator()
+    assert isinstance(session, Session)
+
+    for mapped in (TokenMapped, LoginMapped):
+        for index in mapped.__table__.indexes:
+            try: index.create(session.connection())
+            except DBAPIError: session.rollback()  # The index already exists
+            else: session.commit()
+    session.close()
@@ -9,12 +9,10 @@ Created on Sep 9, 2012
 Contains the services setups for superdesk security.
 '''
 
+from ..superdesk.maintenance import maintenanceScheduler, maintenance_chunk_size
 from ally.container import ioc, support
 from distribution.container import app
-from sched import scheduler
-from superdesk.security.core.spec import ICleanupService
-from threading import Thread
-import time
+from superdesk.security.core.spec import ICleanupService, IUserRbacSupport
 
 # --------------------------------------------------------------------
 
@@ -32,21 +30,44 @@ def cleanup_timeout() -> int:
     '''
     return 180
 
+@ioc.config
+def rebuild_rights() -> bool:
+    '''
+    True if the flattened users rights should be periodically rebuilt, the user and role changes made in this
+    application refresh the flattened rights right away, the rebuild is a consistency sweep for the roles changes made
+    by other means.
+    '''
+    return True
+
+@ioc.config
+def rebuild_rights_timeout() -> int:
+    '''
+    The number of seconds at which to sweep the flattened users rights, this is the maximum delay for the roles changes
+    that are made without refreshing the role users rights.
+    '''
+    return 900
+
+@ioc.config
+def rebuild_rights_chunk_size() -> int:
+    '''
+    The maximum number of users for which the flattened rights are updated in one transaction.
+    '''
+    return 100
+
 # --------------------------------------------------------------------
 
 @app.deploy
 def cleanup():
     if not perform_cleanup(): return
-    timeout, cleanup = cleanup_timeout(), support.entityFor(ICleanupService)
-
-    schedule = scheduler(time.time, time.sleep)
-    def executeCleanup():
-        assert isinstance(cleanup, ICleanupService)
-        cleanup.cleanExpired()
-        schedule.enter(timeout, 1, executeCleanup, ())
-
-    schedule.enter(timeout, 1, executeCleanup, ())
-    scheduleRunner = Thread(name='Cleanup authentications/sessions thread', target=schedule.run)
-    scheduleRunner.daemon = True
-    scheduleRunner.start()
+    cleanup = support.entityFor(ICleanupService)
+    assert isinstance(cleanup, ICleanupService)
+    maintenanceScheduler().register('Cleanup authentications/sessions', cleanup_timeout(), cleanup.cleanExpired,
+                                    chunk=maintenance_chunk_size())
 
+@app.deploy
+def rebuildRights():
+    if not rebuild_rights(): return
+    rbacSupport = support.entityFor(IUserRbacSupport)
+    assert isinstance(rbacSupport, IUserRbacSupport)
+    maintenanceScheduler().register('Rebuild users rights', rebuild_rights_timeout(), rbacSupport.rebuildRights,
+                                    chunk=rebuild_rights_chunk_size(), delay=0)
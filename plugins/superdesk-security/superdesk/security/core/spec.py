@@ -19,7 +19,62 @@ class ICleanupService(metaclass=abc.ABCMeta):
     '''
 
     @abc.abstractclassmethod
-    def cleanExpired(self):
+    def cleanExpired(self, limit=None):
         '''
         Clean the expired authentications/sessions.
+
+        @param limit: integer|None
+            The maximum number of authentications and of sessions to be cleaned, None to clean all.
+        @return: integer
+            The greatest number of cleaned authentications or sessions, if equal to the limit there might be more
+            expired entries to clean.
+        '''
+
+# --------------------------------------------------------------------
+
+class IUserRbacSupport(metaclass=abc.ABCMeta):
+    '''
+    The user rbac support specification, provides the user rights in a form suitable for caching.
+    '''
+
+    @abc.abstractclassmethod
+    def rightNamesFor(self, userId):
+        '''
+        Provides the names of the rights granted to the user.
+
+        @param userId: integer
+            The user id to provide the right names for.
+        @return: tuple(string)
+            The sorted right names, the tuple identifies the user rights set and can be used as a cache key.
+        '''
+
+    @abc.abstractclassmethod
+    def refreshRights(self, userId):
+        '''
+        Regenerates the flattened rights of the user from the user roles and rights assignments.
+
+        @param userId: integer
+            The user id to refresh the rights for.
+        '''
+
+    @abc.abstractclassmethod
+    def refreshRoleRights(self, roleId):
+        '''
+        Regenerates the flattened rights of the users that have the role, needs to be called whenever the rights or the
+        inherited roles of a role are changed.
+
+        @param roleId: integer
+            The role id that has been changed.
+        '''
+
+    @abc.abstractclassmethod
+    def rebuildRights(self, limit=None):
+        '''
+        Updates the flattened rights of the users, each call continues with the users after the ones handled by the
+        previous call. This is a consistency sweep for the roles changes made without refreshing the role rights.
+
+        @param limit: integer|None
+            The maximum number of users to be updated, None to update all the remaining users.
+        @return: integer
+            The number of handled users, if equal to the limit there might be more users to update.
         '''
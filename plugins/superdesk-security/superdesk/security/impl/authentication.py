@@ -18,6 +18,8 @@ from ally.exception import InputError, Ref
 from ally.internationalization import _
 from ally.support.sqlalchemy.session import SessionSupport, commitNow
 from ally.support.sqlalchemy.util_service import handle
+from collections import OrderedDict
+from copy import copy
 from datetime import timedelta
 from os import urandom
 from security.acl.core.spec import IAclAccessService, AclAccess
@@ -25,14 +27,15 @@ from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.sql.functions import current_timestamp
 from superdesk.security.api.authentication import Login
-from superdesk.security.api.user_rbac import IUserRbacService
-from superdesk.security.core.spec import ICleanupService
+from superdesk.security.core.spec import ICleanupService, IUserRbacSupport
 from superdesk.security.meta.authentication import LoginMapped, TokenMapped
 from superdesk.user.api.user import User
 from superdesk.user.meta.user import UserMapped
+from threading import Lock
 import hashlib
 import hmac
 import logging
+import time
 
 # --------------------------------------------------------------------
 
@@ -49,8 +52,8 @@ class AuthenticationServiceAlchemy(SessionSupport, IAuthenticationService, IClea
 
     aclAccessService = IAclAccessService; wire.entity('aclAccessService')
     # The acl access service used for constructing the accesses
-    userRbacService = IUserRbacService; wire.entity('userRbacService')
-    # The user rbac service.
+    userRbacSupport = IUserRbacSupport; wire.entity('userRbacSupport')
+    # The user rbac support that provides the user right names.
     
     authentication_token_size = 5; wire.config('authentication_token_size', doc='''
     The number of characters that the authentication token should have.
@@ -64,52 +67,56 @@ class AuthenticationServiceAlchemy(SessionSupport, IAuthenticationService, IClea
     session_timeout = 3600; wire.config('session_timeout', doc='''
     The number of seconds after which the session expires.
     ''')
+    acl_cache_size = 200; wire.config('acl_cache_size', doc='''
+    The maximum number of compiled ACL accesses to keep in memory, the accesses are compiled once for each distinct
+    set of user rights. Set to 0 in order to disable the cache.
+    ''')
+    session_access_interval = 60; wire.config('session_access_interval', doc='''
+    The minimum number of seconds between two writes of the session last access, the validated sessions are kept in
+    memory and the requests made in between are authenticated without accessing the database. Keep this value well
+    under the session timeout.
+    ''')
 
     def __init__(self):
         '''
         Construct the authentication service.
         '''
         assert isinstance(self.aclAccessService, IAclAccessService), 'Invalid acl access service %s' % self.aclAccessService
-        assert isinstance(self.userRbacService, IUserRbacService), 'Invalid user rbac service %s' % self.userRbacService
+        assert isinstance(self.userRbacSupport, IUserRbacSupport), 'Invalid user rbac support %s' % self.userRbacSupport
+        assert isinstance(self.acl_cache_size, int), 'Invalid acl cache size %s' % self.acl_cache_size
         assert isinstance(self.authentication_token_size, int), 'Invalid token size %s' % self.authentication_token_size
         assert isinstance(self.session_token_size, int), 'Invalid session token size %s' % self.session_token_size
         assert isinstance(self.authentication_timeout, int), \
         'Invalid authentication timeout %s' % self.authentication_timeout
         assert isinstance(self.session_timeout, int), 'Invalid session timeout %s' % self.session_timeout
+        assert isinstance(self.session_access_interval, int), \
+        'Invalid session access interval %s' % self.session_access_interval
 
         self._authenticationTimeOut = timedelta(seconds=self.authentication_timeout)
         self._sessionTimeOut = timedelta(seconds=self.session_timeout)
 
+        self._sessions = {}
+        # The validated sessions, session -> [user id, time of the last access write]
+        self._cache_acl = OrderedDict()
+        # The compiled accesses, right names -> list[tuple(AclAccess, list[string])] the accesses with the user markers
+        self._lock = Lock()
+
     def authenticate(self, session):
         '''
         @see: IAuthenticationService.authenticate
         '''
-        olderThan = self.session().query(current_timestamp()).scalar()
-        olderThan -= self._sessionTimeOut
-        sql = self.session().query(LoginMapped)
-        sql = sql.filter(LoginMapped.Session == session)
-        sql = sql.filter(LoginMapped.AccessedOn > olderThan)
-        try: login = sql.one()
-        except NoResultFound: raise InputError(Ref(_('Invalid session'), ref=Login.Session))
-        assert isinstance(login, LoginMapped), 'Invalid login %s' % login
-        login.AccessedOn = current_timestamp()
-        self.session().flush((login,))
-        self.session().expunge(login)
-        commitNow()
-        # We need to fore the commit because if there is an exception while processing the request we need to make
-        # sure that the last access has been updated.
-        
-        userId = str(login.User)
-        rights = (right.Name for right in self.userRbacService.getRights(login.User))
-        accesses = self.aclAccessService.accessFor(self.aclAccessService.rightsFor(rights))
+        userId = self._validate(session)
+
+        accesses = self._accessesFor(self.userRbacSupport.rightNamesFor(userId))
+        userId = str(userId)
         allowed = []
-        for access in accesses:
-            assert isinstance(access, AclAccess), 'Invalid access %s' % access
-            for propertyType, mark in access.markers.items():
-                assert isinstance(propertyType, TypeProperty), 'Invalid property type %s' % propertyType
-                assert isinstance(propertyType.parent, TypeModel)
-                if propertyType.parent.clazz == User or issubclass(propertyType.parent.clazz, User):
-                    for k in range(len(access.Filter)): access.Filter[k] = access.Filter[k].replace(mark, userId)
+        for access, marks in accesses:
+            if marks:
+                # The compiled access is shared so we substitute the user markers on a copy.
+                access = copy(access)
+                filters = list(access.Filter)
+                for mark in marks: filters = [value.replace(mark, userId) for value in filters]
+                access.Filter = filters
             allowed.append(access)
         return allowed
 
@@ -173,26 +180,122 @@ class AuthenticationServiceAlchemy(SessionSupport, IAuthenticationService, IClea
                     try: self.session().add(login)
                     except SQLAlchemyError as e: handle(e, login)
 
+                    # The flattened rights are refreshed on login in order to reflect the role changes.
+                    self.userRbacSupport.refreshRights(user.Id)
                     return login
 
         raise InputError(_('Invalid credentials'))
 
     # ----------------------------------------------------------------
 
-    def cleanExpired(self):
+    def cleanExpired(self, limit=None):
         '''
         @see: ICleanupService.cleanExpired
         '''
         olderThan = self.session().query(current_timestamp()).scalar()
 
         # Cleaning the expired tokens.
-        sql = self.session().query(TokenMapped)
+        sql = self.session().query(TokenMapped.Token)
         sql = sql.filter(TokenMapped.requestedOn <= olderThan - self._authenticationTimeOut)
-        deleted = sql.delete()
-        assert log.debug('Cleaned \'%s\' expired authentication requests', deleted) or True
+        if limit is not None: sql = sql.limit(limit)
+        tokens = [token for token, in sql.all()]
+        if tokens:
+            sql = self.session().query(TokenMapped).filter(TokenMapped.Token.in_(tokens))
+            sql.delete(synchronize_session=False)
+        assert log.debug('Cleaned \'%s\' expired authentication requests', len(tokens)) or True
 
         # Cleaning the expired sessions.
-        sql = self.session().query(LoginMapped)
+        sql = self.session().query(LoginMapped.Session)
         sql = sql.filter(LoginMapped.AccessedOn <= olderThan - self._sessionTimeOut)
-        deleted = sql.delete()
-        assert log.debug('Cleaned \'%s\' expired sessions', deleted) or True
+        if limit is not None: sql = sql.limit(limit)
+        sessions = [session for session, in sql.all()]
+        if sessions:
+            sql = self.session().query(LoginMapped).filter(LoginMapped.Session.in_(sessions))
+            sql.delete(synchronize_session=False)
+        assert log.debug('Cleaned \'%s\' expired sessions', len(sessions)) or True
+
+        expiredOn = time.time() - self.session_timeout
+        with self._lock:
+            for session in [session for session, (_userId, writtenOn) in self._sessions.items() if writtenOn <= expiredOn]:
+                del self._sessions[session]
+
+        return max(len(tokens), len(sessions))
+
+    # ----------------------------------------------------------------
+
+    def _accessesFor(self, rights):
+        '''
+        Provides the compiled accesses for the right names, the accesses are compiled together with the markers that
+        need to be replaced with the user id in the access filters.
+
+        @return: list[tuple(AclAccess, list[string])]
+            The accesses and the user markers of each access.
+        '''
+        with self._lock:
+            accesses = self._cache_acl.get(rights)
+            if accesses is not None:
+                self._cache_acl.move_to_end(rights)
+                return accesses
+
+        accesses = []
+        for access in self.aclAccessService.accessFor(self.aclAccessService.rightsFor(rights)):
+            assert isinstance(access, AclAccess), 'Invalid access %s' % access
+            marks = []
+            for propertyType, mark in access.markers.items():
+                assert isinstance(propertyType, TypeProperty), 'Invalid property type %s' % propertyType
+                assert isinstance(propertyType.parent, TypeModel)
+                if propertyType.parent.clazz == User or issubclass(propertyType.parent.clazz, User): marks.append(mark)
+            accesses.append((access, marks))
+
+        if self.acl_cache_size > 0:
+            with self._lock:
+                self._cache_acl[rights] = accesses
+                while len(self._cache_acl) > self.acl_cache_size: self._cache_acl.popitem(last=False)
+        return accesses
+
+    def _validate(self, session):
+        '''
+        Validates the session and updates the session last access, the last access is written in the database at most
+        once per access interval. The cached session expires based on the last access written so it is valid exactly
+        as long as the database session is.
+
+        @return: integer
+            The user id of the session.
+        '''
+        now = time.time()
+        with self._lock:
+            validated = self._sessions.get(session)
+            if validated is not None:
+                userId, writtenOn = validated
+                if now - writtenOn < self.session_access_interval: return userId
+                if now - writtenOn >= self.session_timeout: validated = None
+                else: validated[1] = now
+                # We mark the write now so the concurrent requests of the session will not write also.
+
+        if validated is not None:
+            sql = self.session().query(LoginMapped).filter(LoginMapped.Session == session)
+            if sql.update({LoginMapped.AccessedOn: current_timestamp()}, synchronize_session=False) == 0:
+                with self._lock: self._sessions.pop(session, None)
+                raise InputError(Ref(_('Invalid session'), ref=Login.Session))
+            commitNow()
+            # We need to force the commit because if there is an exception while processing the request we need to
+            # make sure that the last access has been updated.
+            return userId
+
+        olderThan = self.session().query(current_timestamp()).scalar()
+        olderThan -= self._sessionTimeOut
+        sql = self.session().query(LoginMapped)
+        sql = sql.filter(LoginMapped.Session == session)
+        sql = sql.filter(LoginMapped.AccessedOn > olderThan)
+        try: login = sql.one()
+        except NoResultFound:
+            with self._lock: self._sessions.pop(session, None)
+            raise InputError(Ref(_('Invalid session'), ref=Login.Session))
+        assert isinstance(login, LoginMapped), 'Invalid login %s' % login
+        login.AccessedOn = current_timestamp()
+        self.session().flush((login,))
+        self.session().expunge(login)
+        commitNow()
+
+        with self._lock: self._sessions[session] = [login.User, now]
+        return login.User
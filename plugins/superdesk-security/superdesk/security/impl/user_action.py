@@ -13,13 +13,13 @@ from acl.impl.action_right import TypeAction, RightAction
 from ally.container import wire
 from ally.container.ioc import injected
 from ally.container.support import setup
-from ally.exception import InputError
+from collections import OrderedDict
 from gui.action.api.action import IActionManagerService, Action
 from gui.action.impl.action import processChildCount
 from security.acl.core.spec import IAclAccessService
-from security.api.right_type import IRightTypeService, RightType
 from superdesk.security.api.user_action import IUserActionService
-from superdesk.security.api.user_rbac import IUserRbacService
+from superdesk.security.core.spec import IUserRbacSupport
+from threading import Lock
 
 # --------------------------------------------------------------------
 
@@ -34,30 +34,56 @@ class IUserActionServiceAlchemy(IUserActionService):
     # The action manager that provides all the applications actions.
     aclAccessService = IAclAccessService; wire.entity('aclAccessService')
     # The acl access service.
-    userRbacService = IUserRbacService; wire.entity('userRbacService')
-    # The user rbac service.
-    rightTypeService = IRightTypeService; wire.entity('rightTypeService')
-    # The right type service.
+    userRbacSupport = IUserRbacSupport; wire.entity('userRbacSupport')
+    # The user rbac support that provides the user rights names.
     aclType = TypeAction; wire.entity('aclType')
     # The GUI acl type.
+    actions_cache_size = 500; wire.config('actions_cache_size', doc='''
+    The number of filtered action lists to keep in memory, a list is kept for each distinct users rights set and
+    actions path. Set to 0 in order to disable the cache.
+    ''')
     
     def __init__(self):
         assert isinstance(self.actionManagerService, IActionManagerService), \
         'Invalid action manager service %s' % self.actionManagerService
         assert isinstance(self.aclAccessService, IAclAccessService), 'Invalid acl access service %s' % self.aclAccessService
-        assert isinstance(self.userRbacService, IUserRbacService), 'Invalid user rbac service %s' % self.userRbacService
-        assert isinstance(self.rightTypeService, IRightTypeService), 'Invalid right type service %s' % self.rightTypeService
+        assert isinstance(self.userRbacSupport, IUserRbacSupport), 'Invalid user rbac support %s' % self.userRbacSupport
         assert isinstance(self.aclType, TypeAction), 'Invalid acl action type %s' % self.aclType
+        assert isinstance(self.actions_cache_size, int), 'Invalid actions cache size %s' % self.actions_cache_size
+        
+        self._cache_actions = OrderedDict()
+        # The filtered actions, (rights names, path) -> list of actions
+        self._lock = Lock()
 
     def getAll(self, userId, path=None):
         '''
         @see: IUserActionService.getAll
         '''
-        try: rightType = self.rightTypeService.getByName(self.aclType.name)
-        except InputError: return ()
-        assert isinstance(rightType, RightType)
+        # The rights names identify the user rights set, the names change whenever the user rbac changes so the actions
+        # cached for an old rights set are not used anymore and are evicted as the least recently used.
+        key = (self.userRbacSupport.rightNamesFor(userId), path)
+        if self.actions_cache_size > 0:
+            with self._lock:
+                actions = self._cache_actions.get(key)
+                if actions is not None:
+                    self._cache_actions.move_to_end(key)
+                    return actions
+        
+        actions = self._actionsFor(key[0], path)
+        
+        if self.actions_cache_size > 0:
+            with self._lock:
+                self._cache_actions[key] = actions
+                while len(self._cache_actions) > self.actions_cache_size: self._cache_actions.popitem(last=False)
+        return actions
+    
+    # ----------------------------------------------------------------
+    
+    def _actionsFor(self, rights, path):
+        '''
+        Provides the actions for the path that are allowed by the rights names.
+        '''
         actionPaths = set()
-        rights = (right.Name for right in self.userRbacService.getRights(userId, rightType.Id))
         for aclRight in self.aclAccessService.rightsFor(rights, typeName=self.aclType.name):
             if isinstance(aclRight, RightAction):
                 assert isinstance(aclRight, RightAction)
@@ -68,4 +94,4 @@ class IUserActionServiceAlchemy(IUserActionService):
         actions = []
         for action in self.actionManagerService.getAll(path):
             if action.Path in actionPaths: actions.append(action)
-        return processChildCount(actions)
+        return list(processChildCount(actions))
@@ -21,24 +21,53 @@ from security.rbac.api.rbac import QRole
 from security.rbac.core.spec import IRbacService
 from security.rbac.meta.rbac import RoleMapped
 from security.rbac.meta.rbac_intern import RbacRole, RbacRight
+from collections import OrderedDict
+from sqlalchemy import event
 from sqlalchemy.orm.exc import NoResultFound
 from superdesk.security.api.user_rbac import IUserRbacService
-from superdesk.security.meta.security_intern import RbacUser
+from superdesk.security.core.spec import IUserRbacSupport
+from superdesk.security.meta.security_intern import RbacUser, RbacUserRight
+from threading import Lock
+from weakref import WeakKeyDictionary
+import time
+
+# --------------------------------------------------------------------
+
+INSERT_IGNORE = {'mysql': 'IGNORE', 'sqlite': 'OR IGNORE'}
+# The insert prefixes by database dialect that skip the rows already inserted by a concurrent transaction.
 
 # --------------------------------------------------------------------
 
 @injected
-@setup(IUserRbacService, name='userRbacService')
-class UserRbacServiceAlchemy(SessionSupport, IUserRbacService):
+@setup(IUserRbacService, IUserRbacSupport, name='userRbacService')
+class UserRbacServiceAlchemy(SessionSupport, IUserRbacService, IUserRbacSupport):
     '''
-    Implementation for @see: IUserRbacService
+    Implementation for @see: IUserRbacService, @see: IUserRbacSupport
     '''
     
     rbacService = IRbacService; wire.entity('rbacService')
     # Rbac service to use for complex role operations.
+    rights_cache_size = 5000; wire.config('rights_cache_size', doc='''
+    The maximum number of users for which to keep the right names in memory, 0 disables the cache.
+    ''')
+    rights_cache_timeout = 60; wire.config('rights_cache_timeout', doc='''
+    The number of seconds the cached user right names are valid, the user assignments made through this service and
+    the role refreshes invalidate the cache right away, the changes made in other application processes are seen only
+    after this timeout.
+    ''')
     
     def __init__(self):
         assert isinstance(self.rbacService, IRbacService), 'Invalid rbac service %s' % self.rbacService
+        assert isinstance(self.rights_cache_size, int), 'Invalid rights cache size %s' % self.rights_cache_size
+        assert isinstance(self.rights_cache_timeout, int), 'Invalid rights cache timeout %s' % self.rights_cache_timeout
+        
+        self._cache_rights = OrderedDict()
+        # The right names cache, user id -> (expire time, right names)
+        self._pending = WeakKeyDictionary()
+        # The users to invalidate when the session ends, session -> set(user ids)
+        self._lock = Lock()
+        self._rebuildAfter = None
+        # The user id after which the next rebuild chunk starts, None to start with the first user
     
     def getRoles(self, userId, offset=None, limit=None, detailed=False, q=None):
         '''
@@ -65,10 +94,16 @@ class UserRbacServiceAlchemy(SessionSupport, IUserRbacService):
         if limit == 0: entities = ()
         else: entities = None
         if detailed or entities is None:
-            rbacId = self._rbacId(userId)
-            if not rbacId: return IterPart((), 0, offset, limit) if detailed else ()
-            
-            sql = self.rbacService.rightsForRbacSQL(rbacId)
+            sql = self.session().query(RbacUserRight.userId).filter(RbacUserRight.userId == userId)
+            if sql.limit(1).scalar() is None:
+                # The user has no flattened rights yet, as for the databases before the flattened rights, so the rights
+                # are resolved through the rbac.
+                rbacId = self._rbacId(userId)
+                if not rbacId: return IterPart((), 0, offset, limit) if detailed else ()
+                sql = self.rbacService.rightsForRbacSQL(rbacId)
+            else:
+                sql = self.session().query(RightMapped).join(RbacUserRight, RbacUserRight.rightId == RightMapped.Id)
+                sql = sql.filter(RbacUserRight.userId == userId)
             if typeId: sql = sql.filter(RightMapped.Type == typeId)
             if q:
                 assert isinstance(q, QRight), 'Invalid query %s' % q
@@ -77,48 +112,167 @@ class UserRbacServiceAlchemy(SessionSupport, IUserRbacService):
             if detailed: return IterPart(entities, sql.count(), offset, limit)
         return entities
 
+    def rightNamesFor(self, userId):
+        '''
+        @see: IUserRbacSupport.rightNamesFor
+        '''
+        if self.rights_cache_size > 0:
+            with self._lock:
+                cached = self._cache_rights.get(userId)
+                if cached is not None and cached[0] > time.time():
+                    self._cache_rights.move_to_end(userId)
+                    return cached[1]
+        
+        names = tuple(sorted(set(right.Name for right in self.getRights(userId))))
+        
+        if self.rights_cache_size > 0:
+            with self._lock:
+                self._cache_rights[userId] = (time.time() + self.rights_cache_timeout, names)
+                self._cache_rights.move_to_end(userId)
+                while len(self._cache_rights) > self.rights_cache_size: self._cache_rights.popitem(last=False)
+        return names
+
     def assignRole(self, userId, roleId):
         '''
         @see: IUserRbacService.assignRole
         '''
+        self._invalidate(userId)
         rbacId = self._rbacId(userId)
         if not rbacId: rbacId = self._rbacCreate(userId)
         else:
             sql = self.session().query(RbacRole).filter(RbacRole.rbac == rbacId).filter(RbacRole.role == roleId)
             if sql.count() > 0: return  # The role is already mapped to user
         self.session().add(RbacRole(rbac=rbacId, role=roleId))
+        self._refreshRights(userId, rbacId)
     
     def unassignRole(self, userId, roleId):
         '''
         @see: IUserRbacService.unassignRole
         '''
+        self._invalidate(userId)
         rbacId = self._rbacId(userId)
         if not rbacId: return False
         sql = self.session().query(RbacRole).filter(RbacRole.rbac == rbacId).filter(RbacRole.role == roleId)
-        return sql.delete() > 0
+        if sql.delete() > 0:
+            self._refreshRights(userId, rbacId)
+            return True
+        return False
         
     def assignRight(self, userId, rightId):
         '''
         @see: IUserRbacService.assignRight
         '''
+        self._invalidate(userId)
         rbacId = self._rbacId(userId)
         if not rbacId: rbacId = self._rbacCreate(userId)
         else:
             sql = self.session().query(RbacRight).filter(RbacRight.rbac == rbacId).filter(RbacRight.right == rightId)
             if sql.count() > 0: return  # The right is already mapped to user
         self.session().add(RbacRight(rbac=rbacId, right=rightId))
+        self._refreshRights(userId, rbacId)
     
     def unassignRight(self, userId, rightId):
         '''
         @see: IUserRbacService.unassignRight
         '''
+        self._invalidate(userId)
         rbacId = self._rbacId(userId)
         if not rbacId: return False
         sql = self.session().query(RbacRight).filter(RbacRight.rbac == rbacId).filter(RbacRight.right == rightId)
-        return sql.delete() > 0
+        if sql.delete() > 0:
+            self._refreshRights(userId, rbacId)
+            return True
+        return False
+
+    def refreshRights(self, userId):
+        '''
+        @see: IUserRbacSupport.refreshRights
+        '''
+        if self._refreshRights(userId, self._rbacId(userId)): self._invalidate(userId)
+
+    def refreshRoleRights(self, roleId):
+        '''
+        @see: IUserRbacSupport.refreshRoleRights
+        '''
+        for userId, rbacId in self.session().query(RbacUser.userId, RbacUser.Id).all():
+            sql = self.rbacService.rolesForRbacSQL(rbacId).filter(RoleMapped.Id == roleId)
+            if sql.count() == 0: continue
+            if self._refreshRights(userId, rbacId): self._invalidate(userId)
+
+    def rebuildRights(self, limit=None):
+        '''
+        @see: IUserRbacSupport.rebuildRights
+        '''
+        sql = self.session().query(RbacUser.userId, RbacUser.Id)
+        if self._rebuildAfter is not None: sql = sql.filter(RbacUser.userId > self._rebuildAfter)
+        sql = sql.order_by(RbacUser.userId)
+        if limit is not None: sql = sql.limit(limit)
+
+        users = sql.all()
+        for userId, rbacId in users:
+            if self._refreshRights(userId, rbacId): self._invalidate(userId)
+
+        if limit is not None and len(users) == limit: self._rebuildAfter = users[-1][0]
+        else: self._rebuildAfter = None
+        return len(users)
         
     # ----------------------------------------------------------------
     
+    def _invalidate(self, userId):
+        '''
+        Removes the cached right names of the user, the right names are removed again when the current session ends
+        so the right names read by a concurrent request before the commit are not kept in the cache.
+        '''
+        session = self.session()
+        with self._lock:
+            self._cache_rights.pop(userId, None)
+            pending = self._pending.get(session)
+            if pending is None:
+                pending = self._pending[session] = set()
+                event.listen(session, 'after_commit', self._onEnd)
+                event.listen(session, 'after_rollback', self._onEnd)
+            pending.add(userId)
+
+    def _onEnd(self, session):
+        '''
+        Removes the cached right names of the users changed by the ended session.
+        '''
+        with self._lock:
+            pending = self._pending.get(session)
+            if not pending: return
+            for userId in pending: self._cache_rights.pop(userId, None)
+            pending.clear()
+    
+    def _refreshRights(self, userId, rbacId):
+        '''
+        Updates the flattened rights of the user with the rights resolved through the rbac, only the rights that changed
+        are removed or inserted so the refresh of unchanged rights does not write anything.
+        
+        @return: boolean
+            True if the user rights changed.
+        '''
+        self.session().flush()
+        sql = self.session().query(RbacUserRight.rightId).filter(RbacUserRight.userId == userId)
+        current = set(id for id, in sql.all())
+        if rbacId:
+            sql = self.rbacService.rightsForRbacSQL(rbacId).with_entities(RightMapped.Id)
+            rights = set(id for id, in sql.all())
+        else: rights = set()
+        
+        removed, added = current.difference(rights), rights.difference(current)
+        if removed:
+            sql = self.session().query(RbacUserRight).filter(RbacUserRight.userId == userId)
+            sql.filter(RbacUserRight.rightId.in_(removed)).delete(synchronize_session=False)
+        if added:
+            connection = self.session().connection()
+            insert = RbacUserRight.__table__.insert()
+            prefix = INSERT_IGNORE.get(connection.dialect.name)
+            if prefix: insert = insert.prefix_with(prefix)
+            userKey = RbacUserRight.userId.property.columns[0].key
+            rightKey = RbacUserRight.rightId.property.columns[0].key
+            connection.execute(insert, [{userKey: userId, rightKey: rightId} for rightId in added])
+        return bool(removed or added)
+    
     def _rbacId(self, userId):
         '''
         Provides the rbac id for the user id, optionally generate one.
@@ -27,7 +27,7 @@ class TokenMapped(Base, Token):
     Token = Column('token', String(190), primary_key=True)
 
     # Non REST model attributes --------------------------------------
-    requestedOn = Column('requested_on', DateTime, nullable=False)
+    requestedOn = Column('requested_on', DateTime, nullable=False, index=True)
 
 class LoginMapped(Base, Login):
     '''
@@ -39,5 +39,5 @@ class LoginMapped(Base, Login):
     Session = Column('session', String(190), primary_key=True)
     User = Column('fk_user_id', ForeignKey(UserMapped.userId), nullable=False)
     CreatedOn = Column('created_on', DateTime, nullable=False)
-    AccessedOn = Column('accessed_on', DateTime, nullable=False)
+    AccessedOn = Column('accessed_on', DateTime, nullable=False, index=True)
 
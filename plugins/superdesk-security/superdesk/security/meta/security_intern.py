@@ -10,7 +10,9 @@ Contains the SQL alchemy meta for rbac user internal mappings.
 '''
 
 from security.rbac.meta.rbac import RbacMapped
+from sqlalchemy.dialects.mysql.base import INTEGER
 from sqlalchemy.schema import Column, ForeignKey
+from superdesk.meta.metadata_superdesk import Base
 from superdesk.user.meta.user import UserMapped
 
 # --------------------------------------------------------------------
@@ -25,4 +27,16 @@ class RbacUser(RbacMapped):
     # Non REST model attribute --------------------------------------
     userId = Column('fk_user_id', ForeignKey(UserMapped.Id), primary_key=True, unique=True)
     rbac = Column('fk_rbac_id', ForeignKey(RbacMapped.Id), primary_key=True, unique=True)
-    
+
+class RbacUserRight(Base):
+    '''
+    Provides the flattened rights of a user, containing the rights assigned directly and the rights inherited through
+    the user roles. This is not a REST model.
+    '''
+    __tablename__ = 'user_right'
+    __table_args__ = dict(mysql_engine='InnoDB')
+
+    userId = Column('fk_user_id', ForeignKey(UserMapped.Id, ondelete='CASCADE'), primary_key=True)
+    rightId = Column('fk_right_id', INTEGER(unsigned=True), primary_key=True)
+    # The right id is not a foreign key since the superdesk tables are created before the security tables, the rows
+    # of the removed rights are ignored by joining with the rights table.
@@ -20,7 +20,7 @@ from ally.support.api.util_service import copy
 from ally.support.sqlalchemy.util_service import buildQuery, buildLimits, handle
 from sql_alchemy.impl.entity import EntityGetCRUDServiceAlchemy
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm.exc import NoResultFound
+from superdesk.core.reference import ReferenceCache
 from superdesk.source.api.source import Source
 from ally.api.extension import IterPart
 
@@ -39,6 +39,8 @@ class SourceServiceAlchemy(EntityGetCRUDServiceAlchemy, ISourceService):
         '''
         EntityGetCRUDServiceAlchemy.__init__(self, SourceMapped)
 
+        self._cache_types = ReferenceCache(SourceTypeMapped, SourceTypeMapped.Key, SourceTypeMapped.id)
+
     def getAll(self, typeKey=None, offset=None, limit=None, detailed=False, q=None):
         '''
         @see: ISourceService.getAll
@@ -86,8 +88,6 @@ class SourceServiceAlchemy(EntityGetCRUDServiceAlchemy, ISourceService):
         '''
         Provides the source type id that has the provided key.
         '''
-        try:
-            sql = self.session().query(SourceTypeMapped.id).filter(SourceTypeMapped.Key == key)
-            return sql.one()[0]
-        except NoResultFound:
-            raise InputError(Ref(_('Invalid source type %(type)s') % dict(type=key), ref=Source.Type))
+        typeId = self._cache_types.get(self.session(), key)
+        if typeId is None: raise InputError(Ref(_('Invalid source type %(type)s') % dict(type=key), ref=Source.Type))
+        return typeId
@@ -0,0 +1,39 @@
+'''
+Created on Feb 20, 2013
+
+@package: superdesk
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Contains the setup for the shared maintenance scheduler.
+'''
+
+from ally.container import ioc
+from superdesk.core.maintenance import MaintenanceScheduler
+
+# --------------------------------------------------------------------
+
+@ioc.config
+def maintenance_jitter() -> float:
+    '''
+    The fraction of a maintenance job interval that is randomly added or subtracted to each run, this spreads the
+    maintenance jobs of several application instances that share the same database.
+    '''
+    return 0.1
+
+@ioc.config
+def maintenance_chunk_size() -> int:
+    '''
+    The maximum number of expired entries that are removed in one transaction by a maintenance job.
+    '''
+    return 1000
+
+# --------------------------------------------------------------------
+
+@ioc.entity
+def maintenanceScheduler() -> MaintenanceScheduler:
+    '''
+    The scheduler that runs all the maintenance jobs on a single worker thread.
+    '''
+    return MaintenanceScheduler(maintenance_jitter())
@@ -0,0 +1,10 @@
+'''
+Created on Feb 20, 2013
+
+@package: superdesk
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Core support package.
+'''
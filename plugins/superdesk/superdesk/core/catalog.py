@@ -0,0 +1,71 @@
+'''
+Created on Feb 21, 2013
+
+@package: superdesk
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Provides the immutable catalogs with a prefix index on names.
+'''
+
+from bisect import bisect_left
+
+# --------------------------------------------------------------------
+
+LIKE_WILDCARDS = ('%', '_', '*', '?')
+# The characters that have a special meaning in a like expression.
+
+def likePrefix(like):
+    '''
+    Provides the prefix for a like expression that only matches the values starting with a prefix, like 'rom%'.
+
+    @param like: string
+        The like expression.
+    @return: string|None
+        The prefix or None if the like expression is not a simple prefix match.
+    '''
+    assert isinstance(like, str), 'Invalid like %s' % like
+    if not like.endswith('%'): return
+    prefix = like.rstrip('%')
+    if any(wildcard in prefix for wildcard in LIKE_WILDCARDS): return
+    return prefix
+
+# --------------------------------------------------------------------
+
+class Catalog:
+    '''
+    Immutable catalog of entries that keeps the entries order and indexes the entries names, the names are indexed in
+    lower case so a prefix lookup provides all the entries that could match the prefix regardless of the case.
+    '''
+    __slots__ = ('entries', '_names', '_positions')
+
+    def __init__(self, entries, nameOf):
+        '''
+        Construct the catalog.
+
+        @param entries: Iterable(object)
+            The catalog entries.
+        @param nameOf: callable(object) -> string|None
+            Provides the name to be indexed for an entry.
+        '''
+        assert callable(nameOf), 'Invalid name of %s' % nameOf
+        self.entries = tuple(entries)
+        index = sorted(((nameOf(entry) or '').lower(), position) for position, entry in enumerate(self.entries))
+        self._names = [name for name, _position in index]
+        self._positions = [position for _name, position in index]
+
+    def prefixed(self, prefix):
+        '''
+        Provides the entries that have the name starting with the prefix, case insensitive.
+
+        @param prefix: string
+            The name prefix.
+        @return: list[object]
+            The entries in the catalog order.
+        '''
+        assert isinstance(prefix, str), 'Invalid prefix %s' % prefix
+        prefix = prefix.lower()
+        start = end = bisect_left(self._names, prefix)
+        while end < len(self._names) and self._names[end].startswith(prefix): end += 1
+        return [self.entries[position] for position in sorted(self._positions[start:end])]
@@ -0,0 +1,110 @@
+'''
+Created on Feb 21, 2013
+
+@package: superdesk
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Contains the Babel locale registry.
+'''
+
+from ally.container.ioc import injected
+from ally.container.support import setup
+from babel.core import Locale, parse_locale
+from babel.localedata import locale_identifiers
+from superdesk.core.spec import ILocaleRegistry
+from threading import Lock
+
+# --------------------------------------------------------------------
+
+@injected
+@setup(ILocaleRegistry, name='localeRegistry')
+class LocaleRegistryBabel(ILocaleRegistry):
+    '''
+    Implementation for @see: ILocaleRegistry using Babel library. The registry indexes the locale identifiers when first
+    used and creates a locale only when the locale is requested, the translated names are kept in the index so the
+    listings do not need the locales data.
+    '''
+
+    def __init__(self):
+        '''
+        Construct the locale registry.
+        '''
+        self._components = None
+        # The locale components index, code -> (language, territory, script, variant)
+        self._codes = None
+        # The sorted locale codes.
+        self._locales = {}
+        # The created locales, code -> Locale
+        self._names = {}
+        # The translated names, (code, translator code) -> (language, territory, script, variant)
+        self._lock = Lock()
+
+    def codes(self):
+        '''
+        @see: ILocaleRegistry.codes
+        '''
+        self._index()
+        return self._codes
+
+    def localeOf(self, code):
+        '''
+        @see: ILocaleRegistry.localeOf
+        '''
+        assert isinstance(code, str), 'Invalid code %s' % code
+        code = code.replace('-', '_')
+        locale = self._locales.get(code)
+        if locale is not None: return locale
+
+        components = self._index().get(code)
+        if components is None: return
+        with self._lock:
+            locale = self._locales.get(code)
+            if locale is None:
+                language, territory, script, variant = components
+                locale = self._locales[code] = Locale(language, territory, script, variant)
+        return locale
+
+    def localesOf(self, codes):
+        '''
+        @see: ILocaleRegistry.localesOf
+        '''
+        if isinstance(codes, str): codes = [codes]
+        return list(filter(None, (self.localeOf(code) for code in codes)))
+
+    def namesOf(self, code, translator):
+        '''
+        @see: ILocaleRegistry.namesOf
+        '''
+        assert isinstance(code, str), 'Invalid code %s' % code
+        assert translator is None or isinstance(translator, Locale), 'Invalid translator %s' % translator
+        code = code.replace('-', '_')
+        key = (code, code if translator is None else str(translator))
+        names = self._names.get(key)
+        if names is not None: return names
+
+        components = self._index().get(code)
+        if components is None: return
+        if translator is None: translator = self.localeOf(code)
+        language, territory, script, variant = components
+        names = (translator.languages.get(language),
+                 translator.territories.get(territory) if territory else None,
+                 translator.scripts.get(script) if script else None,
+                 translator.variants.get(variant) if variant else None)
+        with self._lock: self._names[key] = names
+        return names
+
+    # ----------------------------------------------------------------
+
+    def _index(self):
+        '''
+        Provides the locale components index, the index is built only from the locale identifiers.
+        '''
+        if self._components is None:
+            with self._lock:
+                if self._components is None:
+                    components = {code: parse_locale(code) for code in locale_identifiers()}
+                    self._codes = tuple(sorted(components))
+                    self._components = components
+        return self._components
@@ -0,0 +1,163 @@
+'''
+Created on Feb 20, 2013
+
+@package: superdesk
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Provides the scheduler that runs the periodic maintenance jobs, like the cleanup of the expired entries.
+'''
+
+from heapq import heappush, heappop
+from itertools import count
+from threading import Condition, Thread
+import logging
+import random
+import time
+
+# --------------------------------------------------------------------
+
+log = logging.getLogger(__name__)
+
+# --------------------------------------------------------------------
+
+class MaintenanceJob:
+    '''
+    Container for a maintenance job and its metrics.
+    '''
+    __slots__ = ('name', 'timeout', 'call', 'chunk', 'runs', 'failures', 'removed', 'duration', 'lastRunOn')
+
+    def __init__(self, name, timeout, call, chunk):
+        '''
+        Construct the maintenance job.
+
+        @param name: string
+            The job name, used for logging and metrics.
+        @param timeout: integer|float
+            The number of seconds between the job runs.
+        @param call: callable
+            The job call, if a chunk is provided the call receives the chunk size and needs to return the number of
+            removed entries.
+        @param chunk: integer|None
+            The maximum number of entries to be removed by a job call.
+        '''
+        assert isinstance(name, str), 'Invalid name %s' % name
+        assert isinstance(timeout, (int, float)) and timeout > 0, 'Invalid timeout %s' % timeout
+        assert callable(call), 'Invalid call %s' % call
+        assert chunk is None or (isinstance(chunk, int) and chunk > 0), 'Invalid chunk %s' % chunk
+        self.name = name
+        self.timeout = timeout
+        self.call = call
+        self.chunk = chunk
+
+        self.runs = 0
+        self.failures = 0
+        self.removed = 0
+        self.duration = 0
+        self.lastRunOn = None
+
+class MaintenanceScheduler:
+    '''
+    Runs all the registered maintenance jobs on a single worker thread, so the jobs never compete with each other for
+    the database. The job intervals are randomly spread with the jitter in order to avoid the jobs of several
+    application instances running at the same time. A chunked job is called repeatedly, each call being a separate
+    transaction, until it removes less entries then the chunk size, this way the locks are kept only for a bounded
+    number of rows.
+    '''
+
+    def __init__(self, jitter=0.1):
+        '''
+        Construct the maintenance scheduler.
+
+        @param jitter: integer|float
+            The fraction of the job timeout that is randomly added or subtracted to each run schedule.
+        '''
+        assert isinstance(jitter, (int, float)) and 0 <= jitter < 1, 'Invalid jitter %s' % jitter
+        self.jitter = jitter
+
+        self._registered = []
+        # The registered jobs.
+        self._jobs = []
+        # The scheduled jobs heap, (run on, order, job)
+        self._order = count()
+        self._changed = Condition()
+        self._worker = None
+
+    def register(self, name, timeout, call, chunk=None, delay=None):
+        '''
+        Register a maintenance job, the worker thread is started with the first job registered.
+
+        @param delay: integer|float|None
+            The number of seconds before the first job run, if None the job timeout is used.
+        @see: MaintenanceJob.__init__
+        '''
+        job = MaintenanceJob(name, timeout, call, chunk)
+        with self._changed:
+            self._registered.append(job)
+            self._schedule(job, timeout if delay is None else delay)
+            if self._worker is None:
+                self._worker = Thread(name='Maintenance thread', target=self._run)
+                self._worker.daemon = True
+                self._worker.start()
+            self._changed.notify()
+
+    def metrics(self):
+        '''
+        Provides the metrics of the registered jobs.
+
+        @return: dictionary{string: dictionary{string: object}}
+            The job name as a key and as a value the number of runs, failures, removed entries, the total duration in
+            seconds of the runs and the time of the last run.
+        '''
+        with self._changed: jobs = list(self._registered)
+        return {job.name: dict(runs=job.runs, failures=job.failures, removed=job.removed, duration=job.duration,
+                               lastRunOn=job.lastRunOn) for job in jobs}
+
+    # ----------------------------------------------------------------
+
+    def _schedule(self, job, delay):
+        '''
+        Schedules the job to run after the delay, the delay is spread with the jitter.
+        '''
+        delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        heappush(self._jobs, (time.time() + delay, next(self._order), job))
+
+    def _run(self):
+        '''
+        The worker thread run.
+        '''
+        while True:
+            with self._changed:
+                while True:
+                    remaining = self._jobs[0][0] - time.time()
+                    if remaining <= 0: break
+                    self._changed.wait(remaining)
+                _runOn, _order, job = heappop(self._jobs)
+
+            self._execute(job)
+            with self._changed: self._schedule(job, job.timeout)
+
+    def _execute(self, job):
+        '''
+        Executes the job and updates its metrics.
+        '''
+        assert isinstance(job, MaintenanceJob), 'Invalid job %s' % job
+        start, removed = time.time(), 0
+        try:
+            if job.chunk is None: job.call()
+            else:
+                while True:
+                    chunk = job.call(job.chunk)
+                    removed += chunk
+                    if chunk < job.chunk: break
+        except:
+            job.failures += 1
+            log.exception('Maintenance job \'%s\' failed', job.name)
+
+        job.runs += 1
+        job.removed += removed
+        job.duration += time.time() - start
+        job.lastRunOn = start
+        assert log.debug('Maintenance job \'%s\' removed %s entries in %.3f seconds', job.name, removed,
+                         time.time() - start) or True
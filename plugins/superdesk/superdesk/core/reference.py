@@ -0,0 +1,118 @@
+'''
+Created on Feb 22, 2013
+
+@package: superdesk
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Provides the cache for the reference data tables.
+'''
+
+from sqlalchemy import event
+from sqlalchemy.orm.session import object_session
+from threading import Lock
+from weakref import WeakKeyDictionary
+import time
+
+# --------------------------------------------------------------------
+
+class ReferenceCache:
+    '''
+    Cache for the reference data, the small and almost static types tables that are looked up by a unique key, the
+    cache is loaded with all the table rows so it is not for the tables that grow with the content. The cache is cleared
+    whenever a session that inserted, updated or deleted an entity of the mapped class through the ORM is committed or
+    rolled back, until then the session reads the values from the database and nothing is cached from it. The bulk
+    query updates and deletes are not seen by the cache, the timeout covers them together with the changes made by
+    other application processes.
+    '''
+
+    def __init__(self, mapped, key, value, timeout=300):
+        '''
+        Construct the reference cache.
+
+        @param mapped: class
+            The mapped class of the reference table.
+        @param key: InstrumentedAttribute
+            The mapped column used as a key, the column needs to be unique.
+        @param value: InstrumentedAttribute
+            The mapped column used as a value, usually the id.
+        @param timeout: integer
+            The number of seconds after which the cache is loaded again.
+        '''
+        assert isinstance(mapped, type), 'Invalid mapped class %s' % mapped
+        assert isinstance(timeout, int), 'Invalid timeout %s' % timeout
+        self.key = key
+        self.value = value
+        self.timeout = timeout
+
+        self._values = None
+        # The cached values, key -> value
+        self._loadedOn = 0
+        self._sessions = WeakKeyDictionary()
+        # The sessions that wrote entities of the mapped class, session -> True if the writes are not yet committed
+        self._lock = Lock()
+
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(mapped, name, self._onWrite, propagate=True)
+
+    def get(self, session, key):
+        '''
+        Provides the value for the key, a key that is not cached is searched in the database.
+
+        @param session: Session
+            The session used for loading the values.
+        @param key: object
+            The key to provide the value for.
+        @return: object|None
+            The value for the key or None if there is no row for the key.
+        '''
+        with self._lock:
+            if self._sessions.get(session): values = False
+            else:
+                values = self._values
+                if values is not None and self._loadedOn + self.timeout < time.time(): values = None
+        # The session has not committed writes so the values it reads can not be cached.
+        if values is False: return session.query(self.value).filter(self.key == key).scalar()
+
+        if values is None:
+            values = dict(session.query(self.key, self.value).all())
+            with self._lock: self._values, self._loadedOn = values, time.time()
+
+        value = values.get(key)
+        if value is None:
+            value = session.query(self.value).filter(self.key == key).scalar()
+            if value is not None:
+                with self._lock: values[key] = value
+        return value
+
+    def invalidate(self):
+        '''
+        Clears the cached values, the values are loaded again on the next use.
+        '''
+        with self._lock: self._values = None
+
+    # ----------------------------------------------------------------
+
+    def _onWrite(self, mapper, connection, target):
+        '''
+        Invalidates the cache whenever an entity is written and marks the writing session, the cache is invalidated
+        again when the session ends.
+        '''
+        session = object_session(target)
+        with self._lock:
+            self._values = None
+            if session is None: return
+            if session not in self._sessions:
+                event.listen(session, 'after_commit', self._onEnd)
+                event.listen(session, 'after_rollback', self._onEnd)
+            self._sessions[session] = True
+
+    def _onEnd(self, session):
+        '''
+        Invalidates the cache when a session that wrote entities ends.
+        '''
+        with self._lock:
+            if not self._sessions.get(session): return
+            self._sessions[session] = False
+            self._values = None
@@ -0,0 +1,64 @@
+'''
+Created on Feb 21, 2013
+
+@package: superdesk
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Provides the specification classes for the superdesk core.
+'''
+
+import abc
+
+# --------------------------------------------------------------------
+
+class ILocaleRegistry(metaclass=abc.ABCMeta):
+    '''
+    The locale registry specification, provides the locales shared by all the services that translate names.
+    '''
+
+    @abc.abstractclassmethod
+    def codes(self):
+        '''
+        Provides the codes of the available locales.
+
+        @return: tuple(string)
+            The sorted locale codes.
+        '''
+
+    @abc.abstractclassmethod
+    def localeOf(self, code):
+        '''
+        Provides the locale for the code, the locale data is loaded only when first used.
+
+        @param code: string
+            The locale code, the components can be separated by '_' or '-'.
+        @return: Locale|None
+            The locale for the code or None if the code is not valid.
+        '''
+
+    @abc.abstractclassmethod
+    def localesOf(self, codes):
+        '''
+        Provides the locales for the codes, the invalid codes are ignored.
+
+        @param codes: string|Iterable(string)
+            The locale codes to provide the locales for.
+        @return: list[Locale]
+            The locales for the valid codes.
+        '''
+
+    @abc.abstractclassmethod
+    def namesOf(self, code, translator):
+        '''
+        Provides the translated names of the locale components, the names are kept so the translator locale data is
+        used only for the first translation.
+
+        @param code: string
+            The locale code to provide the names for.
+        @param translator: Locale|None
+            The locale to translate the names with, if None the locale of the code is used.
+        @return: tuple(string|None, string|None, string|None, string|None)|None
+            The language, territory, script and variant names or None if the code is not valid.
+        '''
@@ -0,0 +1,52 @@
+'''
+Created on Feb 21, 2013
+
+@package: superdesk
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Provides unit testing for the catalog module.
+'''
+
+# Required in order to register the package extender whenever the unit test is run.
+if True:
+    import package_extender
+    package_extender.PACKAGE_EXTENDER.setForUnitTest(True)
+
+# --------------------------------------------------------------------
+
+from superdesk.core.catalog import Catalog, likePrefix
+import unittest
+
+# --------------------------------------------------------------------
+
+class TestCatalog(unittest.TestCase):
+
+    def testLikePrefix(self):
+        self.assertEqual('rom', likePrefix('rom%'))
+        self.assertEqual('rom', likePrefix('rom%%'))
+        self.assertEqual('', likePrefix('%'))
+        self.assertEqual(None, likePrefix('rom'))
+        self.assertEqual(None, likePrefix('%rom%'))
+        self.assertEqual(None, likePrefix('r_m%'))
+        self.assertEqual(None, likePrefix('ro*%'))
+        self.assertEqual(None, likePrefix('ro?%'))
+
+    def testPrefixed(self):
+        entries = [('ro', 'Romanian'), ('en', 'English'), ('rm', 'Romansh'), ('de', 'German'), ('xx', None),
+                   ('rn', 'Rundi')]
+        catalog = Catalog(entries, lambda entry: entry[1])
+
+        self.assertEqual(tuple(entries), catalog.entries)
+        self.assertEqual([('ro', 'Romanian'), ('rm', 'Romansh')], catalog.prefixed('rom'))
+        self.assertEqual([('ro', 'Romanian'), ('rm', 'Romansh')], catalog.prefixed('ROM'))
+        self.assertEqual([('ro', 'Romanian'), ('rm', 'Romansh'), ('rn', 'Rundi')], catalog.prefixed('r'))
+        self.assertEqual([('ro', 'Romanian')], catalog.prefixed('romanian'))
+        self.assertEqual([], catalog.prefixed('romanians'))
+        self.assertEqual([], catalog.prefixed('z'))
+        self.assertEqual(entries, catalog.prefixed(''))
+
+# --------------------------------------------------------------------
+
+if __name__ == '__main__': unittest.main()
@@ -0,0 +1,80 @@
+'''
+Created on Feb 20, 2013
+
+@package: superdesk
+@copyright: 2013 Sourcefabric o.p.s.
+@license: http://www.gnu.org/licenses/gpl-3.0.txt
+@author: Gabriel Nistor
+
+Provides unit testing for the maintenance module.
+'''
+
+# Required in order to register the package extender whenever the unit test is run.
+if True:
+    import package_extender
+    package_extender.PACKAGE_EXTENDER.setForUnitTest(True)
+
+# --------------------------------------------------------------------
+
+from superdesk.core.maintenance import MaintenanceScheduler, MaintenanceJob
+from threading import Event
+import unittest
+
+# --------------------------------------------------------------------
+
+class TestMaintenance(unittest.TestCase):
+
+    def testChunked(self):
+        remaining, calls = [25], []
+        def cleanup(chunk):
+            calls.append(chunk)
+            removed = min(chunk, remaining[0])
+            remaining[0] -= removed
+            return removed
+
+        scheduler = MaintenanceScheduler(0)
+        job = MaintenanceJob('cleanup', 60, cleanup, 10)
+        scheduler._execute(job)
+
+        self.assertEqual([10, 10, 10], calls)
+        self.assertEqual(0, remaining[0])
+        self.assertEqual(1, job.runs)
+        self.assertEqual(0, job.failures)
+        self.assertEqual(25, job.removed)
+
+    def testChunkedExact(self):
+        calls = []
+        def cleanup(chunk):
+            calls.append(chunk)
+            return chunk if len(calls) < 2 else 0
+
+        scheduler = MaintenanceScheduler()
+        job = MaintenanceJob('cleanup', 60, cleanup, 5)
+        scheduler._execute(job)
+
+        self.assertEqual([5, 5], calls)
+        self.assertEqual(5, job.removed)
+
+    def testFailure(self):
+        def cleanup(chunk): raise ValueError('Failed cleanup')
+
+        scheduler = MaintenanceScheduler()
+        job = MaintenanceJob('cleanup', 60, cleanup, 5)
+        scheduler._execute(job)
+
+        self.assertEqual(1, job.runs)
+        self.assertEqual(1, job.failures)
+        self.assertEqual(0, job.removed)
+
+    def testRegister(self):
+        ran = Event()
+        scheduler = MaintenanceScheduler()
+        scheduler.register('refresh', 60, ran.set, delay=0)
+
+        self.assertTrue(ran.wait(5))
+        metrics = scheduler.metrics()
+        self.assertEqual(['refresh'], list(metrics))
+
+# --------------------------------------------------------------------
+
+if __name__ == '__main__': unittest.main()